@@ -1,16 +1,33 @@
 import math
 
+# Ensemble confidence (percent) from which the hybrid logic trusts the ensemble
+ENSEMBLE_CONFIDENCE_THRESHOLD = 66
+
+def choose_prediction(ensemble_result, ai_result, threshold=ENSEMBLE_CONFIDENCE_THRESHOLD):
+    """
+    Hybrid Logic: If ensemble has high confidence, use it. Otherwise fallback to AI processor.
+    Returns (prediction, confidence, logic_used).
+    """
+    if ensemble_result["confidence"] >= threshold:
+        return (
+            ensemble_result["prediction"],
+            ensemble_result["confidence"],
+            f"Ensemble ({', '.join(ensemble_result['models_used'])})"
+        )
+    return ai_result["prediction"], ai_result["confidence"], ai_result["logic_used"]
+
 class AdvancedAIProcessor:
     def __init__(self, pattern_matrix, dynamic_weighting):
         self.pattern_matrix = pattern_matrix
         self.dynamic_weighting = dynamic_weighting
 
-    def calculate_boosted_confidence(self, history, base_pred, base_confidence):
+    def calculate_boosted_confidence(self, history, base_pred, base_confidence, pattern_data=None):
         """
         Normalizes and boosts confidence based on pattern reliability.
+        `pattern_data` is the history's pattern entry when the caller already looked it up.
         """
-        key = self.pattern_matrix.get_pattern_key(history)
-        pattern_data = self.pattern_matrix.matrix.get(key, {})
+        if pattern_data is None:
+            pattern_data = self.pattern_matrix.lookup(history)
         
         success = pattern_data.get("success", 0)
         errors = pattern_data.get("errors", 0)
@@ -53,9 +70,9 @@ class AdvancedAIProcessor:
         # Predict the majority (Simple Trend Following)
         return "Big" if big_count >= small_count else "Small"
 
-    def get_optimized_prediction(self, history, sensor_outputs):
-        # 1. Primary Logic: Weighted Sensors
-        base_pred, base_conf = self.dynamic_weighting.get_weighted_prediction(sensor_outputs)
+    def get_optimized_prediction(self, history, sensor_outputs, weighted=None):
+        # 1. Primary Logic: Weighted Sensors (`weighted` when the caller already scored a batch)
+        base_pred, base_conf = weighted or self.dynamic_weighting.get_weighted_prediction(sensor_outputs)
         
         # 2. Force Prediction: No more "Wait" logic.
         # Even if confidence is low, we pick the best available.
@@ -71,10 +88,12 @@ class AdvancedAIProcessor:
             is_alternative_used = True
         
         # 3. Apply pattern matrix inversion logic (Final Safety Layer)
-        final_pred = self.pattern_matrix.predict(history, final_pred)
+        # One index lookup serves both the inversion and the confidence boost
+        pattern_data = self.pattern_matrix.lookup(history)
+        final_pred = self.pattern_matrix.predict(history, final_pred, pattern_data)
         
         # 4. Calculate boosted confidence
-        optimized_conf = self.calculate_boosted_confidence(history, base_pred, base_conf * 100)
+        optimized_conf = self.calculate_boosted_confidence(history, base_pred, base_conf * 100, pattern_data)
         
         # 5. Color Coding System (Traffic Light Logic):
         # Green: Confidence > 80% (Safe)
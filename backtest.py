@@ -0,0 +1,281 @@
+"""
+Offline backtester: walks stored rounds in order and runs the full
+predict -> update loop in-process, with the same hybrid logic as /predict and
+the same learner updates as /update, but no HTTP and no JSON persistence.
+
+- Rounds come from game_results (ordered by id) or from an ingest-style
+  .jsonl/.csv file. game_results does not store sensor outputs, so DB
+  replays run with none and only a rounds file exercises the sensor weights.
+  A database from before the outcome stream is read as it is, not migrated.
+- A simulated clock follows each round's stored timestamp (or start + i *
+  --round-seconds for files), and the 7-day retention janitor runs on its
+  hourly schedule in simulated time, as it does live.
+- Each run builds its own learners in a temporary directory, with seeded
+  RNGs, serial model execution and synchronous retrains, so the same rounds
+  and parameters always produce the same numbers.
+- Parameter grids run in parallel across a process pool.
+
+Usage:
+    python backtest.py --threshold 66 101 --update-every 5 10 --retrain-every 25 --workers 2
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from advanced_logic import AdvancedAIProcessor, ENSEMBLE_CONFIDENCE_THRESHOLD, choose_prediction
+from database import DEFAULT_TABLE, GameDatabase, OutcomeStream, TIMESTAMP_FORMAT
+from dynamic_weighting import DynamicWeighting, DEFAULT_SENSORS
+from heatmap import MarketHeatmap
+from pattern_matrix import PatternErrorMatrix
+from recovery_mode import MartingaleRecovery
+from retention import RetentionJanitor
+from storage import get_pool
+from training_worker import RetrainPolicy
+
+DEFAULT_PARAMS = {
+    "threshold": ENSEMBLE_CONFIDENCE_THRESHOLD,
+    "window_sizes": (8, 5, 3),
+    "update_every": 5,
+    "retrain_every": 1,
+    "train_window": 100,
+}
+
+
+class SimulatedClock:
+    """Callable clock for GameDatabase/EnsembleManager that only moves when told to."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def load_rounds(db_path=None, rounds_path=None, limit=None, start=datetime(2026, 1, 1), round_seconds=60,
+                table_id=None):
+    """Rounds as dicts with a datetime "timestamp", oldest first; DB rounds of one game table if given."""
+    rounds = []
+    if rounds_path:
+        from ingest import read_rounds
+        for i, r in enumerate(read_rounds(rounds_path)):
+            if limit is not None and i >= limit:
+                break
+            r = dict(r)
+            r["timestamp"] = start + timedelta(seconds=i * round_seconds)
+            rounds.append(r)
+        return rounds
+
+    conn = sqlite3.connect(db_path)
+    try:
+        # A database the server has not opened since the outcome stream still has history strings,
+        # and one from before game tables has no table_id. It is read as it is, never migrated.
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(game_results)")]
+        legacy = "history" in columns
+        table = "table_id" if "table_id" in columns else f"'{DEFAULT_TABLE}'"
+        history = "history" if legacy else "history_end, history_len"
+        query = f"SELECT period, {table}, {history}, actual_outcome, timestamp FROM game_results"
+        params = ()
+        if table_id is not None:
+            query += f" WHERE {table} = ?"
+            params = (table_id,)
+        query += " ORDER BY id"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        rows = conn.execute(query, params).fetchall()
+        if legacy:
+            histories = [row[2].split(",") if row[2] else [] for row in rows]
+        else:
+            histories = OutcomeStream().histories(conn, [row[1:4] for row in rows])
+        for row, history in zip(rows, histories):
+            period, actual, timestamp = row[0], row[-2], row[-1]
+            rounds.append({
+                "period": period,
+                "history": history,
+                "sensor_outputs": {},
+                "actual_outcome": actual,
+                "timestamp": datetime.strptime(timestamp, TIMESTAMP_FORMAT) if timestamp else start,
+            })
+    finally:
+        conn.close()
+    return rounds
+
+
+def run_backtest(rounds, params=None, seed=0):
+    """Replays `rounds` with one parameter set and returns its accuracy and throughput."""
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    # Imported here so the parent process of a sweep never loads sklearn/xgboost
+    from ensemble_models import EnsembleManager
+
+    random.seed(seed)
+    np.random.seed(seed)
+    workdir = tempfile.mkdtemp(prefix="backtest_")
+    clock = SimulatedClock(rounds[0]["timestamp"] if rounds else datetime(2026, 1, 1))
+    db_path = os.path.join(workdir, "game_data.db")
+    try:
+        pattern_matrix = PatternErrorMatrix(
+            os.path.join(workdir, "pattern_data.json"), window_sizes=params["window_sizes"]
+        )
+        dynamic_weighting = DynamicWeighting(
+            DEFAULT_SENSORS, os.path.join(workdir, "sensor_weights.json"), update_every=params["update_every"]
+        )
+        # Nothing in the workdir outlives the run, so skip the per-round journal writes
+        pattern_matrix.store.paused = True
+        dynamic_weighting.store.paused = True
+        recovery = MartingaleRecovery(confidence_threshold=85.0)
+        heatmap = MarketHeatmap(window_size=100)
+        db = GameDatabase(db_path, clock=clock)
+        ai_processor = AdvancedAIProcessor(pattern_matrix, dynamic_weighting)
+        # max_interval is wall-clock based, so it has no meaning in a replay
+        ensemble = EnsembleManager(
+            db_path=db_path, model_dir=os.path.join(workdir, "models"), executor="serial",
+            train_window=params["train_window"], clock=clock,
+            retrain_policy=RetrainPolicy(every_n_rounds=params["retrain_every"], drift_threshold=0.1),
+        )
+        retention = RetentionJanitor(db_path, days=7, pause=0, clock=clock)
+        last_retention = None
+
+        counts = {"correct": 0, "ensemble": 0, "ensemble_correct": 0, "fallback_correct": 0, "inverted": 0}
+        profit = 0.0
+        start = time.perf_counter()
+        for r in rounds:
+            clock.now = r["timestamp"]
+            history = r["history"]
+            sensor_outputs = r.get("sensor_outputs") or {}
+            actual = r["actual_outcome"]
+
+            # Predict: same hybrid logic as /predict
+            ensemble_result = ensemble.predict_ensemble(history)
+            ai_result = ai_processor.get_optimized_prediction(history, sensor_outputs)
+            prediction, confidence, _ = choose_prediction(ensemble_result, ai_result, params["threshold"])
+            bet_amount, _ = recovery.get_bet_strategy(confidence)
+
+            won = prediction == actual
+            used_ensemble = ensemble_result["confidence"] >= params["threshold"]
+            counts["correct"] += won
+            counts["ensemble"] += used_ensemble
+            counts["ensemble_correct" if used_ensemble else "fallback_correct"] += won
+            counts["inverted"] += ai_result["is_inverted"]
+            profit += bet_amount if won else -bet_amount
+
+            # Update: the stages of main.apply_update. The round is saved before the
+            # ensemble is told about it and the retrain is awaited, so every retrain
+            # sees exactly the rounds up to this one.
+            pattern_matrix.update(history, prediction, actual)
+            dynamic_weighting.update_weights(sensor_outputs, actual)
+            recovery.update_result(won, bet_amount)
+            heatmap.add_result(actual)
+            db.save_result(r["period"], history, prediction, actual, confidence, bet_amount)
+            ensemble.record_actual_outcome(r["period"], history, actual)
+            ensemble.trainer.wait_idle()
+            if last_retention is None or (clock.now - last_retention).total_seconds() >= retention.interval:
+                retention.run_once()
+                last_retention = clock.now
+        elapsed = time.perf_counter() - start
+
+        n = len(rounds)
+        fallback = n - counts["ensemble"]
+        result = {
+            "params": params,
+            "rounds": n,
+            "accuracy": round(counts["correct"] / n, 4) if n else None,
+            "ensemble_share": round(counts["ensemble"] / n, 4) if n else None,
+            "ensemble_accuracy": round(counts["ensemble_correct"] / counts["ensemble"], 4) if counts["ensemble"] else None,
+            "fallback_accuracy": round(counts["fallback_correct"] / fallback, 4) if fallback else None,
+            "inversions": counts["inverted"],
+            "profit": round(profit, 2),
+            "retrains": ensemble.trainer.trains_completed,
+            "seconds": round(elapsed, 4),
+            "rounds_per_sec": round(n / elapsed, 1) if elapsed > 0 else None,
+        }
+        ensemble.trainer.shutdown()
+        ensemble.executor.shutdown()
+        return result
+    finally:
+        get_pool(db_path).close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_backtest_task(args):
+    return run_backtest(*args)
+
+
+def sweep(rounds, grid, workers=None, seed=0):
+    """Runs every combination in `grid` (name -> list of values), in parallel when workers > 1."""
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    workers = workers or min(len(configs), os.cpu_count() or 1)
+    if workers <= 1 or len(configs) == 1:
+        return [run_backtest(rounds, config, seed) for config in configs]
+    # spawn: the ensemble runs threads, which fork does not copy safely
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(_run_backtest_task, [(rounds, config, seed) for config in configs]))
+
+
+def format_table(results):
+    columns = ["threshold", "window_sizes", "update_every", "retrain_every", "train_window",
+               "accuracy", "ensemble_share", "ensemble_accuracy", "fallback_accuracy", "profit",
+               "retrains", "rounds_per_sec"]
+    rows = []
+    for result in results:
+        values = dict(result["params"], **result)
+        rows.append([",".join(map(str, v)) if isinstance(v, (list, tuple)) else str(v)
+                     for v in (values[c] for c in columns)])
+    widths = [max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(columns, widths))]
+    lines += ["  ".join(v.rjust(w) for v, w in zip(row, widths)) for row in rows]
+    return "\n".join(lines)
+
+
+def _window_sizes(value):
+    return tuple(int(k) for k in value.split(","))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay stored rounds offline and sweep parameters.")
+    parser.add_argument("--db", default="game_data.db", help="database whose game_results are replayed")
+    parser.add_argument("--table", help="only replay this game table's rounds from the database")
+    parser.add_argument("--rounds", help="replay an ingest-style .jsonl/.csv file instead of the database")
+    parser.add_argument("--round-seconds", type=int, default=60, help="simulated time between file rounds")
+    parser.add_argument("--limit", type=int, help="only replay the first N rounds")
+    parser.add_argument("--threshold", type=float, nargs="+", default=[DEFAULT_PARAMS["threshold"]],
+                        help="ensemble confidence thresholds (percent)")
+    parser.add_argument("--window-sizes", type=_window_sizes, nargs="+", default=[DEFAULT_PARAMS["window_sizes"]],
+                        help="pattern window sets, e.g. 8,5,3 5,3")
+    parser.add_argument("--update-every", type=int, nargs="+", default=[DEFAULT_PARAMS["update_every"]],
+                        help="rounds between sensor weight updates")
+    parser.add_argument("--retrain-every", type=int, nargs="+", default=[DEFAULT_PARAMS["retrain_every"]],
+                        help="rounds between ensemble retrains")
+    parser.add_argument("--train-window", type=int, nargs="+", default=[DEFAULT_PARAMS["train_window"]])
+    parser.add_argument("--workers", type=int, help="processes for the sweep (default: one per config, up to the CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    rounds = load_rounds(args.db, args.rounds, args.limit, round_seconds=args.round_seconds, table_id=args.table)
+    if not rounds:
+        parser.error("no rounds to replay")
+    grid = {
+        "threshold": args.threshold,
+        "window_sizes": args.window_sizes,
+        "update_every": args.update_every,
+        "retrain_every": args.retrain_every,
+        "train_window": args.train_window,
+    }
+    start = time.perf_counter()
+    results = sweep(rounds, grid, args.workers, args.seed)
+    print(f"{len(results)} run(s) over {len(rounds)} rounds in {time.perf_counter() - start:.2f}s")
+    print(format_table(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
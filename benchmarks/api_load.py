@@ -0,0 +1,295 @@
+"""
+HTTP load and regression benchmark for the API. For each --db-sizes value it
+seeds a temporary working directory with that many past rounds and fitted
+models, starts uvicorn on it, and replays synthetic round streams against
+/predict, /predict/batch, /update and /stats at each --concurrency level
+(keep-alive clients, --requests calls per endpoint and level). Reports
+throughput and p50/p95/p99 latency per endpoint.
+
+--output writes the results as JSON. --baseline compares them with an
+earlier run's JSON and exits non-zero when an endpoint lost more than
+--tolerance of its throughput or p50, got that much slower at p99 (with
+--check-p99), or returned errors, so the run can gate a change. A run fails
+as well if any of its keys (db size, concurrency, endpoint) is missing from the
+baseline, so compare with the same --db-sizes, --concurrency and --endpoints
+(or a subset of the baseline's). Record the baseline on the same machine.
+
+Run from the repository root:
+    python -m benchmarks.api_load --output api_load_baseline.json
+    python -m benchmarks.api_load --baseline api_load_baseline.json --tolerance 0.25
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLORS = ["Red", "Green", "Violet"]
+SENSORS = ["CID Sensor", "Dragon Logic", "Trend Sensor"]
+ENDPOINTS = ("predict", "predict_batch", "update", "stats")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def call(conn, method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else None
+    conn.request(method, path, payload, {"Content-Type": "application/json"} if payload else {})
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, json.loads(data) if data else None
+
+
+class RoundStream:
+    """A deterministic synthetic game: sliding 12-outcome history and sensor readings."""
+
+    def __init__(self, seed, prefix):
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.history = [self.rng.choice(COLORS) for _ in range(12)]
+        self.i = 0
+
+    def next_round(self):
+        self.i += 1
+        actual = self.rng.choice(COLORS)
+        round_ = {
+            "period": f"{self.prefix}-{self.i}",
+            "history": list(self.history),
+            "sensor_outputs": {sensor: self.rng.choice(COLORS) for sensor in SENSORS},
+        }
+        self.history = self.history[1:] + [actual]
+        return round_, actual
+
+
+def make_request(endpoint, stream, batch_size):
+    """(method, path, body) for one call to `endpoint`, taken from the stream."""
+    if endpoint == "stats":
+        return "GET", "/stats", None
+    if endpoint == "predict_batch":
+        return "POST", "/predict/batch", {"requests": [stream.next_round()[0] for _ in range(batch_size)]}
+    round_, actual = stream.next_round()
+    if endpoint == "predict":
+        return "POST", "/predict", round_
+    return "POST", "/update", dict(
+        round_, prediction=round_["history"][-1], actual_outcome=actual, bet_amount=10, confidence=50
+    )
+
+
+def client(port, endpoint, stream, n_requests, batch_size, start, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    start.wait()
+    for _ in range(n_requests):
+        method, path, body = make_request(endpoint, stream, batch_size)
+        began = time.perf_counter()
+        try:
+            status, _ = call(conn, method, path, body)
+            if status != 200:
+                errors.append(status)
+        except Exception as e:
+            errors.append(repr(e))
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            continue
+        latencies.append(time.perf_counter() - began)
+    conn.close()
+
+
+def run_level(port, endpoint, concurrency, n_requests, batch_size, seed):
+    latencies, errors = [], []
+    start = threading.Event()
+    per_client = max(n_requests // concurrency, 1)
+    threads = [
+        threading.Thread(target=client, args=(
+            port, endpoint, RoundStream(seed * 1000 + c, f"{endpoint}-{concurrency}-{seed}-{c}"),
+            per_client, batch_size, start, latencies, errors
+        ))
+        for c in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    ms = np.array(latencies) * 1000.0 if latencies else np.array([float("nan")])
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def seed_workdir(workdir, db_size):
+    """Past rounds in game_data.db and fitted models, like a server that has been running."""
+    from database import GameDatabase
+    from ensemble_models import EnsembleManager
+    stream = RoundStream(db_size, "seed")
+    rounds = []
+    for _ in range(db_size):
+        round_, actual = stream.next_round()
+        rounds.append((round_["period"], round_["history"], round_["history"][-1], actual, 50, 10))
+    db_path = os.path.join(workdir, "game_data.db")
+    db = GameDatabase(db_path)
+    for i in range(0, len(rounds), 5000):
+        db.save_results(rounds[i:i + 5000])
+    manager = EnsembleManager(db_path=db_path, model_dir=os.path.join(workdir, "models"), executor="serial")
+    rng = np.random.default_rng(0)
+    manager.train_all(rng.integers(0, 3, size=(100, 10)), rng.integers(0, 3, size=100))
+    manager.trainer.shutdown()
+    manager.pool.close_all()
+
+
+def wait_ready(port, timeout=120):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            status, _ = call(conn, "GET", "/ready")
+            conn.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        if time.time() > deadline:
+            raise RuntimeError("server did not become ready")
+        time.sleep(0.1)
+
+
+def wait_idle(port, timeout=120):
+    """Waits until no update is queued and no retrain is running, so levels do not overlap."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    deadline = time.time() + timeout
+    try:
+        while time.time() < deadline:
+            _, stats = call(conn, "GET", "/stats")
+            if stats["learning_stats"]["pending_updates"] == 0 and stats["ensemble_stats"]["training"]["queue_depth"] == 0:
+                return
+            time.sleep(0.05)
+    finally:
+        conn.close()
+    raise RuntimeError(f"server still busy after {timeout}s (updates queued or a retrain running)")
+
+
+def run_db_size(db_size, concurrency_levels, n_requests, batch_size, endpoints):
+    workdir = tempfile.mkdtemp(prefix="api_load_bench_")
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    server = None
+    results = {}
+    try:
+        shutil.copy(os.path.join(REPO_ROOT, "index.html"), workdir)
+        seed_workdir(workdir, db_size)
+        server = subprocess.Popen(
+            [sys.executable, "-W", "ignore", "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        wait_ready(port)
+        for concurrency in concurrency_levels:
+            for endpoint in endpoints:
+                wait_idle(port)
+                key = f"db={db_size}/c={concurrency}/{endpoint}"
+                results[key] = result = run_level(port, endpoint, concurrency, n_requests, batch_size, db_size + concurrency)
+                print(f"{db_size:>8}{concurrency:>6}  {endpoint:<14}{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}"
+                      f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance, check_p99):
+    """
+    Regressions of `results` against `baseline` (both keyed like 'db=0/c=4/predict').
+    A result with no baseline entry, or a baseline entry without a checked
+    metric, is a failure too: nothing passes without being compared.
+    """
+    failures = []
+    if not results.keys() & baseline.keys():
+        failures.append(f"no result matches a baseline key (baseline has {', '.join(sorted(baseline)) or 'nothing'})")
+    checks = ("throughput", "p50_ms", "p99_ms") if check_p99 else ("throughput", "p50_ms")
+    for key, result in results.items():
+        if result["errors"]:
+            failures.append(f"{key}: {result['errors']} failed requests")
+        base = baseline.get(key)
+        if base is None:
+            failures.append(f"{key}: not in baseline")
+            continue
+        missing = [stat for stat in checks if stat not in base]
+        if missing:
+            failures.append(f"{key}: baseline has no {', '.join(missing)}")
+            continue
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            failures.append(f"{key}: throughput {result['throughput']:.1f}/s vs baseline {base['throughput']:.1f}/s")
+        for stat in checks[1:]:
+            if result[stat] > base[stat] * (1 + tolerance):
+                failures.append(f"{key}: {stat} {result[stat]:.2f} vs baseline {base[stat]:.2f}")
+    return failures
+
+
+def run(db_sizes, concurrency_levels, n_requests, batch_size, endpoints, output=None, baseline=None,
+        tolerance=0.25, check_p99=False):
+    print(f"{'db rows':>8}{'conc':>6}  {'endpoint':<14}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    results = {}
+    for db_size in db_sizes:
+        results.update(run_db_size(db_size, concurrency_levels, n_requests, batch_size, endpoints))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "requests": n_requests,
+            "batch_size": batch_size,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {output}")
+
+    failures = [f"{key}: {result['errors']} failed requests" for key, result in results.items() if result["errors"]]
+    if baseline:
+        with open(baseline) as f:
+            failures = compare(results, json.load(f)["results"], tolerance, check_p99)
+        print(f"compared against {baseline} (tolerance {tolerance:.0%})")
+    for failure in failures:
+        print("REGRESSION:", failure)
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-sizes", type=int, nargs="+", default=[0, 20000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="calls per endpoint and concurrency level")
+    parser.add_argument("--batch-size", type=int, default=16, help="items per /predict/batch call")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--check-p99", action="store_true", help="also fail on p99 regressions")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.db_sizes, args.concurrency, args.requests, args.batch_size, args.endpoints,
+                      args.output, args.baseline, args.tolerance, args.check_p99) else 1)
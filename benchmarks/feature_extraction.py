@@ -0,0 +1,75 @@
+"""
+Microbenchmarks for building the ensemble training set from stored history
+strings: the old pandas iterrows + split + per-row prepare_features path
+versus FeatureSpec's bulk decoder, plus the zero-copy sliding windows.
+
+Run from the repository root:
+    python -m benchmarks.feature_extraction --rows 100 10000 1000000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureSpec
+
+COLORS = ["Red", "Green", "Violet"]
+
+
+def legacy_training_set(df):
+    def prepare_features(history):
+        mapping = {'Red': 0, 'Green': 1, 'Violet': 2}
+        encoded = [mapping.get(x, 0) for x in history]
+        if len(encoded) < 10:
+            encoded = [0] * (10 - len(encoded)) + encoded
+        return np.array(encoded[-10:]).reshape(1, -1)
+
+    X = []
+    y = []
+    mapping = {'Red': 0, 'Green': 1, 'Violet': 2}
+    for _, row in df.iterrows():
+        X.append(prepare_features(row['history'].split(',')).flatten())
+        y.append(mapping.get(row['actual_outcome'], 0))
+    return np.array(X), np.array(y)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000.0
+
+
+def run(row_counts, legacy_max):
+    spec = FeatureSpec()
+    rich_spec = FeatureSpec(streak=True, ratios=True, parity=True)
+    rng = random.Random(0)
+
+    print(f"{'rows':>10}{'legacy ms':>12}{'bulk ms':>12}{'+extras ms':>12}{'windows ms':>12}")
+    for n in row_counts:
+        histories = [",".join(rng.choice(COLORS) for _ in range(12)) for _ in range(n)]
+        outcomes = [rng.choice(COLORS) for _ in range(n)]
+
+        legacy = "-"
+        if n <= legacy_max:
+            df = pd.DataFrame({"history": histories, "actual_outcome": outcomes})
+            (X_old, y_old), elapsed = timed(legacy_training_set, df)
+            legacy = f"{elapsed:.2f}"
+
+        (X, y), bulk = timed(spec.training_set, histories, outcomes)
+        if n <= legacy_max:
+            assert (X == X_old).all() and (y == y_old).all(), "bulk features differ from the legacy path"
+        _, extras = timed(rich_spec.training_set, histories, outcomes)
+        _, windows = timed(spec.windows_from_sequence, y)
+
+        print(f"{n:>10}{legacy:>12}{bulk:>12.2f}{extras:>12.2f}{windows:>12.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10000, 1000000])
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="skip the slow legacy path above this many rows")
+    args = parser.parse_args()
+    run(args.rows, args.legacy_max)
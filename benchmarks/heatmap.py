@@ -0,0 +1,84 @@
+"""
+Per-round heatmap cost (add_result + get_heatmap_data): the previous
+Counter-over-the-deque implementation versus running counts, for the
+100-round window alone and with 20/100/1000 windows plus decay. Every round
+also checks that the 100-round output is identical to the previous one.
+
+Run from the repository root:
+    python -m benchmarks.heatmap --rounds 20000
+"""
+import argparse
+import collections
+import time
+
+import numpy as np
+
+from heatmap import MarketHeatmap
+
+
+class LegacyHeatmap:
+    """The previous implementation: a Counter over the whole deque on every read."""
+
+    def __init__(self, window_size=100):
+        self.history = collections.deque(maxlen=window_size)
+
+    def add_result(self, result):
+        self.history.append(result)
+
+    def get_heatmap_data(self):
+        if not self.history:
+            return {"Big": 50, "Small": 50}
+        counts = collections.Counter(self.history)
+        total = len(self.history)
+        big_percent = (counts.get("Big", 0) / total) * 100
+        small_percent = (counts.get("Small", 0) / total) * 100
+        return {
+            "Big": round(big_percent, 2),
+            "Small": round(small_percent, 2),
+            "trend": "Big" if big_percent > small_percent else "Small",
+            "sample_size": total
+        }
+
+
+def outcomes(n_rounds, seed):
+    # Mostly Big/Small with a few other labels, which count towards the sample but not the percentages
+    rng = np.random.default_rng(seed)
+    return list(rng.choice(["Big", "Small", "Red"], size=n_rounds, p=[0.49, 0.49, 0.02]))
+
+
+def per_round_us(heatmap, stream):
+    start = time.perf_counter()
+    for outcome in stream:
+        heatmap.add_result(outcome)
+        heatmap.get_heatmap_data()
+    return (time.perf_counter() - start) / len(stream) * 1e6
+
+
+def run(n_rounds):
+    stream = outcomes(n_rounds, seed=0)
+
+    legacy, incremental = LegacyHeatmap(100), MarketHeatmap(100, windows=(20, 1000), half_life=50)
+    mismatches = 0
+    for outcome in stream:
+        legacy.add_result(outcome)
+        incremental.add_result(outcome)
+        mismatches += legacy.get_heatmap_data() != incremental.get_heatmap_data()
+    print(f"{n_rounds} rounds, 100-round output mismatches: {mismatches}")
+
+    print(f"{'implementation':<36}{'us/round':>10}")
+    for label, heatmap in (
+        ("legacy Counter, 100", LegacyHeatmap(100)),
+        ("legacy Counter, 1000", LegacyHeatmap(1000)),
+        ("running counts, 100", MarketHeatmap(100)),
+        ("running counts, 1000", MarketHeatmap(1000)),
+        ("running counts, 20/100/1000 + decay", MarketHeatmap(100, windows=(20, 1000), half_life=50)),
+    ):
+        print(f"{label:<36}{per_round_us(heatmap, stream):>10.2f}")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.rounds)
@@ -0,0 +1,154 @@
+"""
+Round history storage: the previous layout (each round's history as a
+comma-joined TEXT column) versus the outcome stream (each outcome stored once,
+histories as slices). For each --rows value it reports the database size after
+VACUUM, the time to migrate the previous layout, and the time to build the
+training window (--window rounds) that a full refit reads, checking that both
+layouts give the same X and y. The .npy export is timed and sized as well.
+
+Run from the repository root:
+    python -m benchmarks.history_storage --rows 10000 100000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from database import GameDatabase, load_columns
+from ensemble_models import EnsembleManager
+from features import FeatureSpec
+
+COLORS = ["Red", "Green", "Violet"]
+
+# game_results as it was before the outcome stream
+LEGACY_SCHEMA = (
+    """
+    CREATE TABLE game_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        period TEXT,
+        history TEXT,
+        prediction TEXT,
+        actual_outcome TEXT,
+        confidence REAL,
+        bet_amount REAL,
+        is_win INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        table_id TEXT NOT NULL DEFAULT 'default',
+        UNIQUE (table_id, period)
+    )
+    """,
+    "CREATE INDEX idx_game_results_table_id ON game_results (table_id, id)",
+    "CREATE INDEX idx_game_results_table_ts ON game_results (table_id, timestamp)",
+)
+
+
+def make_rounds(n_rows, history_len):
+    """A synthetic game: each round's history is the previous one slid by one outcome."""
+    rng = random.Random(0)
+    history = [rng.choice(COLORS) for _ in range(history_len)]
+    rounds = []
+    for i in range(n_rows):
+        actual = rng.choice(COLORS)
+        rounds.append((str(i), list(history), history[-1], actual, 50.0, 10.0))
+        history = history[1:] + [actual]
+    return rounds
+
+
+def write_legacy(db_path, rounds):
+    conn = sqlite3.connect(db_path)
+    for sql in LEGACY_SCHEMA:
+        conn.execute(sql)
+    conn.executemany(
+        "INSERT INTO game_results (period, history, prediction, actual_outcome, confidence, bet_amount, is_win) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(period, ",".join(history), prediction, actual, confidence, bet, int(prediction == actual))
+         for period, history, prediction, actual, confidence, bet in rounds]
+    )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def legacy_training_window(db_path, window, spec):
+    """What a full refit did before: read the history strings, then parse them."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT history, actual_outcome FROM game_results WHERE table_id = 'default' "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?", (window,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return spec.training_set([row[0] or "" for row in rows], [row[1] for row in rows])
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, result
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def run(row_counts, window, history_len, repeats):
+    spec = FeatureSpec()
+    print(f"{'rows':>8}{'legacy MB':>11}{'stream MB':>11}{'npy MB':>9}{'migrate s':>11}"
+          f"{'legacy ms':>11}{'stream ms':>11}{'export ms':>11}")
+    ok = True
+    for n_rows in row_counts:
+        workdir = tempfile.mkdtemp(prefix="history_bench_")
+        try:
+            rounds = make_rounds(n_rows, history_len)
+            legacy_path = os.path.join(workdir, "legacy.db")
+            write_legacy(legacy_path, rounds)
+            legacy_mb = os.path.getsize(legacy_path) / 1e6
+            legacy_ms, (X_legacy, y_legacy) = best_of(lambda: legacy_training_window(legacy_path, window, spec), repeats)
+
+            # Opening the previous layout migrates it in place (and VACUUMs)
+            start = time.perf_counter()
+            db = GameDatabase(legacy_path)
+            migrate_s = time.perf_counter() - start
+            stream_mb = os.path.getsize(legacy_path) / 1e6
+
+            manager = EnsembleManager(db_path=legacy_path, model_dir=os.path.join(workdir, "models"),
+                                      executor="serial", train_window=window)
+            stream_ms, (X_stream, y_stream) = best_of(manager.training_window, repeats)
+            manager.trainer.shutdown()
+            if not (np.array_equal(X_legacy, X_stream) and np.array_equal(y_legacy, y_stream)):
+                print(f"MISMATCH: training window differs at {n_rows} rows")
+                ok = False
+
+            export_dir = os.path.join(workdir, "export")
+            export_ms, _ = best_of(lambda: db.export_columns(export_dir), 1)
+            columns = load_columns(export_dir)
+            if len(columns["history_end"]) != n_rows:
+                print(f"MISMATCH: export has {len(columns['history_end'])} rounds, expected {n_rows}")
+                ok = False
+
+            print(f"{n_rows:>8}{legacy_mb:>11.2f}{stream_mb:>11.2f}{directory_size(export_dir) / 1e6:>9.2f}"
+                  f"{migrate_s:>11.2f}{legacy_ms:>11.2f}{stream_ms:>11.2f}{export_ms:>11.2f}")
+            db.pool.close_all()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--window", type=int, default=1000, help="rounds a full refit reads (train_window)")
+    parser.add_argument("--history-len", type=int, default=20, help="outcomes in each round's history")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.rows, args.window, args.history_len, args.repeats) else 1)
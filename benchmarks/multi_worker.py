@@ -0,0 +1,189 @@
+"""
+Multi-worker throughput against real servers: for each configuration, starts
+uvicorn with --workers N in a temporary directory, runs --clients keep-alive
+clients that each loop /predict + /update for --seconds, and reports rounds
+per second and latency. Clients are spread over --tables game tables. With
+the shared SQLite state backend it then checks that every worker ended with
+the same learner state for every table and the same model generations, and
+that exactly one of them is the trainer.
+
+Run from the repository root:
+    python -m benchmarks.multi_worker --workers 1 2 4 --clients 8 --seconds 20 --tables 2
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTCOMES = ["Big", "Small"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def call(conn, method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else None
+    conn.request(method, path, payload, {"Content-Type": "application/json"} if payload else {})
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, json.loads(data) if data else None
+
+
+def get(port, path):
+    # A fresh connection per call, so consecutive calls can land on different workers
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        return call(conn, "GET", path)
+    finally:
+        conn.close()
+
+
+def table_name(i):
+    return "default" if i == 0 else f"table-{i}"
+
+
+def client(port, client_id, table_id, deadline, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    history = [OUTCOMES[(client_id + i) % 2] for i in range(12)]
+    i = 0
+    while time.perf_counter() < deadline:
+        period = f"c{client_id}-{i}"
+        sensors = {"CID Sensor": OUTCOMES[i % 2], "Dragon Logic": OUTCOMES[(i // 2) % 2], "Trend Sensor": history[-1]}
+        start = time.perf_counter()
+        try:
+            status, prediction = call(conn, "POST", "/predict", {
+                "period": period, "history": history, "sensor_outputs": sensors, "table_id": table_id
+            })
+            actual = OUTCOMES[(i * 7 + client_id) % 3 % 2]
+            status2, _ = call(conn, "POST", "/update", {
+                "period": period, "history": history, "sensor_outputs": sensors,
+                "prediction": prediction["prediction"], "actual_outcome": actual,
+                "bet_amount": prediction["bet_amount"], "confidence": prediction["confidence"],
+                "table_id": table_id,
+            })
+            if status != 200 or status2 != 200:
+                errors.append((status, status2))
+        except Exception as e:
+            errors.append(repr(e))
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            continue
+        latencies.append(time.perf_counter() - start)
+        history = history[1:] + [actual]
+        i += 1
+    conn.close()
+
+
+def worker_stats(port, n_workers, table_id="default", timeout=30):
+    """A table's /stats from every worker, found by asking over fresh connections until all N answered."""
+    seen = {}
+    deadline = time.time() + timeout
+    while len(seen) < n_workers and time.time() < deadline:
+        _, stats = get(port, f"/stats?table_id={table_id}")
+        seen[stats["state_backend"]["worker_id"]] = stats
+    return seen
+
+
+def wait_ready(port, n_workers, timeout=120):
+    deadline = time.time() + timeout
+    ready = set()
+    while len(ready) < n_workers:
+        if time.time() > deadline:
+            raise RuntimeError("workers did not become ready")
+        try:
+            status, _ = get(port, "/ready")
+            if status == 200:
+                _, stats = get(port, "/stats")
+                ready.add(stats["state_backend"]["worker_id"])
+                continue
+        except OSError:
+            pass
+        time.sleep(0.2)
+
+
+def learner_state(stats):
+    return (
+        stats["sensor_weights"], stats["heatmap"], stats["heatmap_horizons"]["windows"],
+        stats["recovery_status"], stats["learning_stats"]["round_counter"],
+        stats["learning_stats"]["patterns_learned"],
+    )
+
+
+def run_config(backend, n_workers, n_clients, seconds, n_tables):
+    workdir = tempfile.mkdtemp(prefix="multi_worker_bench_")
+    port = free_port()
+    env = dict(os.environ, STATE_BACKEND=backend,
+               PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    server = subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(n_workers), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(port, n_workers)
+        latencies, errors = [], []
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=client, args=(port, c, table_name(c % n_tables), deadline, latencies, errors))
+                   for c in range(n_clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        rounds = len(latencies)
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)] if latencies else float("nan")
+        print(f"{backend:<8}{n_workers:>8}{rounds / elapsed:>12.1f}{statistics.median(latencies) * 1000:>12.1f}"
+              f"{p99 * 1000:>12.1f}{len(errors):>8}")
+
+        if backend != "sqlite":
+            return not errors
+        # Let followers apply the last rounds and pick up the last generation
+        time.sleep(1.0 + 5.0)
+        same = True
+        for t in range(n_tables):
+            stats = worker_stats(port, n_workers, table_name(t))
+            states = {worker: learner_state(s) for worker, s in stats.items()}
+            same = same and len(set(json.dumps(state, sort_keys=True) for state in states.values())) == 1
+        applied = {s["state_backend"]["applied_seq"] for s in stats.values()}
+        leaders = [worker for worker, s in stats.items() if s["state_backend"]["is_leader"]]
+        generations = {json.dumps(s["state_backend"]["model_generations"], sort_keys=True) for s in stats.values()}
+        print(f"        {len(stats)} workers: same learner state {same}, applied_seq {sorted(applied)}, "
+              f"trainers {len(leaders)}, model generations {sorted(generations)}")
+        return not errors and same and len(applied) == 1 and len(leaders) == 1
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(worker_counts, n_clients, seconds, n_tables):
+    print(f"{'backend':<8}{'workers':>8}{'rounds/s':>12}{'p50 ms':>12}{'p99 ms':>12}{'errors':>8}"
+          f"   (one round = /predict + /update, {n_clients} clients, {n_tables} tables)")
+    ok = run_config("local", 1, n_clients, seconds, n_tables)
+    for n_workers in worker_counts:
+        ok = run_config("sqlite", n_workers, n_clients, seconds, n_tables) and ok
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--tables", type=int, default=1)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.workers, args.clients, args.seconds, args.tables) else 1)
@@ -0,0 +1,77 @@
+"""
+Per-round ensemble update cost versus training window size, comparing the
+batch mode (full refit on the last N rounds) with the online mode
+(incremental update with only the new round).
+
+Run from the repository root:
+    python -m benchmarks.online_update_cost --windows 100 1000 10000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from database import GameDatabase
+from ensemble_models import EnsembleManager
+
+COLORS = ["Red", "Green", "Violet"]
+
+
+def seed_database(db_path, n_rows):
+    rng = random.Random(0)
+    rows = []
+    for i in range(n_rows):
+        history = [rng.choice(COLORS) for _ in range(12)]
+        outcome = rng.choice(COLORS)
+        rows.append((str(i), history, outcome, outcome, 50.0, 10.0))
+    GameDatabase(db_path).save_results(rows)
+
+
+def time_updates(manager, repeats):
+    rng = random.Random(1)
+    samples = []
+    for _ in range(repeats):
+        history = [rng.choice(COLORS) for _ in range(12)]
+        if manager.learning_mode == "online":
+            manager._online_rows.append((manager.prepare_features(history)[0], rng.randrange(3)))
+        start = time.perf_counter()
+        manager._background_train()
+        samples.append(time.perf_counter() - start)
+    return sum(samples) / len(samples) * 1000.0
+
+
+def run(windows, repeats):
+    workdir = tempfile.mkdtemp(prefix="online_bench_")
+    try:
+        db_path = os.path.join(workdir, "game_data.db")
+        seed_database(db_path, max(windows))
+
+        print(f"{'window':>8}{'batch ms':>12}{'online ms':>12}")
+        results = {}
+        for window in windows:
+            timings = {}
+            for mode in ("batch", "online"):
+                model_dir = os.path.join(workdir, f"models_{mode}_{window}")
+                manager = EnsembleManager(
+                    db_path=db_path, model_dir=model_dir, executor="serial",
+                    learning_mode=mode, train_window=window, full_refit_every=10 ** 9
+                )
+                # Initial full fit so the online mode has something to update
+                manager._background_train()
+                timings[mode] = time_updates(manager, repeats)
+                manager.trainer.shutdown()
+            results[window] = timings
+            print(f"{window:>8}{timings['batch']:>12.2f}{timings['online']:>12.2f}")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--windows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    run(args.windows, args.repeats)
@@ -0,0 +1,100 @@
+"""
+Per-round cost of refreshing model accuracies as model_performance grows:
+the old 12 ORDER BY ... LIMIT 20 subqueries (without and with the new
+index) versus the RollingAccuracy ring buffers plus summary-table upsert.
+
+Run from the repository root:
+    python -m benchmarks.performance_refresh --rows 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from rolling_accuracy import RollingAccuracy
+from storage import get_pool
+
+MODEL_NAMES = [
+    "RandomForest", "XGBoost", "SVM", "KNN",
+    "LogisticRegression", "GradientBoosting", "ExtraTrees",
+    "AdaBoost", "Ridge", "GaussianNB", "DecisionTree", "MLPPlaceholder"
+]
+
+
+def legacy_refresh(conn):
+    for name in MODEL_NAMES:
+        conn.execute('''
+            SELECT AVG(is_correct) FROM (
+                SELECT is_correct FROM model_performance
+                WHERE model_name = ?
+                ORDER BY timestamp DESC LIMIT 20
+            )
+        ''', (name,)).fetchone()
+
+
+def seed(conn, n_rows):
+    conn.execute('''
+        CREATE TABLE model_performance (
+            model_name TEXT, period TEXT, prediction TEXT, actual TEXT,
+            is_correct INTEGER, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            table_id TEXT NOT NULL DEFAULT 'default'
+        )
+    ''')
+    rng = random.Random(0)
+    rows = (
+        (MODEL_NAMES[i % 12], str(i // 12), "Red", "Red", rng.randrange(2), f"2026-01-01 00:00:{i % 60:02d}")
+        for i in range(n_rows)
+    )
+    conn.executemany(
+        "INSERT INTO model_performance (model_name, period, prediction, actual, is_correct, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?)", rows
+    )
+    conn.commit()
+
+
+def per_call_ms(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000.0
+
+
+def run(row_counts, repeats):
+    workdir = tempfile.mkdtemp(prefix="perf_refresh_bench_")
+    try:
+        print(f"{'rows':>10}{'no index ms':>14}{'indexed ms':>14}{'rolling ms':>14}")
+        for n in row_counts:
+            pool = get_pool(os.path.join(workdir, f"perf_{n}.db"))
+            with pool.connection() as conn:
+                seed(conn, n)
+                unindexed = per_call_ms(lambda: legacy_refresh(conn), repeats)
+                conn.execute("CREATE INDEX idx_model_performance_name_ts ON model_performance (model_name, timestamp)")
+                indexed = per_call_ms(lambda: legacy_refresh(conn), repeats)
+
+            rolling = RollingAccuracy(MODEL_NAMES)
+            with pool.transaction() as conn:
+                rolling.create_table(conn)
+                rolling.load(conn)
+
+            def record_round():
+                for name in MODEL_NAMES:
+                    rolling.record(name, random.randrange(2))
+                    rolling.accuracy(name)
+                with pool.transaction() as conn:
+                    rolling.save(conn, MODEL_NAMES)
+
+            rolling_ms = per_call_ms(record_round, repeats)
+            pool.close_all()
+            print(f"{n:>10}{unindexed:>14.3f}{indexed:>14.3f}{rolling_ms:>14.3f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    run(args.rows, args.repeats)
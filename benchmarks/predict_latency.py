@@ -0,0 +1,99 @@
+"""
+p50/p99 latency of the /predict handler with resident models (ModelRegistry)
+versus the old path that joblib.loads each top-3 model on every call.
+
+Run from the repository root:
+    python -m benchmarks.predict_latency --requests 500
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoadPerCallRegistry:
+    """Mimics the pre-registry behaviour: deserialize the model on every lookup."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    @property
+    def generation(self):
+        return self.registry.generation
+
+    def refresh_if_changed(self, names):
+        return False
+
+    def get(self, name):
+        path = self.registry.model_path(name)
+        if os.path.exists(path):
+            return joblib.load(path)
+        return None
+
+
+def percentile(samples, pct):
+    return float(np.percentile(np.array(samples) * 1000.0, pct))
+
+
+def measure(main, n_requests):
+    colors = ["Red", "Green", "Violet"]
+    sensors = ["CID Sensor", "Dragon Logic", "Trend Sensor"]
+    samples = []
+    for i in range(n_requests):
+        request = main.PredictionRequest(
+            period=str(i),
+            history=[random.choice(colors) for _ in range(12)],
+            sensor_outputs={s: random.choice(["Big", "Small"]) for s in sensors},
+        )
+        start = time.perf_counter()
+        main.get_prediction(request)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(n_requests):
+    workdir = tempfile.mkdtemp(prefix="predict_bench_")
+    shutil.copy(os.path.join(REPO_ROOT, "index.html"), workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    try:
+        import main
+
+        rng = np.random.default_rng(0)
+        X = rng.integers(0, 3, size=(100, 10))
+        y = rng.integers(0, 3, size=100)
+        ensemble_manager = main.table_bundle(main.DEFAULT_TABLE).ensemble_manager
+        ensemble_manager.train_all(X, y)
+
+        registry = ensemble_manager.registry
+        results = {}
+        for label, backend in (("load-per-call", LoadPerCallRegistry(registry)), ("registry", registry)):
+            ensemble_manager.registry = backend
+            measure(main, 10)  # warm-up
+            samples = measure(main, n_requests)
+            results[label] = (percentile(samples, 50), percentile(samples, 99))
+        ensemble_manager.registry = registry
+
+        print(f"/predict latency over {n_requests} requests (ms)")
+        print(f"{'path':<16}{'p50':>10}{'p99':>10}")
+        for label, (p50, p99) in results.items():
+            print(f"{label:<16}{p50:>10.3f}{p99:>10.3f}")
+        return results
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    run(args.requests)
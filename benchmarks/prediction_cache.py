@@ -0,0 +1,74 @@
+"""
+predict_ensemble latency with and without the prediction cache, over a
+request stream that repeats windows the way live traffic does (a skewed draw
+from a pool of distinct histories). Also checks both paths agree.
+
+Run from the repository root:
+    python -m benchmarks.prediction_cache --requests 2000 --distinct 200
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from ensemble_models import EnsembleManager
+
+COLORS = ["Red", "Green", "Violet"]
+
+
+def request_stream(n_requests, n_distinct, seed=0):
+    rng = random.Random(seed)
+    pool = [[rng.choice(COLORS) for _ in range(12)] for _ in range(n_distinct)]
+    # Zipf-like skew: a few windows account for most of the traffic
+    weights = [1.0 / (rank + 1) for rank in range(n_distinct)]
+    return rng.choices(pool, weights=weights, k=n_requests)
+
+
+def measure(manager, stream):
+    samples = []
+    results = []
+    for history in stream:
+        start = time.perf_counter()
+        results.append(manager.predict_ensemble(history))
+        samples.append(time.perf_counter() - start)
+    samples = np.array(samples) * 1000.0
+    return float(np.percentile(samples, 50)), float(np.percentile(samples, 99)), results
+
+
+def run(n_requests, n_distinct):
+    workdir = tempfile.mkdtemp(prefix="prediction_cache_bench_")
+    try:
+        rng = np.random.default_rng(0)
+        X = rng.integers(0, 3, size=(100, 10))
+        y = rng.integers(0, 3, size=100)
+        stream = request_stream(n_requests, n_distinct)
+
+        print(f"predict_ensemble over {n_requests} requests, {n_distinct} distinct windows (ms)")
+        print(f"{'path':<10}{'p50':>10}{'p99':>10}{'hit rate':>10}")
+        outputs = {}
+        for label, cache_size in (("uncached", 0), ("cached", 10000)):
+            manager = EnsembleManager(
+                db_path=os.path.join(workdir, f"{label}.db"), model_dir=os.path.join(workdir, f"models_{label}"),
+                executor="serial", prediction_cache_size=cache_size
+            )
+            np.random.seed(0)
+            manager.train_all(X, y)
+            p50, p99, outputs[label] = measure(manager, stream)
+            hit_rate = manager.prediction_cache.stats()["hit_rate"]
+            manager.trainer.shutdown()
+            print(f"{label:<10}{p50:>10.3f}{p99:>10.3f}{hit_rate:>10.2%}")
+        print("Results identical:", outputs["uncached"] == outputs["cached"])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=200)
+    args = parser.parse_args()
+    run(args.requests, args.distinct)
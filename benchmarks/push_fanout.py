@@ -0,0 +1,153 @@
+"""
+Live push fan-out against a real server: starts uvicorn on the API in a
+temporary directory, holds --subscribers idle SSE connections to /events,
+then posts --rounds updates and measures, per round, the time from the
+/update call until the last subscriber has received its 'round' event.
+Reports server RSS per idle subscriber. Last, checks in-process that a
+subscriber that never reads is dropped after max_pending messages instead of
+buffering without limit (over TCP that only starts once the kernel socket
+buffers in front of it, up to a few MB on loopback, are full).
+
+Run from the repository root:
+    python -m benchmarks.push_fanout --subscribers 2000 --rounds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from push_hub import PushHub
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return float("nan")
+
+
+def post_update(port, period):
+    body = json.dumps({
+        "period": period, "history": ["Big", "Small"] * 6, "sensor_outputs": {"CID Sensor": "Big"},
+        "prediction": "Big", "actual_outcome": "Big", "bet_amount": 10, "confidence": 50,
+    }).encode()
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/update", body, {"Content-Type": "application/json"})
+    urllib.request.urlopen(request).read()
+
+
+async def subscribe(port, rounds, connected):
+    """Opens one SSE stream and records when each round's period arrives."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /events HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    event = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            return writer
+        line = line.decode().strip()
+        if line.startswith("event: "):
+            event = line[7:]
+            if event == "state":
+                connected.release()
+        elif line.startswith("data: ") and event == "round":
+            period = json.loads(line[6:])["period"]
+            rounds.setdefault(period, []).append(time.perf_counter())
+
+
+async def run_async(port, pid, n_subscribers, n_rounds):
+    rounds = {}
+    connected = asyncio.Semaphore(0)
+    base_rss = rss_mb(pid)
+    tasks = [asyncio.create_task(subscribe(port, rounds, connected)) for _ in range(n_subscribers)]
+    for _ in range(n_subscribers):
+        await connected.acquire()
+    await asyncio.sleep(0.5)
+    idle_rss = rss_mb(pid)
+    print(f"{n_subscribers} idle SSE subscribers: server RSS {base_rss:.1f} -> {idle_rss:.1f} MB "
+          f"({(idle_rss - base_rss) * 1024 / max(n_subscribers, 1):.1f} KB per subscriber)")
+
+    loop = asyncio.get_running_loop()
+    latencies = []
+    for i in range(n_rounds):
+        period = f"bench-{i}"
+        sent = time.perf_counter()
+        await loop.run_in_executor(None, post_update, port, period)
+        deadline = time.perf_counter() + 30
+        while len(rounds.get(period, ())) < n_subscribers and time.perf_counter() < deadline:
+            await asyncio.sleep(0.001)
+        received = rounds.get(period, [])
+        latencies.append((max(received) if received else float("inf")) - sent)
+
+    print(f"{n_rounds} rounds, /update sent until all {n_subscribers} subscribers had the event (ms): "
+          f"p50 {statistics.median(latencies) * 1000:.1f}  max {max(latencies) * 1000:.1f}")
+    for task in tasks:
+        task.cancel()
+
+
+async def slow_subscriber_check(n_messages):
+    """A subscriber that never reads next to one that keeps up, on a hub of its own."""
+    hub = PushHub(max_pending=64, heartbeat=None).start()
+    stalled, _ = hub.subscribe()
+    live, _ = hub.subscribe()
+    delivered = 0
+    for i in range(n_messages):
+        hub.publish("round", {"period": str(i)})
+        await asyncio.sleep(0)
+        while live.pending:
+            live.pending.popleft()
+            delivered += 1
+    print(f"in-process, {n_messages} events: stalled subscriber dropped: {stalled.closed} "
+          f"(holding {len(stalled.pending)} item), live subscriber received {delivered}")
+    return stalled.closed and delivered == n_messages
+
+
+def run(n_subscribers, n_rounds):
+    workdir = tempfile.mkdtemp(prefix="push_bench_")
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    server = subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/ready")
+                break
+            except Exception:
+                if time.time() > deadline:
+                    raise RuntimeError("server did not become ready")
+                time.sleep(0.1)
+        asyncio.run(run_async(port, server.pid, n_subscribers, n_rounds))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return asyncio.run(slow_subscriber_check(1000))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.subscribers, args.rounds) else 1)
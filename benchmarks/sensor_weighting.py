@@ -0,0 +1,91 @@
+"""
+Sensor weighting cost versus the number of sensors: the previous dict loop,
+get_weighted_prediction one request at a time, and the vectorized
+get_weighted_predictions over a batch. Also times update_weights per round for
+each update rule, and checks that both paths' predictions match the dict loop
+(batch confidences can differ in the last bits from 8 sensors on, where NumPy
+sums pairwise).
+
+Run from the repository root:
+    python -m benchmarks.sensor_weighting --sensors 3 30 100 --requests 2000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from dynamic_weighting import DynamicWeighting, UPDATE_RULES
+
+
+def legacy_weighted_prediction(weights, sensor_outputs):
+    """The previous implementation: a loop over the dict, re-summing the weights per call."""
+    score = 0
+    total_weight = sum(weights.values())
+    for sensor, prediction in sensor_outputs.items():
+        weight = weights.get(sensor, 0)
+        val = 1 if prediction == "Big" else -1
+        score += val * weight
+    final_pred = "Big" if score >= 0 else "Small"
+    confidence = abs(score) / total_weight if total_weight > 0 else 0.5
+    return final_pred, confidence
+
+
+def requests_for(sensors, n_requests, rng):
+    return [{sensor: rng.choice(["Big", "Small"]) for sensor in sensors} for _ in range(n_requests)]
+
+
+def us_per_request(fn, requests):
+    start = time.perf_counter()
+    fn(requests)
+    return (time.perf_counter() - start) / len(requests) * 1e6
+
+
+def run(sensor_counts, n_requests):
+    workdir = tempfile.mkdtemp(prefix="sensor_weighting_bench_")
+    rng = random.Random(0)
+    try:
+        print(f"{'sensors':>8}{'dict loop':>12}{'single':>12}{'batch':>12}{'pred diff':>12}{'max conf diff':>15}   (us/request)")
+        for n_sensors in sensor_counts:
+            sensors = [f"Sensor {i}" for i in range(n_sensors)]
+            weighting = DynamicWeighting(sensors, os.path.join(workdir, f"weights_{n_sensors}.json"))
+            weighting.store.paused = True
+            # Spread the weights out with a few hundred rounds of the default rule
+            for outcomes in requests_for(sensors, 500, rng):
+                weighting.update_weights(outcomes, rng.choice(["Big", "Small"]))
+            requests = requests_for(sensors, n_requests, rng)
+            weights = weighting.weights
+
+            pairs = [(legacy_weighted_prediction(weights, r), weighting.get_weighted_prediction(r)) for r in requests]
+            pairs += zip([legacy_weighted_prediction(weights, r) for r in requests], weighting.get_weighted_predictions(requests))
+            mismatches = sum(old[0] != new[0] for old, new in pairs)
+            max_diff = max(abs(old[1] - new[1]) for old, new in pairs)
+            legacy = us_per_request(lambda rs: [legacy_weighted_prediction(weights, r) for r in rs], requests)
+            single = us_per_request(lambda rs: [weighting.get_weighted_prediction(r) for r in rs], requests)
+            batch = us_per_request(weighting.get_weighted_predictions, requests)
+            print(f"{n_sensors:>8}{legacy:>12.2f}{single:>12.2f}{batch:>12.2f}{mismatches:>12}{max_diff:>15.1e}")
+
+        n_sensors = sensor_counts[-1]
+        sensors = [f"Sensor {i}" for i in range(n_sensors)]
+        rounds = requests_for(sensors, n_requests, rng)
+        print(f"\nupdate_weights with {n_sensors} sensors, update_every=5 (us/round, journal paused)")
+        for rule in UPDATE_RULES:
+            weighting = DynamicWeighting(sensors, os.path.join(workdir, f"update_{rule}.json"), update_rule=rule)
+            weighting.store.paused = True
+            start = time.perf_counter()
+            for outcomes in rounds:
+                weighting.update_weights(outcomes, rng.choice(["Big", "Small"]))
+            per_round = (time.perf_counter() - start) / len(rounds) * 1e6
+            spread = sorted(weighting.weights.values())
+            print(f"{rule:<16}{per_round:>10.2f}   weights {spread[0]:.3f} .. {spread[-1]:.3f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sensors", type=int, nargs="+", default=[3, 30, 100])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.sensors, args.requests)
@@ -0,0 +1,92 @@
+"""
+Hard (majority label) versus soft (accuracy-weighted probability) voting on
+the same held-out rows and the same fitted top-3 models: accuracy, log loss,
+how many distinct confidence values each produces, and time per batch.
+With --calibration, the models are wrapped in CalibratedClassifierCV.
+
+Run from the repository root:
+    python -m benchmarks.soft_voting --rows 2000 --calibration sigmoid
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from ensemble_models import EnsembleManager
+from features import FeatureSpec
+
+
+def synthetic_rounds(n_rows, noise, seed):
+    """Outcome sequences with a learnable rule (sum of the last two codes mod 3) plus noise."""
+    rng = np.random.default_rng(seed)
+    codes = list(rng.integers(0, 3, size=10))
+    for _ in range(n_rows):
+        nxt = (codes[-1] + codes[-2]) % 3
+        if rng.random() < noise:
+            nxt = int(rng.integers(0, 3))
+        codes.append(int(nxt))
+    spec = FeatureSpec()
+    windows = spec.windows_from_sequence(np.array(codes, dtype=np.uint8))[10:]
+    histories = [[spec.decode(c) for c in codes[i:i + 10]] for i in range(n_rows)]
+    return histories, np.array(codes[10:]), windows
+
+
+def evaluate(manager, histories, outcomes):
+    start = time.perf_counter()
+    results = manager.predict_ensemble_batch(histories)
+    seconds = time.perf_counter() - start
+    vocabulary = manager.feature_spec.vocabulary
+    predicted = np.array([vocabulary.index(r["prediction"]) for r in results])
+    confidences = np.array([r["confidence"] for r in results]) / 100.0
+    # Log loss of the winning label's confidence when right, its complement spread otherwise
+    p_actual = np.where(predicted == outcomes, confidences, (1 - confidences) / 2)
+    return {
+        "accuracy": float((predicted == outcomes).mean()),
+        "log_loss": float(-np.log(np.clip(p_actual, 1e-6, 1)).mean()),
+        "confidence_levels": len(np.unique(np.round(confidences, 4))),
+        "ms": seconds * 1000.0,
+    }
+
+
+def run(n_rows, noise, calibration):
+    workdir = tempfile.mkdtemp(prefix="soft_voting_bench_")
+    try:
+        histories, outcomes, windows = synthetic_rounds(2 * n_rows, noise, seed=0)
+        train, test = slice(0, n_rows), slice(n_rows, 2 * n_rows)
+
+        manager = EnsembleManager(
+            db_path=os.path.join(workdir, "game_data.db"), model_dir=os.path.join(workdir, "models"),
+            executor="serial", prediction_cache_size=0, calibration=calibration
+        )
+        np.random.seed(0)
+        manager.train_all(windows[train], outcomes[train])
+        # Rank models by accuracy on the training rows, as the rolling accuracy would live
+        for name in manager.model_names:
+            model = manager.get_model(name)
+            if model is not None:
+                manager.performance[name]["accuracy"] = float((model.predict(windows[train]) == outcomes[train]).mean())
+
+        print(f"{n_rows} held-out rows, noise {noise}, calibration {calibration}, top 3: {manager.get_top_3()}")
+        print(f"{'voting':<8}{'accuracy':>10}{'log loss':>10}{'levels':>8}{'ms':>10}")
+        results = {}
+        for voting in ("hard", "soft"):
+            manager.voting = voting
+            results[voting] = evaluate(manager, histories[test], outcomes[test])
+            r = results[voting]
+            print(f"{voting:<8}{r['accuracy']:>10.4f}{r['log_loss']:>10.4f}{r['confidence_levels']:>8}{r['ms']:>10.2f}")
+        manager.trainer.shutdown()
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=0.3)
+    parser.add_argument("--calibration", choices=["sigmoid", "isotonic"])
+    args = parser.parse_args()
+    run(args.rows, args.noise, args.calibration)
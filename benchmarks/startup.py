@@ -0,0 +1,102 @@
+"""
+Cold-start cost of the API process, measured in fresh interpreters:
+- import: `import main` (must not pull in sklearn, xgboost, pandas or joblib)
+- ready: lifespan startup until /ready returns 200 (ensemble warmed up)
+- first predict: the first /predict after that
+
+Exits non-zero when a heavy library is imported eagerly again or the import
+time exceeds --max-import-seconds, so it can guard against regressions.
+
+Run from the repository root:
+    python -m benchmarks.startup --repeats 3 --max-import-seconds 1.0
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("sklearn", "xgboost", "pandas", "joblib")
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+heavy = sorted(name for name in %(heavy)r if name in sys.modules)
+
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    lifespan_done = time.perf_counter()
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.005)
+    ready = time.perf_counter()
+    client.post("/predict", json={"period": "1", "history": ["Red", "Green"] * 6, "sensor_outputs": {}})
+    predicted = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "lifespan": lifespan_done - imported,
+    "ready": ready - imported,
+    "first_predict": predicted - ready,
+    "heavy_at_import": heavy,
+}))
+"""
+
+
+def seed_models(workdir):
+    """Fitted models on disk, so the warm-up has real files to load."""
+    from ensemble_models import EnsembleManager
+    manager = EnsembleManager(db_path=os.path.join(workdir, "game_data.db"),
+                              model_dir=os.path.join(workdir, "models"), executor="serial")
+    rng = np.random.default_rng(0)
+    manager.train_all(rng.integers(0, 3, size=(100, 10)), rng.integers(0, 3, size=100))
+    manager.trainer.shutdown()
+
+
+def measure_once(workdir):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD % {"heavy": HEAVY_MODULES}],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(repeats, max_import_seconds):
+    workdir = tempfile.mkdtemp(prefix="startup_bench_")
+    try:
+        shutil.copy(os.path.join(REPO_ROOT, "index.html"), workdir)
+        seed_models(workdir)
+        samples = [measure_once(workdir) for _ in range(repeats)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"API cold start over {repeats} fresh interpreters (median seconds)")
+    for key in ("import", "lifespan", "ready", "first_predict"):
+        print(f"{key:<16}{statistics.median(s[key] for s in samples):>10.3f}")
+    heavy = sorted({name for s in samples for name in s["heavy_at_import"]})
+    print("heavy modules at import:", ", ".join(heavy) if heavy else "none")
+
+    failures = []
+    if heavy:
+        failures.append(f"importing main loads {', '.join(heavy)}")
+    import_seconds = statistics.median(s["import"] for s in samples)
+    if max_import_seconds is not None and import_seconds > max_import_seconds:
+        failures.append(f"import took {import_seconds:.3f}s (limit {max_import_seconds}s)")
+    for failure in failures:
+        print("REGRESSION:", failure)
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.repeats, args.max_import_seconds) else 1)
@@ -1,15 +1,31 @@
+"""
+Runs the 7-day retention once, e.g. from a daily cron job. The API server
+already does this hourly in the background; this is for servers started
+without it or for archiving on demand.
+
+Only needs the database layer, so it does not load sklearn/xgboost.
+
+Usage:
+    python cleanup.py [--days 7] [--archive-dir archive]
+"""
+import argparse
+
 from database import GameDatabase
-from ensemble_models import EnsembleManager
-import os
+from retention import RetentionJanitor
 
-def run_cleanup():
+def run_cleanup(days=7, archive_dir=None, db_path="game_data.db"):
     print("Starting daily cleanup...")
-    db = GameDatabase()
-    db.cleanup_old_data(days=7)
-    
-    ensemble = EnsembleManager()
-    ensemble.cleanup_old_data(days=7)
+    # Creates game_results if it does not exist yet
+    GameDatabase(db_path)
+    deleted = RetentionJanitor(db_path, days=days, archive_dir=archive_dir).run_once()
+    for table, count in deleted.items():
+        print(f"Deleted {count} rows from {table}" + (f" (archived to {archive_dir})" if archive_dir and table != "outcomes" else ""))
     print("Cleanup completed successfully.")
 
 if __name__ == "__main__":
-    run_cleanup()
+    parser = argparse.ArgumentParser(description="Delete (and optionally archive) rows older than the retention period.")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--archive-dir", help="append expired rows to gzip'd JSON-lines files here before deleting")
+    parser.add_argument("--db", default="game_data.db")
+    args = parser.parse_args()
+    run_cleanup(args.days, args.archive_dir, args.db)
@@ -1,58 +1,351 @@
-import sqlite3
+import json
 import os
 
+import numpy as np
+
+from metrics import registry as metrics
+from storage import get_pool
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Game table that requests without a table_id, and rows written before tables existed, belong to
+DEFAULT_TABLE = "default"
+
+# Shared with EnsembleManager's queries
+DB_QUERY_SECONDS = metrics.histogram("db_query_seconds", "SQLite query time including commit", ["query"])
+
+def load_columns(directory):
+    """The columns export_columns() wrote, memory-mapped read-only, plus "labels"."""
+    columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+               for name in ("outcomes", "history_end", "history_len", "actual")}
+    with open(os.path.join(directory, "labels.json")) as f:
+        columns["labels"] = json.load(f)
+    return columns
+
+
+class OutcomeStream:
+    """
+    Every game table's outcomes in order, each stored once as a small integer
+    code in `outcomes` (table_id, pos), with the labels in `outcome_labels`.
+
+    A round's history is a slice of its table's stream: game_results keeps
+    history_end and history_len, and the history is the outcomes at positions
+    history_end - history_len up to history_end. Saving a history appends only
+    what follows its longest prefix already at the end of the stream, so the
+    sliding windows of consecutive rounds add one outcome each. A prefix never
+    reaches back past the previous round's start, so starts only grow with id
+    and a table's oldest round bounds what the stream still needs.
+    """
+
+    CREATE = (
+        """
+        CREATE TABLE IF NOT EXISTS outcome_labels (
+            code INTEGER PRIMARY KEY,
+            label TEXT UNIQUE NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS outcomes (
+            table_id TEXT NOT NULL,
+            pos INTEGER NOT NULL,
+            code INTEGER NOT NULL,
+            PRIMARY KEY (table_id, pos)
+        ) WITHOUT ROWID
+        """,
+    )
+
+    def __init__(self):
+        # label <-> code; codes are never reassigned, so these stay valid across processes
+        self._codes = {}
+        self._labels = []
+
+    def init(self, conn):
+        for sql in self.CREATE:
+            conn.execute(sql)
+
+    def codes(self, conn, labels):
+        """Codes for `labels`, adding the ones never seen before. Call inside a write transaction."""
+        missing = [label for label in dict.fromkeys(labels) if label not in self._codes]
+        if missing:
+            conn.executemany("INSERT OR IGNORE INTO outcome_labels (label) VALUES (?)", [(label,) for label in missing])
+            self._load_labels(conn)
+        return [self._codes[label] for label in labels]
+
+    def labels(self, conn):
+        """Every label, indexed by code."""
+        if not self._labels or conn.execute("SELECT COUNT(*) FROM outcome_labels").fetchone()[0] != len(self._labels):
+            self._load_labels(conn)
+        return list(self._labels)
+
+    def _load_labels(self, conn):
+        rows = conn.execute("SELECT code, label FROM outcome_labels ORDER BY code").fetchall()
+        labels = [None] * (rows[-1][0] + 1 if rows else 0)
+        for code, label in rows:
+            labels[code] = label
+        self._labels = labels
+        self._codes = {label: code for code, label in rows}
+
+    def tail(self, conn, table_id, max_len):
+        """
+        (end, floor, tail) for appending to a table's stream: its next position,
+        the position no new history may start before, and the codes from
+        max(floor, end - max_len) up to end.
+        """
+        end = conn.execute("SELECT COALESCE(MAX(pos) + 1, 0) FROM outcomes WHERE table_id = ?", (table_id,)).fetchone()[0]
+        row = conn.execute(
+            "SELECT history_end - history_len FROM game_results WHERE table_id = ? ORDER BY id DESC LIMIT 1",
+            (table_id,)
+        ).fetchone()
+        if row is None:
+            return end, end, []
+        floor = row[0]
+        codes = conn.execute(
+            "SELECT code FROM outcomes WHERE table_id = ? AND pos >= ? AND pos < ? ORDER BY pos",
+            (table_id, max(floor, end - max_len), end)
+        ).fetchall()
+        return end, floor, [code for (code,) in codes]
+
+    @staticmethod
+    def overlap(tail, codes):
+        """Length of the longest prefix of `codes` that `tail` ends with."""
+        for k in range(min(len(tail), len(codes)), 0, -1):
+            if tail[len(tail) - k:] == codes[:k]:
+                return k
+        return 0
+
+    def read(self, conn, table_id, start, end):
+        """Codes at positions start up to end of a table's stream, as a uint16 array."""
+        rows = conn.execute(
+            "SELECT code FROM outcomes WHERE table_id = ? AND pos >= ? AND pos < ? ORDER BY pos", (table_id, start, end)
+        ).fetchall()
+        return np.fromiter((code for (code,) in rows), dtype=np.uint16, count=len(rows))
+
+    def histories(self, conn, refs):
+        """History label lists for (table_id, history_end, history_len) refs, one stream read per table."""
+        labels = self.labels(conn)
+        spans = {}
+        for table_id, end, length in refs:
+            start, stop = spans.get(table_id, (end - length, end))
+            spans[table_id] = (min(start, end - length), max(stop, end))
+        streams = {table_id: (start, self.read(conn, table_id, start, stop).tolist())
+                   for table_id, (start, stop) in spans.items()}
+        histories = []
+        for table_id, end, length in refs:
+            base, codes = streams[table_id]
+            histories.append([labels[code] for code in codes[end - length - base:end - base]])
+        return histories
+
+    def trim_bound(self, conn, table_id):
+        """First position a table's stored rounds still need; everything before it can go."""
+        row = conn.execute(
+            "SELECT history_end - history_len FROM game_results WHERE table_id = ? ORDER BY id LIMIT 1", (table_id,)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        return conn.execute("SELECT COALESCE(MAX(pos) + 1, 0) FROM outcomes WHERE table_id = ?", (table_id,)).fetchone()[0]
+
+
 class GameDatabase:
-    def __init__(self, db_path="game_data.db"):
+    INSERT_RESULT = '''
+        INSERT INTO game_results (period, history_end, history_len, prediction, actual_outcome, confidence, bet_amount, is_win, table_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    INSERT_RESULT_AT = '''
+        INSERT INTO game_results (period, history_end, history_len, prediction, actual_outcome, confidence, bet_amount, is_win, table_id, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    CREATE_RESULTS = '''
+        CREATE TABLE IF NOT EXISTS game_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            period TEXT,
+            history_end INTEGER NOT NULL DEFAULT 0,
+            history_len INTEGER NOT NULL DEFAULT 0,
+            prediction TEXT,
+            actual_outcome TEXT,
+            confidence REAL,
+            bet_amount REAL,
+            is_win INTEGER,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            table_id TEXT NOT NULL DEFAULT 'default',
+            UNIQUE (table_id, period)
+        )
+    '''
+
+    def __init__(self, db_path="game_data.db", clock=None):
         self.db_path = db_path
+        # clock() -> datetime. When set (backtests), rows are stamped with it instead of
+        # CURRENT_TIMESTAMP and cleanup measures age against it.
+        self.clock = clock
+        self._insert_sql = self.INSERT_RESULT_AT if clock else self.INSERT_RESULT
+        self.pool = get_pool(db_path)
+        self.outcomes = OutcomeStream()
         self._init_db()
 
     def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        # Table for game results
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS game_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                period TEXT UNIQUE,
-                history TEXT,
-                prediction TEXT,
-                actual_outcome TEXT,
-                confidence REAL,
-                bet_amount REAL,
-                is_win INTEGER,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        conn.close()
-
-    def save_result(self, period, history, prediction, actual_outcome, confidence, bet_amount):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.pool.transaction() as conn:
+            # IMMEDIATE: workers starting together migrate once, one after the other
+            conn.execute("BEGIN IMMEDIATE")
+            self.outcomes.init(conn)
+            # Table for game results, partitioned by game table: periods are unique per table
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(game_results)")]
+            migrate = columns and ("table_id" not in columns or "history" in columns)
+            if migrate:
+                self._migrate_results(conn, columns)
+            conn.execute(self.CREATE_RESULTS)
+            # Recent results and training windows per table; (table_id, timestamp) also serves the hour/day counts
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_game_results_table_id ON game_results (table_id, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_game_results_table_ts ON game_results (table_id, timestamp)")
+        if migrate:
+            # Hands the space the history strings took back to the filesystem
+            with self.pool.connection() as conn:
+                conn.execute("VACUUM")
+
+    def _migrate_results(self, conn, columns):
+        """
+        Rebuilds an older game_results: comma-joined history strings move into
+        the outcome stream, and rows from before game tables go to the default table.
+        """
+        print("Migrating game_results to the outcome stream...")
+        conn.execute("ALTER TABLE game_results RENAME TO game_results_old")
+        conn.execute(self.CREATE_RESULTS)
+        kept = [c for c in ("id", "period", "prediction", "actual_outcome", "confidence", "bet_amount", "is_win", "timestamp")
+                if c in columns]
+        table = "table_id" if "table_id" in columns else f"'{DEFAULT_TABLE}'"
+        history = "history" if "history" in columns else "''"
+        cursor = conn.execute(f"SELECT {table}, {history}, {','.join(kept)} FROM game_results_old ORDER BY id")
+        insert = (f"INSERT INTO game_results (table_id, history_end, history_len, {','.join(kept)}) "
+                  f"VALUES ({','.join('?' * (len(kept) + 3))})")
+        streams = {}
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            refs, appended = self._plan_histories(conn, [(row[0], row[1].split(",") if row[1] else []) for row in rows], streams)
+            conn.executemany("INSERT INTO outcomes (table_id, pos, code) VALUES (?, ?, ?)", appended)
+            conn.executemany(insert, [(row[0],) + ref + tuple(row[2:]) for row, ref in zip(rows, refs)])
+        conn.execute("DROP TABLE game_results_old")
+
+    def _plan_histories(self, conn, histories, streams):
+        """
+        Places (table_id, history) pairs on their tables' streams in order.
+        Returns each one's (history_end, history_len) and the outcome rows to
+        insert. `streams` carries each table's (end, floor, tail) between calls.
+        """
+        codes = self.outcomes.codes(conn, [label for _, history in histories for label in history])
+        refs = []
+        appended = []
+        offset = 0
+        for table_id, history in histories:
+            history_codes = codes[offset:offset + len(history)]
+            offset += len(history)
+            if table_id not in streams:
+                streams[table_id] = self.outcomes.tail(conn, table_id, max(len(history), 64))
+            end, floor, tail = streams[table_id]
+            k = OutcomeStream.overlap(tail[max(len(tail) - (end - floor), 0):], history_codes)
+            new = history_codes[k:]
+            appended.extend((table_id, end + i, code) for i, code in enumerate(new))
+            end += len(new)
+            refs.append((end, len(history)))
+            # The next history may overlap this one, but not reach back before it
+            tail = (tail + new)[-max(len(history), 64):]
+            streams[table_id] = (end, end - len(history), tail)
+        return refs, appended
+
+    def _result_row(self, ref, period, history, prediction, actual_outcome, confidence, bet_amount, table_id=DEFAULT_TABLE):
         is_win = 1 if prediction == actual_outcome else 0
-        try:
-            cursor.execute('''
-                INSERT INTO game_results (period, history, prediction, actual_outcome, confidence, bet_amount, is_win)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (period, ",".join(history), prediction, actual_outcome, confidence, bet_amount, is_win))
-            conn.commit()
-        except sqlite3.IntegrityError:
-            # Period already exists, skip or update
-            pass
-        conn.close()
-
-    def get_recent_results(self, limit=100):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT actual_outcome FROM game_results ORDER BY id DESC LIMIT ?', (limit,))
-        results = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return results
+        row = (period,) + ref + (prediction, actual_outcome, confidence, bet_amount, is_win, table_id)
+        if self.clock:
+            row += (self.clock().strftime(TIMESTAMP_FORMAT),)
+        return row
+
+    def save_result(self, period, history, prediction, actual_outcome, confidence, bet_amount, table_id=DEFAULT_TABLE):
+        self.save_results([(period, history, prediction, actual_outcome, confidence, bet_amount, table_id)],
+                          query="save_result")
+
+    def save_results(self, results, query="save_results"):
+        """
+        Saves many rounds in one transaction. `results` holds save_result argument
+        tuples. A period that already exists in its table is skipped.
+        """
+        results = [result if len(result) == 7 else tuple(result) + (DEFAULT_TABLE,) for result in results]
+        with DB_QUERY_SECONDS.time(query), self.pool.transaction() as conn:
+            # IMMEDIATE: the stream tail read below must still be the tail when the rows go in
+            conn.execute("BEGIN IMMEDIATE")
+            seen = set()
+            fresh = []
+            for result in results:
+                key = (result[6], result[0])
+                if key in seen or conn.execute(
+                    "SELECT 1 FROM game_results WHERE table_id = ? AND period = ?", key
+                ).fetchone() is not None:
+                    continue
+                seen.add(key)
+                fresh.append(result)
+            refs, appended = self._plan_histories(conn, [(result[6], list(result[1])) for result in fresh], {})
+            conn.executemany("INSERT INTO outcomes (table_id, pos, code) VALUES (?, ?, ?)", appended)
+            conn.executemany(self._insert_sql, [self._result_row(ref, *result) for ref, result in zip(refs, fresh)])
+
+    def get_histories(self, refs):
+        """History label lists for (table_id, history_end, history_len) triples read from game_results."""
+        with DB_QUERY_SECONDS.time("get_histories"), self.pool.transaction() as conn:
+            conn.execute("BEGIN")
+            return self.outcomes.histories(conn, refs)
+
+    def export_columns(self, directory, table_id=DEFAULT_TABLE):
+        """
+        Writes one table's rounds as .npy columns for training without the
+        database: outcomes (the stream's codes), history_end and history_len
+        (positions into outcomes), actual (codes) and labels.json. load_columns()
+        memory-maps them back.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with DB_QUERY_SECONDS.time("export_columns"), self.pool.transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT history_end, history_len, actual_outcome FROM game_results WHERE table_id = ? ORDER BY id",
+                (table_id,)
+            ).fetchall()
+            ends = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            lengths = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+            base = int((ends - lengths).min()) if rows else 0
+            outcomes = self.outcomes.read(conn, table_id, base, int(ends.max()) if rows else 0)
+            actual = np.array(self.outcomes.codes(conn, [row[2] for row in rows]), dtype=np.uint16)
+            labels = self.outcomes.labels(conn)
+        for name, column in (("outcomes", outcomes), ("history_end", ends - base), ("history_len", lengths), ("actual", actual)):
+            np.save(os.path.join(directory, f"{name}.npy"), column)
+        with open(os.path.join(directory, "labels.json"), "w") as f:
+            json.dump(labels, f)
+        return len(rows)
+
+    def get_recent_results(self, limit=100, table_id=None):
+        """Newest first; across every table unless `table_id` is given."""
+        with DB_QUERY_SECONDS.time("get_recent_results"), self.pool.connection() as conn:
+            if table_id is None:
+                cursor = conn.execute('SELECT actual_outcome FROM game_results ORDER BY id DESC LIMIT ?', (limit,))
+            else:
+                cursor = conn.execute(
+                    'SELECT actual_outcome FROM game_results WHERE table_id = ? ORDER BY id DESC LIMIT ?', (table_id, limit)
+                )
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_hourly_outcome_counts(self, since, table_id=None):
+        """(hour 'YYYY-MM-DD HH', outcome, count) for results stamped at or after `since`, oldest first."""
+        with DB_QUERY_SECONDS.time("get_hourly_outcome_counts"), self.pool.connection() as conn:
+            if table_id is None:
+                cursor = conn.execute('''
+                    SELECT substr(timestamp, 1, 13) AS hour, actual_outcome, COUNT(*)
+                    FROM game_results WHERE timestamp >= ?
+                    GROUP BY hour, actual_outcome ORDER BY hour
+                ''', (since,))
+            else:
+                cursor = conn.execute('''
+                    SELECT substr(timestamp, 1, 13) AS hour, actual_outcome, COUNT(*)
+                    FROM game_results WHERE table_id = ? AND timestamp >= ?
+                    GROUP BY hour, actual_outcome ORDER BY hour
+                ''', (table_id, since))
+            return cursor.fetchall()
 
     def cleanup_old_data(self, days=7):
-        from datetime import datetime, timedelta
-        conn = sqlite3.connect(self.db_path)
-        cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
-        conn.execute("DELETE FROM game_results WHERE timestamp < ?", (cutoff,))
-        conn.commit()
-        conn.close()
+        """Deletes results older than `days` in indexed chunks (see RetentionJanitor)."""
+        from retention import RetentionJanitor
+        return RetentionJanitor(self.db_path, days=days, clock=self.clock).run_once(["game_results"])
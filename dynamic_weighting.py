@@ -1,80 +1,305 @@
-import json
-import os
+import itertools
+from contextlib import contextmanager
+
+import numpy as np
+
+from journal import JournaledStore
+
+DEFAULT_SENSORS = ["CID Sensor", "Dragon Logic", "Trend Sensor"]
+
+# Requests x sensors below which the dict loop scores a group faster than NumPy
+VECTOR_MIN_VOTES = 256
+
+
+class StepRule:
+    """
+    The original rule: a sensor that won at least `high` of the rounds since the
+    last update gets its weight multiplied by `up`, one that won at most `low`
+    of them by `down` (4 and 2 of 5 rounds by default).
+    """
+
+    def __init__(self, up=1.2, down=0.8, high=0.8, low=0.4, bounds=(0.1, 5.0)):
+        self.up = up
+        self.down = down
+        self.high = high
+        self.low = low
+        self.bounds = bounds
+
+    def apply(self, weights, wins, rounds):
+        factor = np.where(wins >= self.high * rounds, self.up, np.where(wins <= self.low * rounds, self.down, 1.0))
+        return np.clip(weights * factor, *self.bounds)
+
+
+class EwmaRule:
+    """Moves each weight towards `scale` x its hit rate since the last update (1.0 at 50%)."""
+
+    def __init__(self, alpha=0.3, scale=2.0, bounds=(0.1, 5.0)):
+        self.alpha = alpha
+        self.scale = scale
+        self.bounds = bounds
+
+    def apply(self, weights, wins, rounds):
+        target = self.scale * wins / rounds
+        return np.clip((1 - self.alpha) * weights + self.alpha * target, *self.bounds)
+
+
+class MultiplicativeWeightsRule:
+    """Multiplicative weights: every round a sensor missed costs a factor of (1 - eta)."""
+
+    def __init__(self, eta=0.1, bounds=(0.1, 5.0)):
+        self.eta = eta
+        self.bounds = bounds
+
+    def apply(self, weights, wins, rounds):
+        return np.clip(weights * (1 - self.eta) ** (rounds - wins), *self.bounds)
+
+
+UPDATE_RULES = {"step": StepRule, "ewma": EwmaRule, "multiplicative": MultiplicativeWeightsRule}
+
+
+class WeightSnapshot:
+    """
+    One published set of weights: the vector, a copy padded with a trailing 0
+    for unknown sensors, the name -> weight dict, their total, and the name ->
+    slot map the vector was built with. Never changed after publishing, so a
+    reader holding an older snapshot stays consistent while new sensors get slots.
+    """
+
+    __slots__ = ("vector", "padded", "by_name", "total", "index", "_columns")
+
+    def __init__(self, vector, by_name, index):
+        self.vector = vector
+        self.padded = np.append(vector, 0.0)
+        self.by_name = by_name
+        # Summed in slot order like the dict loop did
+        self.total = sum(by_name.values())
+        self.index = index
+        self._columns = {}
+
+    def columns(self, sensors):
+        """Slots for a tuple of sensor names, -1 for unknown ones. Clients send the same sensors every round."""
+        columns = self._columns.get(sensors)
+        if columns is None:
+            if len(self._columns) >= 1024:
+                self._columns = {}
+            columns = self._columns[sensors] = np.array([self.index.get(sensor, -1) for sensor in sensors], dtype=np.intp)
+        return columns
+
 
 class DynamicWeighting:
-    def __init__(self, sensors, storage_path="sensor_weights.json"):
+    """
+    Sensor weights held in NumPy vectors, one slot per sensor name, so many
+    requests can be scored in one pass (get_weighted_predictions): a gather of
+    their weights plus one signed sum per row. A single request is cheaper as
+    a plain loop over the weight dict, so get_weighted_prediction does that.
+    Readers take the current WeightSnapshot, which update_weights replaces.
+
+    Every `update_every` rounds `update_rule` ("step", "ewma", "multiplicative"
+    or a rule object with apply(weights, wins, rounds)) turns the win counts
+    into new weights. Only the configured `sensors` are re-weighted; a weight
+    loaded for another sensor still counts but is left as it is.
+
+    Persisted state keeps the original dict layout, and `weights` and
+    `temp_performance` still read as dicts.
+    """
+
+    def __init__(self, sensors, storage_path="sensor_weights.json", compact_every=1000, update_every=5,
+                 update_rule="step"):
         self.storage_path = storage_path
         self.sensors = sensors
+        # Rounds between weight updates
+        self.update_every = update_every
+        self.update_rule = UPDATE_RULES[update_rule]() if isinstance(update_rule, str) else update_rule
+        self.store = JournaledStore(storage_path, compact_every=compact_every)
         self.data = self._load_data()
-        self.round_counter = self.data.get("round_counter", 0)
-        self.weights = self.data.get("weights", {sensor: 1.0 for sensor in self.sensors})
-        self.temp_performance = self.data.get("temp_performance", {sensor: 0 for sensor in self.sensors})
+        self._restore(self.data)
+
+    def _restore(self, data):
+        self.round_counter = data.get("round_counter", 0)
+
+        loaded_weights = data.get("weights", {})
+        loaded_performance = data.get("temp_performance", {})
+        # Slot order follows the persisted weights, so sums run in the same order as before
+        self.names = []
+        self.index = {}
+        for sensor in list(loaded_weights) + list(self.sensors) + list(loaded_performance):
+            self._slot(sensor)
+        self._has_weight = np.zeros(len(self.names), dtype=bool)
+        weights = np.zeros(len(self.names))
+        for sensor, weight in loaded_weights.items():
+            weights[self.index[sensor]] = weight
+            self._has_weight[self.index[sensor]] = True
+        for sensor in self.sensors:
+            if not self._has_weight[self.index[sensor]]:
+                weights[self.index[sensor]] = 1.0
+                self._has_weight[self.index[sensor]] = True
+        self._configured = np.isin(np.arange(len(self.names)), [self.index[s] for s in self.sensors])
+        self._tracked = self._configured.copy()
+        self._wins = np.zeros(len(self.names), dtype=np.int64)
+        for sensor, wins in loaded_performance.items():
+            self._wins[self.index[sensor]] = wins
+            self._tracked[self.index[sensor]] = True
+        self._column_cache = {}
+        self._publish(weights)
+
+    def _slot(self, sensor):
+        i = self.index.get(sensor)
+        if i is None:
+            i = self.index[sensor] = len(self.names)
+            self.names.append(sensor)
+        return i
+
+    def _grow(self, n):
+        """Extends the vectors after new sensor names got slots (unweighted, untracked)."""
+        extra = n - len(self._wins)
+        self._has_weight = np.concatenate([self._has_weight, np.zeros(extra, dtype=bool)])
+        self._configured = np.concatenate([self._configured, np.zeros(extra, dtype=bool)])
+        self._tracked = np.concatenate([self._tracked, np.zeros(extra, dtype=bool)])
+        self._wins = np.concatenate([self._wins, np.zeros(extra, dtype=np.int64)])
+        self._column_cache = {}
+        self._publish(np.concatenate([self._snapshot.vector, np.zeros(extra)]))
+
+    def _publish(self, weights):
+        # Readers take the snapshot in one reference read, so they never see a partial update
+        by_name = {sensor: float(weights[i]) for i, sensor in enumerate(self.names) if self._has_weight[i]}
+        self._snapshot = WeightSnapshot(weights, by_name, dict(self.index))
+
+    @property
+    def weights(self):
+        return self._snapshot.by_name
+
+    @property
+    def temp_performance(self):
+        return {sensor: int(self._wins[i]) for i, sensor in enumerate(self.names) if self._tracked[i]}
 
     def _load_data(self):
-        if os.path.exists(self.storage_path):
-            try:
-                with open(self.storage_path, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                pass
+        data = self.store.load()
+        if data:
+            return data
         return {
-            "round_counter": 0, 
-            "weights": {sensor: 1.0 for sensor in self.sensors}, 
+            "round_counter": 0,
+            "weights": {sensor: 1.0 for sensor in self.sensors},
             "temp_performance": {sensor: 0 for sensor in self.sensors}
         }
 
-    def _save_data(self):
-        data = {
+    def _state(self):
+        return {
             "round_counter": self.round_counter,
             "weights": self.weights,
             "temp_performance": self.temp_performance
         }
-        with open(self.storage_path, 'w') as f:
-            json.dump(data, f, indent=4)
+
+    def export_state(self):
+        """The persisted dict layout, also used for the shared state checkpoints."""
+        return self._state()
+
+    def restore_state(self, state):
+        self._restore(state)
+
+    def _save_data(self, weights_changed):
+        # Appends the changed values to the journal; snapshots are compacted in the background
+        if self.store.paused:
+            return
+        state = self._state()
+        changes = state if weights_changed else {
+            "round_counter": state["round_counter"], "temp_performance": state["temp_performance"]
+        }
+        self.store.record(changes, state)
+
+    @contextmanager
+    def deferred_persistence(self):
+        """Skips per-update journaling inside the block and writes one snapshot at the end."""
+        self.store.paused = True
+        try:
+            yield self
+        finally:
+            self.store.paused = False
+            self.store.compact(self._state(), wait=True)
+
+    def _columns(self, sensors):
+        """Like WeightSnapshot.columns, against the live slot map. Writer thread only."""
+        cache = self._column_cache
+        columns = cache.get(sensors)
+        if columns is None:
+            if len(cache) >= 1024:
+                cache.clear()
+            columns = cache[sensors] = np.array([self.index.get(sensor, -1) for sensor in sensors], dtype=np.intp)
+        return columns
+
+    def _decide(self, score, total_weight):
+        final_pred = "Big" if score >= 0 else "Small"
+        confidence = abs(score) / total_weight if total_weight > 0 else 0.5
+        return final_pred, float(confidence)
 
     def get_weighted_prediction(self, sensor_outputs):
         """
         Returns final prediction and confidence level based on current weights.
         """
-        score = 0
-        total_weight = sum(self.weights.values())
-        
+        snapshot = self._snapshot  # one consistent set even if an update swaps it meanwhile
+        weights = snapshot.by_name
+        score = 0.0
         for sensor, prediction in sensor_outputs.items():
-            weight = self.weights.get(sensor, 0)
-            val = 1 if prediction == "Big" else -1
-            score += val * weight
-        
-        final_pred = "Big" if score >= 0 else "Small"
-        confidence = abs(score) / total_weight if total_weight > 0 else 0.5
-        
-        return final_pred, confidence
+            weight = weights.get(sensor, 0)
+            score += weight if prediction == "Big" else -weight
+        return self._decide(score, snapshot.total)
+
+    def get_weighted_predictions(self, sensor_outputs_list):
+        """
+        get_weighted_prediction for many requests. Requests naming the same sensors
+        are scored together: one gather of their weights, then one signed sum per
+        row. Groups under VECTOR_MIN_VOTES votes go through the plain loop instead.
+        """
+        snapshot = self._snapshot
+        groups = {}
+        for row, outputs in enumerate(sensor_outputs_list):
+            groups.setdefault(tuple(outputs), []).append(row)
+
+        results = [None] * len(sensor_outputs_list)
+        for sensors, rows in groups.items():
+            if len(rows) * len(sensors) < VECTOR_MIN_VOTES:
+                for row in rows:
+                    results[row] = self.get_weighted_prediction(sensor_outputs_list[row])
+                continue
+            # Unknown sensors (-1) pick the trailing 0 of `padded`, like weights.get(sensor, 0)
+            sensor_weights = snapshot.padded[snapshot.columns(sensors)]
+            votes = np.fromiter(
+                itertools.chain.from_iterable(sensor_outputs_list[row].values() for row in rows),
+                dtype=object, count=len(rows) * len(sensors)
+            )
+            big = (votes == "Big").reshape(len(rows), len(sensors))
+            scores = np.where(big, sensor_weights, -sensor_weights).sum(axis=1)
+            for row, score in zip(rows, scores):
+                results[row] = self._decide(float(score), snapshot.total)
+        return results
 
     def update_weights(self, sensor_outputs, actual_outcome):
-        """Tracks performance and updates weights every 5 rounds."""
+        """Tracks performance and updates weights every update_every rounds (5 by default)."""
         self.round_counter += 1
-        
-        for sensor, prediction in sensor_outputs.items():
-            if sensor not in self.temp_performance:
-                self.temp_performance[sensor] = 0
-            if prediction == actual_outcome:
-                self.temp_performance[sensor] += 1
-        
-        if self.round_counter >= 5:
+
+        sensors = tuple(sensor_outputs)
+        columns = self._columns(sensors)
+        if (columns < 0).any():
+            for sensor in sensors:
+                self._slot(sensor)
+            self._grow(len(self.names))
+            columns = self._columns(sensors)
+        # Dict keys are unique, so plain fancy-index increments are safe
+        self._tracked[columns] = True
+        self._wins[columns] += np.array([p == actual_outcome for p in sensor_outputs.values()], dtype=np.int64)
+
+        applied = self.round_counter >= self.update_every
+        if applied:
             self._apply_weight_updates()
             self.round_counter = 0
-            self.temp_performance = {sensor: 0 for sensor in self.sensors}
-            
-        self._save_data()
+            self._wins[:] = 0
+            self._tracked = self._configured.copy()
+
+        self._save_data(applied)
 
     def _apply_weight_updates(self):
-        """Adjusts weights based on performance in the last 5 rounds."""
-        for sensor in self.sensors:
-            wins = self.temp_performance.get(sensor, 0)
-            # If sensor won more than 3/5 rounds, increase weight
-            if wins >= 4:
-                self.weights[sensor] *= 1.2
-            elif wins <= 2:
-                self.weights[sensor] *= 0.8
-            
-            # Keep weights within bounds
-            self.weights[sensor] = max(0.1, min(self.weights[sensor], 5.0))
+        """Adjusts weights based on performance in the last update_every rounds."""
+        # Build the new weights aside and swap them in
+        weights = self._snapshot.vector.copy()
+        mask = self._configured
+        weights[mask] = self.update_rule.apply(weights[mask], self._wins[mask], self.update_every)
+        self._publish(weights)
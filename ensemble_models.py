@@ -1,21 +1,77 @@
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, ExtraTreesClassifier, AdaBoostClassifier
-from sklearn.linear_model import LogisticRegression, RidgeClassifier
-from sklearn.svm import SVC
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.naive_bayes import GaussianNB
-from sklearn.tree import DecisionTreeClassifier
-from xgboost import XGBClassifier
-import joblib
-import os
-import sqlite3
-from datetime import datetime, timedelta
+import copy
+from collections import Counter
+import threading
+import time
+
+from features import FeatureSpec
+from model_registry import ModelRegistry
+from model_executor import ModelExecutor
+from prediction_cache import PredictionCache
+from rolling_accuracy import RollingAccuracy
+from database import DB_QUERY_SECONDS, DEFAULT_TABLE, TIMESTAMP_FORMAT, OutcomeStream
+from metrics import registry as metrics
+from storage import get_pool
+from training_worker import TrainingScheduler
+from voting import class_distribution, soft_vote
+
+# sklearn and xgboost are imported where they are used, so importing this
+# module (and main) stays cheap; warm_up() pays for them once.
+
+CLASSES = np.array([0, 1, 2])
+
+# Models that learn from each new round in online mode (partial_fit or continued boosting).
+# The rest only change at the periodic full refit.
+ONLINE_MODELS = ("LogisticRegression", "Ridge", "GaussianNB", "XGBoost")
+
+MODEL_FIT_SECONDS = metrics.histogram("model_fit_seconds", "Per-model fit time in a full retrain", ["model"])
+MODEL_PREDICT_SECONDS = metrics.histogram("model_predict_seconds", "Per-model predict time per call", ["model"])
+
+def _observe_report(histogram, report):
+    # report is the executor's name -> {"seconds", "error"} map
+    for name, result in report.items():
+        histogram.observe(result["seconds"], name)
 
 class EnsembleManager:
-    def __init__(self, db_path="game_data.db", model_dir="models"):
+    def __init__(self, db_path="game_data.db", model_dir="models", retrain_policy=None,
+                 executor="thread", max_workers=None, learning_mode="batch",
+                 train_window=100, full_refit_every=50, feature_spec=None, accuracy_window=20,
+                 clock=None, prediction_cache_size=10000, voting="hard", calibration=None,
+                 table_id=DEFAULT_TABLE, training_worker=None):
         self.db_path = db_path
+        # Game table this ensemble trains on and records results for
+        self.table_id = table_id
+        # Simulated clock for backtests, same contract as GameDatabase's
+        self.clock = clock
         self.model_dir = model_dir
+        # One spec for training and inference: Red=0, Green=1, Violet=2, last 10 outcomes
+        self.feature_spec = feature_spec or FeatureSpec()
+        # Shared with GameDatabase when both point at the same file
+        self.pool = get_pool(db_path)
+        # Reads training windows straight from the stored outcome codes
+        self.outcomes = OutcomeStream()
+        # "batch": refit everything on the last train_window rounds each retrain
+        # "online": update ONLINE_MODELS with only the new rounds, full refit every full_refit_every rounds
+        if learning_mode not in ("batch", "online"):
+            raise ValueError(f"Unknown learning mode: {learning_mode}")
+        self.learning_mode = learning_mode
+        # "hard": majority of the top-3 labels (confidence 33/66/100)
+        # "soft": accuracy-weighted average of the top-3 class distributions
+        if voting not in ("hard", "soft"):
+            raise ValueError(f"Unknown voting mode: {voting}")
+        self.voting = voting
+        # "sigmoid"/"isotonic" wrap every model in CalibratedClassifierCV (batch mode only:
+        # the wrapper cannot partial_fit or continue boosting)
+        if calibration not in (None, "sigmoid", "isotonic"):
+            raise ValueError(f"Unknown calibration method: {calibration}")
+        if calibration and learning_mode == "online":
+            raise ValueError("Calibration is only supported in batch learning mode")
+        self.calibration = calibration
+        self.train_window = train_window
+        self.full_refit_every = full_refit_every
+        self.rounds_since_refit = 0
+        self._online_rows = []
+        self._online_lock = threading.Lock()
         self.model_names = [
             "RandomForest", "XGBoost", "SVM", "KNN", 
             "LogisticRegression", "GradientBoosting", "ExtraTrees", 
@@ -23,14 +79,60 @@ class EnsembleManager:
         ]
         self.models = {}
         self.performance = {name: {"accuracy": 0.5, "history": []} for name in self.model_names}
+        # Accuracy over each model's last accuracy_window results, maintained per round
+        self.rolling_accuracy = RollingAccuracy(self.model_names, window=accuracy_window, table_id=table_id)
         
-        if not os.path.exists(self.model_dir):
-            os.makedirs(self.model_dir)
-            
-        self._initialize_models()
-        self._load_performance()
+        # Fitted models stay resident here; self.models only holds unfitted templates
+        self.registry = ModelRegistry(self.model_dir)
+        # Trains and scores models concurrently; see ModelExecutor for the modes. An
+        # executor instance is shared with other managers (e.g. one per game table)
+        self.executor = executor if isinstance(executor, ModelExecutor) else ModelExecutor(executor, max_workers)
+        self.last_train_report = {}
+        self.last_predict_report = {}
+        # Per-model predictions by feature window for the current model generation
+        self.prediction_cache = PredictionCache(prediction_cache_size)
+        
+        # Estimator templates, fitted models and accuracies are loaded by warm_up(),
+        # which the API runs at startup and every other entry point runs on first use
+        self._ready = threading.Event()
+        self._warm_lock = threading.Lock()
+        self.warm_up_seconds = None
+
+        # Retrains run on a background worker; /update only records the round. With a shared
+        # state backend only the elected trainer keeps this on; the others load its generations.
+        self.training_enabled = True
+        self.trainer = TrainingScheduler(
+            self._background_train, retrain_policy, generation_fn=lambda: self.registry.generation,
+            worker=training_worker
+        )
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def warm_up(self):
+        """Imports the ML libraries, builds the templates and loads accuracies and fitted models. Idempotent."""
+        if self._ready.is_set():
+            return
+        with self._warm_lock:
+            if self._ready.is_set():
+                return
+            start = time.perf_counter()
+            self._initialize_models()
+            self._load_performance()
+            self.registry.load(self.model_names)
+            self.warm_up_seconds = time.perf_counter() - start
+            self._ready.set()
 
     def _initialize_models(self):
+        from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, ExtraTreesClassifier, AdaBoostClassifier
+        from sklearn.linear_model import LogisticRegression, RidgeClassifier, SGDClassifier
+        from sklearn.svm import SVC
+        from sklearn.neighbors import KNeighborsClassifier
+        from sklearn.naive_bayes import GaussianNB
+        from sklearn.tree import DecisionTreeClassifier
+        from xgboost import XGBClassifier
+        
         # Initialize the 12 models with default parameters
         self.models["RandomForest"] = RandomForestClassifier(n_estimators=100)
         self.models["XGBoost"] = XGBClassifier(use_label_encoder=False, eval_metric='logloss')
@@ -44,152 +146,352 @@ class EnsembleManager:
         self.models["GaussianNB"] = GaussianNB()
         self.models["DecisionTree"] = DecisionTreeClassifier()
         self.models["MLPPlaceholder"] = RandomForestClassifier(n_estimators=50, max_depth=5) # Placeholder for MLP
+        
+        if self.learning_mode == "online":
+            # SGD-trained versions of the linear models so they can learn one round at a time
+            self.models["LogisticRegression"] = SGDClassifier(loss="log_loss")
+            self.models["Ridge"] = SGDClassifier(loss="squared_error")
+        
+        if self.calibration:
+            from sklearn.calibration import CalibratedClassifierCV
+            for name, model in self.models.items():
+                self.models[name] = CalibratedClassifierCV(model, method=self.calibration, cv=3)
 
     def _load_performance(self):
         # In a real app, this would load from a JSON or DB
         # For now, we'll initialize with dummy data or try to calculate from DB
+        self._init_tables()
         self._update_performance_from_db()
 
-    def _update_performance_from_db(self):
-        conn = sqlite3.connect(self.db_path)
-        # We need a table to track individual model performance
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS model_performance (
-                model_name TEXT,
-                period TEXT,
-                prediction TEXT,
-                actual TEXT,
-                is_correct INTEGER,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        for name in self.model_names:
-            cursor = conn.execute('''
-                SELECT AVG(is_correct) FROM (
-                    SELECT is_correct FROM model_performance 
-                    WHERE model_name = ? 
-                    ORDER BY timestamp DESC LIMIT 20
+    def _init_tables(self):
+        with self.pool.transaction() as conn:
+            # IMMEDIATE: workers starting together migrate once, one after the other,
+            # and each re-reads the schema only once it holds the lock
+            conn.execute("BEGIN IMMEDIATE")
+            # We need a table to track individual model performance
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS model_performance (
+                    model_name TEXT,
+                    period TEXT,
+                    prediction TEXT,
+                    actual TEXT,
+                    is_correct INTEGER,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    table_id TEXT NOT NULL DEFAULT 'default'
                 )
-            ''', (name,))
-            row = cursor.fetchone()
-            if row and row[0] is not None:
-                self.performance[name]["accuracy"] = row[0]
-        conn.close()
+            ''')
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(model_performance)")]
+            if "table_id" not in columns:
+                # Rows from before game tables existed belong to the default table
+                conn.execute("ALTER TABLE model_performance ADD COLUMN table_id TEXT NOT NULL DEFAULT 'default'")
+            conn.execute("DROP INDEX IF EXISTS idx_model_performance_name_ts")
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_model_performance_table_name_ts
+                ON model_performance (table_id, model_name, timestamp)
+            ''')
+            self.rolling_accuracy.create_table(conn)
+
+    def _update_performance_from_db(self):
+        # Full load: summary table first, indexed rebuild for anything missing or stale
+        with self.pool.transaction() as conn:
+            rebuilt = self.rolling_accuracy.load(conn)
+            if rebuilt:
+                self.rolling_accuracy.save(conn, rebuilt)
+        self._apply_rolling_accuracy(self.model_names)
+
+    def _apply_rolling_accuracy(self, names):
+        for name in names:
+            accuracy = self.rolling_accuracy.accuracy(name)
+            if accuracy is not None:
+                self.performance[name]["accuracy"] = accuracy
 
     def prepare_features(self, history):
-        # Convert history (list of 'Red', 'Green', 'Violet') to numerical features
-        # Simple encoding: Red=0, Green=1, Violet=2
-        mapping = {'Red': 0, 'Green': 1, 'Violet': 2}
-        encoded = [mapping.get(x, 0) for x in history]
-        
-        # Ensure we have enough data, pad if necessary
-        if len(encoded) < 10:
-            encoded = [0] * (10 - len(encoded)) + encoded
-        
-        return np.array(encoded[-10:]).reshape(1, -1)
+        # Convert history (list of 'Red', 'Green', 'Violet') to a (1, n_features) row
+        return self.feature_spec.features_for_history(history)
 
     def train_all(self, X, y):
+        from sklearn.base import clone
+        self.warm_up()
         # X is feature matrix, y is labels
-        for name, model in self.models.items():
-            try:
-                model.fit(X, y)
-                joblib.dump(model, os.path.join(self.model_dir, f"{name}.joblib"))
-            except Exception as e:
-                print(f"Error training {name}: {e}")
+        # Fit fresh clones so predictions keep using the current generation until the swap
+        templates = {name: clone(template) for name, template in self.models.items()}
+        fitted, report = self.executor.fit_all(templates, X, y)
+        for name, result in report.items():
+            if result["error"] is not None:
+                print(f"Error training {name}: {result['error']}")
+        self.last_train_report = report
+        _observe_report(MODEL_FIT_SECONDS, report)
+        if fitted:
+            self.registry.publish(fitted)
+
+    def get_model(self, name):
+        """Returns the resident fitted model, picking up generations written by other processes."""
+        self.warm_up()
+        self.registry.refresh_if_changed(self.model_names)
+        return self.registry.get(name)
 
     def get_top_3(self):
         sorted_models = sorted(self.performance.items(), key=lambda x: x[1]["accuracy"], reverse=True)
         return [m[0] for m in sorted_models[:3]]
 
     def predict_ensemble(self, history):
+        return self.predict_ensemble_batch([history])[0]
+
+    def predict_ensemble_batch(self, histories):
+        """
+        Ensemble predictions for many histories at once: one feature matrix and a
+        single predict call per top-3 model across the rows not already in the
+        prediction cache. Each result matches what predict_ensemble returns for
+        that history alone.
+        """
+        self.warm_up()
         top_3_names = self.get_top_3()
-        features = self.prepare_features(history)
+        if not histories:
+            return []
+        # Read before the models: a swap in between then only tags new predictions as old
+        generation = self.registry.generation
+        models = {name: self.get_model(name) for name in top_3_names}
+        
+        # Predictions only depend on the encoded window, so repeated windows come from the cache
+        windows = self.feature_spec.windows_for_histories(histories)
+        keys = [window.tobytes() for window in windows]
+        outputs = self.prediction_cache.get_many(generation, keys, top_3_names)
+        missing = [row for row, entry in enumerate(outputs)
+                   if entry is None or any(name not in entry for name in top_3_names)]
+        
+        if missing:
+            names = sorted({name for row in missing for name in top_3_names if name not in (outputs[row] or ())})
+            features = self.feature_spec.transform(windows[missing])
+            raw, self.last_predict_report = self.executor.predict_all(
+                {name: models[name] for name in names}, features, scorer=self._scorer()
+            )
+            _observe_report(MODEL_PREDICT_SECONDS, self.last_predict_report)
+            computed = []
+            for i, row in enumerate(missing):
+                predicted = {name: self._model_output(raw, name, i) for name in names}
+                computed.append(predicted)
+                outputs[row] = dict(outputs[row] or {}, **predicted)
+            self.prediction_cache.put_many(generation, [keys[row] for row in missing], computed)
         
-        predictions = []
-        for name in top_3_names:
-            model = self.models[name]
-            # Try to load from disk if not trained in memory
-            model_path = os.path.join(self.model_dir, f"{name}.joblib")
-            if os.path.exists(model_path):
-                model = joblib.load(model_path)
+        if self.voting == "soft":
+            return self._soft_results(top_3_names, outputs)
+        
+        results = []
+        for row in range(len(histories)):
+            predictions = [outputs[row][name] for name in top_3_names]
             
-            try:
-                pred_idx = model.predict(features)[0]
-                inv_mapping = {0: 'Red', 1: 'Green', 2: 'Violet'}
-                predictions.append(inv_mapping[pred_idx])
-            except:
-                # Fallback if model not trained
-                predictions.append("Red")
-        
-        # Voting logic
-        from collections import Counter
-        vote_counts = Counter(predictions)
-        final_pred, count = vote_counts.most_common(1)[0]
-        confidence = (count / len(predictions)) * 100
-        
-        return {
-            "prediction": final_pred,
-            "confidence": confidence,
-            "models_used": top_3_names,
-            "individual_preds": predictions
-        }
+            # Voting logic
+            vote_counts = Counter(predictions)
+            final_pred, count = vote_counts.most_common(1)[0]
+            confidence = (count / len(predictions)) * 100
+            
+            results.append({
+                "prediction": final_pred,
+                "confidence": confidence,
+                "models_used": top_3_names,
+                "individual_preds": predictions
+            })
+        return results
+
+    def _scorer(self):
+        if self.voting == "soft":
+            n_classes = len(self.feature_spec.vocabulary)
+            return lambda model, features: class_distribution(model, features, n_classes)
+        return None
+
+    def _model_output(self, raw, name, row):
+        """One model's cached output for one row: a label (hard) or a class distribution (soft)."""
+        try:
+            if self.voting == "soft":
+                return tuple(raw[name][row])
+            return self.feature_spec.decode(raw[name][row])
+        except:
+            # Fallback if model not trained: a vote for Red (code 0), as in hard voting
+            if self.voting == "soft":
+                return tuple(np.eye(len(self.feature_spec.vocabulary))[0])
+            return "Red"
+
+    def _soft_results(self, top_3_names, outputs):
+        # (models, rows, classes) stacked once, then one weighted average for every row
+        distributions = np.array([[outputs[row][name] for row in range(len(outputs))] for name in top_3_names])
+        weights = [self.performance[name]["accuracy"] for name in top_3_names]
+        ensemble = soft_vote(distributions, weights)
+        winners = ensemble.argmax(axis=1)
+        model_votes = distributions.argmax(axis=2)
+        
+        vocabulary = self.feature_spec.vocabulary
+        results = []
+        for row in range(len(outputs)):
+            results.append({
+                "prediction": vocabulary[winners[row]],
+                "confidence": float(ensemble[row, winners[row]] * 100),
+                "models_used": top_3_names,
+                "individual_preds": [vocabulary[code] for code in model_votes[:, row]],
+                "probabilities": {label: round(float(p), 4) for label, p in zip(vocabulary, ensemble[row])}
+            })
+        return results
 
     def record_actual_outcome(self, period, history, actual):
         # This is called when a result is published
+        self.warm_up()
         # 1. Update all 12 models' performance in DB
         features = self.prepare_features(history)
-        mapping = {'Red': 0, 'Green': 1, 'Violet': 2}
-        actual_idx = mapping.get(actual, 0)
+        actual_idx = int(self.feature_spec.encode([actual])[0])
         
-        conn = sqlite3.connect(self.db_path)
+        models = {}
         for name in self.model_names:
-            model_path = os.path.join(self.model_dir, f"{name}.joblib")
-            if os.path.exists(model_path):
-                model = joblib.load(model_path)
+            model = self.get_model(name)
+            if model is not None:
+                models[name] = model
+        raw, report = self.executor.predict_all(models, features)
+        _observe_report(MODEL_PREDICT_SECONDS, report)
+        
+        rows = []
+        for name in self.model_names:
+            if name in raw:
                 try:
-                    pred_idx = model.predict(features)[0]
+                    pred_idx = raw[name][0]
                     is_correct = 1 if pred_idx == actual_idx else 0
-                    inv_mapping = {0: 'Red', 1: 'Green', 2: 'Violet'}
-                    conn.execute('''
-                        INSERT INTO model_performance (model_name, period, prediction, actual, is_correct)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (name, period, inv_mapping[pred_idx], actual, is_correct))
+                    rows.append((name, period, self.feature_spec.decode(pred_idx), actual, is_correct))
                 except:
                     pass
-        conn.commit()
-        conn.close()
+        # 2. Refresh performance metrics: O(1) ring-buffer update per model. Other workers
+        # write the same summary rows, so the buffers are re-read under the write lock
+        # first and this round is recorded on top of their results, not over them.
+        # All models' results and their rolling summaries go in as one batched transaction
+        if rows:
+            updated = [row[0] for row in rows]
+            with DB_QUERY_SECONDS.time("record_model_performance"), self.pool.transaction() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                rebuilt = self.rolling_accuracy.load(conn)
+                for name, _, _, _, is_correct in rows:
+                    self.rolling_accuracy.record(name, is_correct)
+                if self.clock:
+                    timestamp = self.clock().strftime(TIMESTAMP_FORMAT)
+                    conn.executemany('''
+                        INSERT INTO model_performance (model_name, period, prediction, actual, is_correct, table_id, timestamp)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', [row + (self.table_id, timestamp) for row in rows])
+                else:
+                    conn.executemany('''
+                        INSERT INTO model_performance (model_name, period, prediction, actual, is_correct, table_id)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', [row + (self.table_id,) for row in rows])
+                self.rolling_accuracy.save(conn, [name for name in self.model_names if name in updated or name in rebuilt])
+            self._apply_rolling_accuracy(self.model_names)
         
-        # 2. Trigger background training if we have enough data
-        self._background_train()
+        if self.learning_mode == "online" and self.training_enabled:
+            with self._online_lock:
+                self._online_rows.append((features[0], actual_idx))
         
-        # 3. Refresh performance metrics
+        # 3. Hand retraining to the background worker (coalesced, policy driven)
+        self.notify_round()
+
+    def notify_round(self):
+        """Counts a new round towards the retrain policy, with the top-3 accuracy for drift."""
+        if not self.training_enabled:
+            return False
+        top_3 = self.get_top_3()
+        top_3_accuracy = sum(self.performance[name]["accuracy"] for name in top_3) / len(top_3)
+        return self.trainer.notify_round(accuracy=top_3_accuracy)
+
+    def refresh_performance(self):
+        """Re-reads the rolling accuracies, e.g. after other workers recorded rounds. No-op before warm-up."""
+        if not self.ready:
+            return
         self._update_performance_from_db()
 
     def _background_train(self):
-        # Get last 100 rounds from DB to train
-        conn = sqlite3.connect(self.db_path)
-        df = pd.read_sql_query("SELECT history, actual_outcome FROM game_results ORDER BY timestamp DESC LIMIT 100", conn)
-        conn.close()
+        self.warm_up()
+        if self.learning_mode == "online" and self.registry.generation > 0 \
+                and self.rounds_since_refit < self.full_refit_every:
+            self._online_train()
+        else:
+            self._full_refit()
+
+    def _online_train(self):
+        # Drain the rounds recorded since the last update; coalesced rounds arrive together
+        with self._online_lock:
+            rows, self._online_rows = self._online_rows, []
+        if not rows:
+            return
+        X = np.array([row[0] for row in rows])
+        y = np.array([row[1] for row in rows])
+        
+        updated = {}
+        for name in ONLINE_MODELS:
+            try:
+                model = self._incremental_fit(name, self.registry.get(name), X, y)
+                if model is not None:
+                    updated[name] = model
+            except Exception as e:
+                # Typically a label the model has not seen yet; the next full refit picks it up
+                print(f"Error updating {name}: {e}")
+        self.rounds_since_refit += len(rows)
+        if updated:
+            self.registry.publish(updated)
+
+    def _incremental_fit(self, name, model, X, y):
+        from sklearn.base import clone
+        # Never mutate the resident model: predictions may be using it right now
+        if name == "XGBoost":
+            import xgboost as xgb
+            if model is None:
+                return None
+            params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+            if params.get("objective", "").startswith("multi"):
+                params["num_class"] = model.n_classes_
+            booster = xgb.train(params, xgb.DMatrix(X, label=y), num_boost_round=1, xgb_model=model.get_booster())
+            updated = copy.deepcopy(model)
+            updated._Booster = booster
+            return updated
         
-        if len(df) < 10:
+        updated = copy.deepcopy(model) if model is not None else clone(self.models[name])
+        updated.partial_fit(X, y, classes=getattr(updated, "classes_", CLASSES))
+        return updated
+
+    def retrain_now(self):
+        """Synchronous full refit on the last train_window rounds (scripts and bulk tools)."""
+        self.warm_up()
+        self._full_refit()
+
+    def training_window(self):
+        """
+        X, y for the last train_window rounds, or None with fewer than 10. Their
+        histories are read as slices of the outcome stream, so nothing is parsed.
+        """
+        with DB_QUERY_SECONDS.time("training_window"), self.pool.transaction() as conn:
+            # One snapshot: retention must not trim the stream between the two reads
+            conn.execute("BEGIN")
+            rows = conn.execute(
+                "SELECT history_end, history_len, actual_outcome FROM game_results WHERE table_id = ? "
+                "ORDER BY timestamp DESC, id DESC LIMIT ?",
+                (self.table_id, self.train_window)
+            ).fetchall()
+            if len(rows) < 10:
+                return None
+            ends = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            starts = ends - np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+            base = int(starts.min())
+            codes = self.outcomes.read(conn, self.table_id, base, int(ends.max()))
+            labels = self.outcomes.labels(conn)
+        outcomes = [row[2] for row in rows]
+        return self.feature_spec.training_set_from_stream(labels, codes, starts - base, ends - base, outcomes)
+
+    def _full_refit(self):
+        # Get the last train_window rounds from DB to train
+        training_set = self.training_window()
+        if training_set is None:
             return
-            
-        X = []
-        y = []
-        mapping = {'Red': 0, 'Green': 1, 'Violet': 2}
-        
-        for _, row in df.iterrows():
-            hist = row['history'].split(',')
-            X.append(self.prepare_features(hist).flatten())
-            y.append(mapping.get(row['actual_outcome'], 0))
-            
-        self.train_all(np.array(X), np.array(y))
+        
+        X, y = training_set
+        self.train_all(X, y)
+        # The refit covers every round so far, which corrects any online drift
+        with self._online_lock:
+            self._online_rows = []
+        self.rounds_since_refit = 0
 
     def cleanup_old_data(self, days=7):
-        conn = sqlite3.connect(self.db_path)
-        cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
-        conn.execute("DELETE FROM game_results WHERE timestamp < ?", (cutoff,))
-        conn.execute("DELETE FROM model_performance WHERE timestamp < ?", (cutoff,))
-        conn.commit()
-        conn.close()
+        """Deletes rounds and model results older than `days` in indexed chunks (see RetentionJanitor)."""
+        from retention import RetentionJanitor
+        return RetentionJanitor(self.db_path, days=days, clock=self.clock).run_once()
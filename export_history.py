@@ -0,0 +1,23 @@
+"""
+Exports one game table's rounds as NumPy columns for offline training and
+analysis (see GameDatabase.export_columns). Load them memory-mapped with
+database.load_columns(); FeatureSpec.training_set_from_stream() turns them
+into X, y without touching the database.
+
+Only needs the database layer, so it does not load sklearn/xgboost.
+
+Usage:
+    python export_history.py export [--table default] [--db game_data.db]
+"""
+import argparse
+
+from database import DEFAULT_TABLE, GameDatabase
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a game table's rounds as .npy columns.")
+    parser.add_argument("directory")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    parser.add_argument("--db", default="game_data.db")
+    args = parser.parse_args()
+    count = GameDatabase(args.db).export_columns(args.directory, args.table)
+    print(f"Exported {count} rounds of table {args.table} to {args.directory}")
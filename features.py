@@ -0,0 +1,142 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class FeatureSpec:
+    """
+    Describes how a window of past outcomes becomes a feature row.
+    Training and inference both go through the same spec so they cannot drift apart.
+
+    The base features are the last `window` outcome codes, left-padded with
+    `pad_code`. Optional extras are appended after them:
+    - streak: length of the run that ends at the most recent outcome
+    - ratios: share of each vocabulary label inside the window
+    - parity: sum of the window's codes modulo 2
+    """
+
+    def __init__(self, window=10, vocabulary=("Red", "Green", "Violet"), pad_code=0,
+                 streak=False, ratios=False, parity=False):
+        self.window = window
+        self.vocabulary = tuple(vocabulary)
+        self.pad_code = pad_code
+        self.streak = streak
+        self.ratios = ratios
+        self.parity = parity
+        self._codes = {label: code for code, label in enumerate(self.vocabulary)}
+
+    @property
+    def has_extras(self):
+        return self.streak or self.ratios or self.parity
+
+    @property
+    def n_features(self):
+        return self.window + int(self.streak) + (len(self.vocabulary) if self.ratios else 0) + int(self.parity)
+
+    def encode(self, outcomes):
+        """Maps labels to uint8 codes; unknown labels map to pad_code like the old dict lookup."""
+        return np.fromiter((self._codes.get(x, self.pad_code) for x in outcomes), dtype=np.uint8)
+
+    def encode_array(self, tokens):
+        """Vectorized encode for a NumPy array of label strings."""
+        codes = np.full(len(tokens), self.pad_code, dtype=np.uint8)
+        for code, label in enumerate(self.vocabulary):
+            codes[tokens == label] = code
+        return codes
+
+    def decode(self, code):
+        return self.vocabulary[int(code)]
+
+    def window_for_history(self, history):
+        """Single (1, window) uint8 row for one request's history list."""
+        row = np.full((1, self.window), self.pad_code, dtype=np.uint8)
+        tail = self.encode(history[-self.window:]) if len(history) else np.empty(0, dtype=np.uint8)
+        if len(tail):
+            row[0, -len(tail):] = tail
+        return row
+
+    def encode_history_column(self, histories):
+        """
+        Decodes a column of comma-joined history strings into an (n, window) uint8
+        matrix in bulk: one join/split for the whole column, then fancy indexing by
+        row offsets instead of a Python loop per row.
+        """
+        n = len(histories)
+        out = np.full((n, self.window), self.pad_code, dtype=np.uint8)
+        if n == 0:
+            return out
+
+        lengths = np.fromiter((h.count(",") + 1 for h in histories), dtype=np.int64, count=n)
+        tokens = np.array(",".join(histories).split(","))
+        codes = self.encode_array(tokens)
+
+        ends = np.cumsum(lengths)
+        return self.windows_from_slices(codes, ends - lengths, ends)
+
+    def windows_from_slices(self, codes, starts, ends):
+        """
+        (n, window) uint8 matrix where row i holds the last `window` codes of
+        codes[starts[i]:ends[i]], left-padded. Fancy indexing by offsets, no loop per row.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        out = np.full((len(ends), self.window), self.pad_code, dtype=np.uint8)
+        idx = ends[:, None] - self.window + np.arange(self.window)
+        valid = idx >= starts[:, None]
+        out[valid] = np.asarray(codes)[idx[valid]]
+        return out
+
+    def windows_from_sequence(self, codes):
+        """
+        Zero-copy (n, window) view over a chronological outcome sequence where row i
+        holds the `window` outcomes before outcome i. Rows are views into one padded
+        buffer, so treat the result as read-only.
+        """
+        padded = np.concatenate([np.full(self.window, self.pad_code, dtype=np.uint8), np.asarray(codes, dtype=np.uint8)])
+        return sliding_window_view(padded, self.window)[:len(codes)]
+
+    def transform(self, windows):
+        """Turns (n, window) outcome windows into the model feature matrix."""
+        if not self.has_extras:
+            return windows
+
+        columns = [windows.astype(np.float32)]
+        if self.streak:
+            same = windows == windows[:, -1:]
+            # Trailing run length: cumulative product of matches read from the end
+            columns.append(np.cumprod(same[:, ::-1], axis=1).sum(axis=1, keepdims=True).astype(np.float32))
+        if self.ratios:
+            for code in range(len(self.vocabulary)):
+                columns.append((windows == code).mean(axis=1, keepdims=True, dtype=np.float32))
+        if self.parity:
+            columns.append((windows.sum(axis=1, keepdims=True, dtype=np.int64) % 2).astype(np.float32))
+        return np.hstack(columns)
+
+    def features_for_history(self, history):
+        return self.transform(self.window_for_history(history))
+
+    def windows_for_histories(self, histories):
+        """(n, window) uint8 outcome windows for a batch of request histories."""
+        windows = np.full((len(histories), self.window), self.pad_code, dtype=np.uint8)
+        for row, history in enumerate(histories):
+            tail = history[-self.window:]
+            if len(tail):
+                windows[row, -len(tail):] = self.encode(tail)
+        return windows
+
+    def training_set(self, histories, outcomes):
+        """X, y for a batch of stored rounds (history strings and actual outcomes)."""
+        X = self.transform(self.encode_history_column(histories))
+        y = self.encode_array(np.array(outcomes)) if len(outcomes) else np.empty(0, dtype=np.uint8)
+        return X, y
+
+    def training_set_from_stream(self, labels, codes, starts, ends, outcomes):
+        """
+        X, y for stored rounds read as slices of an outcome stream (see
+        database.OutcomeStream): `codes` index `labels`, round i's history is
+        codes[starts[i]:ends[i]]. Nothing is parsed, the codes are remapped
+        through one lookup table.
+        """
+        lut = self.encode(labels)
+        X = self.transform(self.windows_from_slices(lut[np.asarray(codes)], starts, ends))
+        y = self.encode_array(np.asarray(outcomes)) if len(outcomes) else np.empty(0, dtype=np.uint8)
+        return X, y
@@ -1,33 +1,192 @@
 import collections
+from datetime import datetime, timedelta, timezone
+
+# Same key layout as the DB timestamps ('%Y-%m-%d %H:%M:%S'), so string order is time order
+HOUR_KEY = '%Y-%m-%d %H'
+DAY_KEY = '%Y-%m-%d'
+
+
+def distribution(counts, total):
+    """Big/Small percentages for a set of running counts; the shape /predict has always returned."""
+    if not total:
+        return {"Big": 50, "Small": 50}
+
+    big_percent = (counts.get("Big", 0) / total) * 100
+    small_percent = (counts.get("Small", 0) / total) * 100
+
+    return {
+        "Big": round(big_percent, 2),
+        "Small": round(small_percent, 2),
+        "trend": "Big" if big_percent > small_percent else "Small",
+        "sample_size": total
+    }
+
 
 class MarketHeatmap:
-    def __init__(self, window_size=100):
+    """
+    Big/Small distribution over the last `window_size` results, plus optional
+    extra `windows` (e.g. (20, 1000)), an exponentially decayed distribution
+    with the given `half_life` in rounds, and hour/day `aggregates`.
+
+    Every window keeps running counts that are adjusted when a result enters
+    and when the result `w` places back drops out of it, so add_result() and
+    get_heatmap_data() cost the same whatever the window sizes.
+    """
+
+    def __init__(self, window_size=100, windows=(), half_life=None, aggregates=None):
         self.window_size = window_size
-        self.history = collections.deque(maxlen=window_size)
+        self.windows = tuple(sorted(set(windows) | {window_size}))
+        self.capacity = self.windows[-1]
+        # Ring buffer of the last `capacity` results
+        self._ring = [None] * self.capacity
+        self._pos = 0
+        self._seen = 0
+        self._counts = {w: collections.Counter() for w in self.windows}
+        self.half_life = half_life
+        self._decay = 0.5 ** (1.0 / half_life) if half_life else None
+        self._decayed = {}
+        self._decayed_total = 0.0
+        self.aggregates = aggregates
+
+    @property
+    def history(self):
+        """The primary window's results, oldest first."""
+        n = min(self._seen, self.window_size)
+        return [self._ring[(self._pos - n + i) % self.capacity] for i in range(n)]
+
+    def _push(self, result):
+        for w in self.windows:
+            counts = self._counts[w]
+            if self._seen >= w:
+                counts[self._ring[(self._pos - w) % self.capacity]] -= 1
+            counts[result] += 1
+        self._ring[self._pos] = result
+        self._pos = (self._pos + 1) % self.capacity
+        self._seen += 1
+
+        if self._decay:
+            for outcome in self._decayed:
+                self._decayed[outcome] *= self._decay
+            self._decayed[result] = self._decayed.get(result, 0.0) + 1.0
+            self._decayed_total = self._decayed_total * self._decay + 1.0
 
-    def add_result(self, result):
+    def add_result(self, result, timestamp=None):
         """result should be 'Big' or 'Small'"""
-        self.history.append(result)
+        self._push(result)
+        if self.aggregates is not None:
+            self.aggregates.add(result, timestamp)
 
-    def get_heatmap_data(self):
+    def preload(self, db, table_id=None):
+        """Fills the windows from the most recent results and the aggregates from the DB (one table's, if given)."""
+        for outcome in reversed(db.get_recent_results(self.capacity, table_id)):
+            self._push(outcome)
+        if self.aggregates is not None:
+            self.aggregates.load(db, table_id)
+
+    def export_state(self):
+        """The last `capacity` results and the decayed counts. The aggregates are rebuilt from the DB."""
+        n = min(self._seen, self.capacity)
+        return {
+            "results": [self._ring[(self._pos - n + i) % self.capacity] for i in range(n)],
+            "decayed": dict(self._decayed),
+            "decayed_total": self._decayed_total,
+        }
+
+    def restore_state(self, state):
+        self._ring = [None] * self.capacity
+        self._pos = 0
+        self._seen = 0
+        self._counts = {w: collections.Counter() for w in self.windows}
+        for result in state["results"][-self.capacity:]:
+            self._push(result)
+        self._decayed = dict(state["decayed"])
+        self._decayed_total = state["decayed_total"]
+
+    def get_heatmap_data(self, window=None):
         """Returns the percentage distribution of Big and Small."""
-        if not self.history:
-            return {"Big": 50, "Small": 50}
-        
-        counts = collections.Counter(self.history)
-        total = len(self.history)
-        
-        big_percent = (counts.get("Big", 0) / total) * 100
-        small_percent = (counts.get("Small", 0) / total) * 100
-        
+        window = window or self.window_size
+        return distribution(self._counts[window], min(self._seen, window))
+
+    def get_horizons_data(self):
+        """Every window, the decayed distribution and the hour/day aggregates."""
+        data = {"windows": {str(w): self.get_heatmap_data(w) for w in self.windows}}
+        if self._decay:
+            decayed = distribution(self._decayed, self._decayed_total)
+            if self._decayed_total:
+                # A weight rather than a count of rounds
+                decayed["sample_size"] = round(self._decayed_total, 2)
+            data["decayed"] = dict(decayed, half_life=self.half_life)
+        if self.aggregates is not None:
+            data.update(self.aggregates.get_data())
+        return data
+
+
+class OutcomeAggregates:
+    """
+    Outcome counts per hour and per day, kept current on every add() instead of
+    being re-read from game_results. load() seeds them once with a single
+    GROUP BY over the retained rows.
+
+    Buckets use the same clock as GameDatabase: `clock() -> datetime` when set
+    (backtests), UTC otherwise, like SQLite's CURRENT_TIMESTAMP.
+    """
+
+    def __init__(self, hours=24, days=7, clock=None):
+        self.hours = hours
+        self.days = days
+        self.clock = clock
+        self.hourly = collections.OrderedDict()
+        self.daily = collections.OrderedDict()
+        # Sum of the hourly buckets, i.e. the last `hours` hours
+        self._recent = collections.Counter()
+
+    def _now(self):
+        return self.clock() if self.clock else datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def _count(self, hour, outcome, n):
+        self.hourly.setdefault(hour, collections.Counter())[outcome] += n
+        self.daily.setdefault(hour[:10], collections.Counter())[outcome] += n
+        self._recent[outcome] += n
+
+    def _expire(self, now):
+        oldest_hour = (now - timedelta(hours=self.hours - 1)).strftime(HOUR_KEY)
+        while self.hourly and next(iter(self.hourly)) < oldest_hour:
+            self._recent.subtract(self.hourly.popitem(last=False)[1])
+        oldest_day = (now - timedelta(days=self.days - 1)).strftime(DAY_KEY)
+        while self.daily and next(iter(self.daily)) < oldest_day:
+            self.daily.popitem(last=False)
+
+    def load(self, db, table_id=None):
+        self.hourly.clear()
+        self.daily.clear()
+        self._recent.clear()
+        now = self._now()
+        oldest_hour = (now - timedelta(hours=self.hours - 1)).strftime(HOUR_KEY)
+        since = min(oldest_hour[:10], (now - timedelta(days=self.days - 1)).strftime(DAY_KEY))
+        for hour, outcome, n in db.get_hourly_outcome_counts(since, table_id):
+            self.daily.setdefault(hour[:10], collections.Counter())[outcome] += n
+            if hour >= oldest_hour:
+                self.hourly.setdefault(hour, collections.Counter())[outcome] += n
+                self._recent[outcome] += n
+        # Drops the days the hourly horizon reached back into
+        self._expire(now)
+
+    def add(self, result, timestamp=None):
+        """timestamp: the round's datetime, defaults to now."""
+        now = timestamp or self._now()
+        self._count(now.strftime(HOUR_KEY), result, 1)
+        self._expire(now)
+
+    def get_data(self):
+        latest = self.hourly[next(reversed(self.hourly))] if self.hourly else {}
         return {
-            "Big": round(big_percent, 2),
-            "Small": round(small_percent, 2),
-            "trend": "Big" if big_percent > small_percent else "Small",
-            "sample_size": total
+            "latest_hour": distribution(latest, sum(latest.values())),
+            f"last_{self.hours}h": distribution(self._recent, sum(self._recent.values())),
+            "by_day": {day: distribution(counts, sum(counts.values())) for day, counts in self.daily.items()},
         }
 
 # Example usage:
-# heatmap = MarketHeatmap()
+# heatmap = MarketHeatmap(window_size=100, windows=(20, 1000), half_life=50, aggregates=OutcomeAggregates())
 # heatmap.add_result("Big")
 # print(heatmap.get_heatmap_data())
+# print(heatmap.get_horizons_data())
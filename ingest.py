@@ -0,0 +1,216 @@
+"""
+Bulk historical ingest: replays a file of rounds into the learners at full speed
+instead of one /update call per round.
+
+Each round has the /update fields: period, history, sensor_outputs, prediction,
+actual_outcome, bet_amount, confidence, and optionally table_id.
+A run ingests one game table (--table, default "default") into that table's
+learner files; a round naming any other table is rejected before anything is
+written, so ingest a multi-table file once per table.
+- .jsonl: one JSON object per line
+- .csv: a header row; history is comma-joined ("Big,Small,Big") and
+  sensor_outputs is a JSON object
+
+Usage:
+    python ingest.py rounds.jsonl [--table ID] [--verify] [--no-retrain]
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from pattern_matrix import PatternErrorMatrix
+from dynamic_weighting import DynamicWeighting, DEFAULT_SENSORS
+from heatmap import MarketHeatmap
+from database import DEFAULT_TABLE, GameDatabase
+from learner_registry import TABLE_ID_PATTERN, table_path
+
+
+def read_rounds(path):
+    """Yields rounds as dicts from a .jsonl or .csv file."""
+    if path.endswith(".csv"):
+        with open(path, "r", newline="") as f:
+            for row in csv.DictReader(f):
+                round_ = {
+                    "period": row["period"],
+                    "history": row["history"].split(",") if row.get("history") else [],
+                    "sensor_outputs": json.loads(row.get("sensor_outputs") or "{}"),
+                    "prediction": row["prediction"],
+                    "actual_outcome": row["actual_outcome"],
+                    "bet_amount": float(row.get("bet_amount") or 0),
+                    "confidence": float(row.get("confidence") or 0),
+                }
+                if row.get("table_id"):
+                    round_["table_id"] = row["table_id"]
+                yield round_
+    else:
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def check_table(rounds, table_id):
+    """Raises ValueError if any round belongs to a game table other than table_id."""
+    for line, r in enumerate(rounds, start=1):
+        if r.get("table_id", table_id) != table_id:
+            raise ValueError(f"round {line} (period {r.get('period')}) is for table {r['table_id']!r}, "
+                             f"not {table_id!r}; ingest each table with --table")
+
+
+class BulkIngestor:
+    """
+    Applies rounds to the learners in the same order /update does, but with
+    persistence deferred to one snapshot per learner and DB rows written with
+    executemany in chunks of batch_size.
+    """
+
+    def __init__(self, pattern_matrix, dynamic_weighting, heatmap, db, batch_size=5000, table_id=DEFAULT_TABLE):
+        self.pattern_matrix = pattern_matrix
+        self.dynamic_weighting = dynamic_weighting
+        self.heatmap = heatmap
+        self.db = db
+        self.batch_size = batch_size
+        self.table_id = table_id
+
+    def ingest(self, rounds):
+        start = time.perf_counter()
+        count = 0
+        pending = []
+        with self.pattern_matrix.deferred_persistence(), self.dynamic_weighting.deferred_persistence():
+            for r in rounds:
+                self.pattern_matrix.update(r["history"], r["prediction"], r["actual_outcome"])
+                self.dynamic_weighting.update_weights(r["sensor_outputs"], r["actual_outcome"])
+                self.heatmap.add_result(r["actual_outcome"])
+                pending.append((
+                    r["period"], r["history"], r["prediction"], r["actual_outcome"],
+                    r.get("confidence", 0.0), r.get("bet_amount", 0.0), self.table_id
+                ))
+                count += 1
+                if len(pending) >= self.batch_size:
+                    self.db.save_results(pending)
+                    pending = []
+            if pending:
+                self.db.save_results(pending)
+        elapsed = time.perf_counter() - start
+        return {
+            "rounds": count,
+            "seconds": round(elapsed, 4),
+            "rounds_per_sec": round(count / elapsed, 1) if elapsed > 0 else None
+        }
+
+
+def replay_sequential(rounds, pattern_matrix, dynamic_weighting, heatmap, db, table_id=DEFAULT_TABLE):
+    """The per-round path /update takes: every learner persists after every round."""
+    start = time.perf_counter()
+    count = 0
+    for r in rounds:
+        pattern_matrix.update(r["history"], r["prediction"], r["actual_outcome"])
+        dynamic_weighting.update_weights(r["sensor_outputs"], r["actual_outcome"])
+        heatmap.add_result(r["actual_outcome"])
+        db.save_result(
+            r["period"], r["history"], r["prediction"], r["actual_outcome"],
+            r.get("confidence", 0.0), r.get("bet_amount", 0.0), table_id
+        )
+        count += 1
+    elapsed = time.perf_counter() - start
+    return {"rounds": count, "seconds": round(elapsed, 4), "rounds_per_sec": round(count / elapsed, 1) if elapsed > 0 else None}
+
+
+def learner_state(pattern_matrix, dynamic_weighting, heatmap):
+    return {
+        "patterns": dict(pattern_matrix.matrix),
+        "weights": dynamic_weighting.weights,
+        "round_counter": dynamic_weighting.round_counter,
+        "temp_performance": dynamic_weighting.temp_performance,
+        "heatmap": heatmap.get_heatmap_data(),
+    }
+
+
+def _copy_state_files(paths, workdir):
+    copies = []
+    for path in paths:
+        target = os.path.join(workdir, os.path.basename(path))
+        for suffix in ("", "-wal", ".journal", ".journal.compacting"):
+            if os.path.exists(path + suffix):
+                shutil.copy(path + suffix, target + suffix)
+        copies.append(target)
+    return copies
+
+
+def build_learners(db_path, pattern_path, weights_path, table_id=DEFAULT_TABLE, heatmap_window=100):
+    db = GameDatabase(db_path)
+    heatmap = MarketHeatmap(window_size=heatmap_window)
+    # Same warm start as the API process
+    for outcome in reversed(db.get_recent_results(heatmap_window, table_id)):
+        heatmap.add_result(outcome)
+    return PatternErrorMatrix(pattern_path), DynamicWeighting(DEFAULT_SENSORS, weights_path), heatmap, db
+
+
+def run(path, db_path="game_data.db", pattern_path=None, weights_path=None, model_dir=None,
+        batch_size=5000, retrain=True, verify=False, table_id=DEFAULT_TABLE):
+    if not re.match(TABLE_ID_PATTERN, table_id):
+        raise ValueError(f"invalid table id {table_id!r}")
+    rounds = list(read_rounds(path))
+    check_table(rounds, table_id)
+    # Learner files default to where the API process keeps them for this table
+    pattern_path = pattern_path or table_path(table_id, "pattern_data.json")
+    weights_path = weights_path or table_path(table_id, "sensor_weights.json")
+    model_dir = model_dir or table_path(table_id, "models")
+
+    reference = None
+    if verify:
+        # Sequential replay into copies of the current state, for comparison
+        workdir = tempfile.mkdtemp(prefix="ingest_verify_")
+        try:
+            paths = _copy_state_files([db_path, pattern_path, weights_path], workdir)
+            learners = build_learners(*paths, table_id=table_id)
+            sequential = replay_sequential(rounds, *learners, table_id=table_id)
+            reference = learner_state(*learners[:3])
+            learners[0].store.close()
+            learners[1].store.close()
+            print(f"Sequential replay: {sequential['rounds']} rounds at {sequential['rounds_per_sec']} rounds/sec")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    learners = build_learners(db_path, pattern_path, weights_path, table_id=table_id)
+    stats = BulkIngestor(*learners, batch_size=batch_size, table_id=table_id).ingest(rounds)
+    print(f"Bulk ingest: {stats['rounds']} rounds in {stats['seconds']}s ({stats['rounds_per_sec']} rounds/sec)")
+
+    if reference is not None:
+        matches = learner_state(*learners[:3]) == reference
+        stats["matches_sequential"] = matches
+        print("Final state matches sequential replay" if matches else "WARNING: final state differs from sequential replay")
+
+    if retrain:
+        # Imported here so a plain ingest does not pay for loading sklearn/xgboost
+        from ensemble_models import EnsembleManager
+        ensemble = EnsembleManager(db_path=db_path, model_dir=model_dir, table_id=table_id)
+        start = time.perf_counter()
+        ensemble.retrain_now()
+        ensemble.trainer.shutdown()
+        print(f"Ensemble retrained in {time.perf_counter() - start:.2f}s (generation {ensemble.registry.generation})")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-ingest historical rounds into all learners.")
+    parser.add_argument("path", help=".jsonl or .csv file of rounds")
+    parser.add_argument("--db", default="game_data.db")
+    parser.add_argument("--table", default=DEFAULT_TABLE, help="game table to ingest; rounds for any other table are rejected")
+    parser.add_argument("--patterns", help="default: the table's pattern_data.json")
+    parser.add_argument("--weights", help="default: the table's sensor_weights.json")
+    parser.add_argument("--models", help="default: the table's models directory")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--no-retrain", action="store_true", help="skip the final ensemble retrain")
+    parser.add_argument("--verify", action="store_true", help="also replay sequentially and compare final state")
+    args = parser.parse_args()
+    try:
+        run(args.path, args.db, args.patterns, args.weights, args.models,
+            args.batch_size, retrain=not args.no_retrain, verify=args.verify, table_id=args.table)
+    except ValueError as e:
+        parser.error(str(e))
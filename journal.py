@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# One background thread compacts every store in the process
+_compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-compactor")
+
+
+class JournaledStore:
+    """
+    Persists a JSON-serializable dict as a compact snapshot plus an append-only
+    delta journal, instead of rewriting the whole file on every change.
+
+    - record()/remove() append one line per change ({"set": {...}} or {"del": [...]})
+    - every `compact_every` lines the journal is rotated and a new snapshot is
+      written in the background to a temp file and atomically renamed into place
+    - load() reads the snapshot and replays the rotated and current journals
+
+    Deltas carry whole values, so replaying one that the snapshot already
+    contains is harmless. A torn last line from a crash is skipped, and cut
+    off the current journal so the next line is not appended to it.
+    """
+
+    def __init__(self, path, compact_every=1000, fsync=False):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.rotated_path = path + ".journal.compacting"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.pending_lines = 0
+        # While paused, changes are not journaled; the owner snapshots once on resume
+        self.paused = False
+        self._journal = None
+        self._lock = threading.Lock()
+        self._compaction = None
+
+    def load(self):
+        """Returns the persisted state, or None if nothing was ever written."""
+        state = None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    state = json.load(f)
+            except json.JSONDecodeError:
+                state = None
+
+        for path in (self.rotated_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            complete = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn write from a crash
+                    complete += len(line)
+                    try:
+                        delta = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if state is None:
+                        state = {}
+                    self._apply(state, delta)
+                    self.pending_lines += 1
+            if path == self.journal_path and complete < os.path.getsize(path):
+                with open(path, "r+b") as f:
+                    f.truncate(complete)
+        return state
+
+    def _apply(self, state, delta):
+        state.update(delta.get("set", {}))
+        for key in delta.get("del", ()):
+            state.pop(key, None)
+
+    def _append(self, delta, state):
+        if self.paused:
+            return
+        line = json.dumps(delta, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_path, "a")
+            self._journal.write(line)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self.pending_lines += 1
+            should_compact = self.pending_lines >= self.compact_every
+        if should_compact:
+            self.compact(state)
+
+    def record(self, changes, state):
+        """Journals `changes` (key -> new value) that were already applied to `state`."""
+        self._append({"set": changes}, state)
+
+    def remove(self, keys, state):
+        # JSON object keys are always strings, so match them on replay
+        self._append({"del": [str(key) for key in keys]}, state)
+
+    def compact(self, state, wait=False):
+        """
+        Rotates the journal and snapshots `state` in the background. The state is
+        copied one level deep here, so keep values immutable or copy-on-write.
+        """
+        with self._lock:
+            if self._compaction is not None and not self._compaction.done():
+                if not wait:
+                    return self._compaction
+                self._compaction.result()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if os.path.exists(self.journal_path) and not os.path.exists(self.rotated_path):
+                os.replace(self.journal_path, self.rotated_path)
+            snapshot = dict(state)
+            self.pending_lines = 0
+            self._compaction = _compactor.submit(self._write_snapshot, snapshot)
+            future = self._compaction
+        if wait:
+            future.result()
+        return future
+
+    def _write_snapshot(self, snapshot):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # The snapshot now covers everything in the rotated journal
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def close(self, state=None):
+        """Flushes the journal; with `state`, also writes a final snapshot."""
+        if state is not None:
+            self.compact(state, wait=True)
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
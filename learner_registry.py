@@ -0,0 +1,187 @@
+import itertools
+import os
+
+from advanced_logic import AdvancedAIProcessor
+from database import DEFAULT_TABLE
+from state_actor import build_snapshot
+
+# Game table IDs name directories under tables/, so they are kept to a safe alphabet
+TABLE_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
+
+def table_path(table_id, name):
+    """The default table keeps its files where they always were; every other table gets tables/<id>/."""
+    if table_id == DEFAULT_TABLE:
+        return name
+    directory = os.path.join("tables", table_id)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+class LearnerBundle:
+    """
+    Every learner for one game table: pattern matrix, sensor weights, recovery,
+    heatmap and ensemble, plus the snapshot /predict reads for the table.
+    `recovery_store` (a JournaledStore) keeps the recovery state while the
+    bundle is evicted; the other learners persist through their own files.
+    """
+
+    def __init__(self, table_id, pattern_matrix, dynamic_weighting, recovery, heatmap, ensemble_manager,
+                 recovery_store=None):
+        self.table_id = table_id
+        self.pattern_matrix = pattern_matrix
+        self.dynamic_weighting = dynamic_weighting
+        self.recovery = recovery
+        self.heatmap = heatmap
+        self.ensemble_manager = ensemble_manager
+        self.ai_processor = AdvancedAIProcessor(pattern_matrix, dynamic_weighting)
+        self.recovery_store = recovery_store
+        if recovery_store is not None:
+            state = recovery_store.load()
+            if state:
+                recovery.restore_state(state)
+        # The state the shared state backend checkpoints
+        self.learners = {"patterns": pattern_matrix, "weights": dynamic_weighting, "recovery": recovery, "heatmap": heatmap}
+        # Shared log positions: last applied to this bundle, and last checkpointed
+        self.applied_seq = 0
+        self.checkpoint_seq = None
+        self.version = 0
+        self.last_used = 0
+        self.snapshot = None
+        self.publish()
+
+    def publish(self):
+        """Publishes a fresh snapshot. Only called on the update actor's writer thread."""
+        self.version += 1
+        self.snapshot = build_snapshot(self.version, self.dynamic_weighting, self.recovery, self.heatmap, self.pattern_matrix)
+
+    def _persisted(self):
+        # Each learner's JournaledStore with the state its snapshot holds
+        persisted = [
+            (self.pattern_matrix.store, self.pattern_matrix.matrix),
+            (self.dynamic_weighting.store, self.dynamic_weighting.export_state()),
+        ]
+        if self.recovery_store is not None:
+            persisted.append((self.recovery_store, self.recovery.export_state()))
+        return persisted
+
+    def pause_persistence(self):
+        """Stops per-round journaling, e.g. when a shared state backend persists the state instead."""
+        for store, _ in self._persisted():
+            store.paused = True
+
+    def compact(self):
+        """Snapshots the pattern matrix, sensor weights and recovery state to their files in the background."""
+        for store, state in self._persisted():
+            store.compact(state)
+
+    def save(self):
+        """Writes the pattern matrix, sensor weights and recovery state to their files and closes them."""
+        for store, state in self._persisted():
+            store.close(state)
+
+    def close(self):
+        # No new retrains; one already queued still trains on the table's rounds. The shared pools stay up
+        self.ensemble_manager.trainer.close()
+
+
+class LearnerRegistry:
+    """
+    Learner bundles keyed by game table ID. A bundle is built by
+    `factory(table_id)` the first time its table is used, and at most
+    `max_resident` bundles stay in memory: loading another one first evicts
+    the least recently used, handing it to on_evict(bundle) to persist it.
+    `pinned` tables are never evicted.
+
+    Every bundle trains and scores on the same `executor` (a ModelExecutor)
+    and retrains on the same `training_worker` thread, which the registry
+    hands to factory(table_id, executor, training_worker), so the thread
+    count does not grow with the number of tables.
+
+    get() may load and evict, so it only runs on the update actor's writer
+    thread. peek() is safe on any thread and only returns resident bundles;
+    the dict is replaced rather than mutated, so readers never see it change
+    size under them.
+    """
+
+    def __init__(self, factory, max_resident=32, pinned=(DEFAULT_TABLE,), on_evict=None, executor=None,
+                 training_worker=None):
+        self.factory = factory
+        self.executor = executor
+        self.training_worker = training_worker
+        self.max_resident = max_resident
+        self.pinned = frozenset(pinned)
+        self.on_evict = on_evict
+        self.bundles = {}
+        self.loads = 0
+        self.evictions = 0
+        self._clock = itertools.count(1)
+
+    def peek(self, table_id):
+        bundle = self.bundles.get(table_id)
+        if bundle is not None:
+            bundle.last_used = next(self._clock)
+        return bundle
+
+    def get(self, table_id):
+        """The table's bundle, loading it (and evicting an idle one) if it is not resident."""
+        bundle = self.peek(table_id)
+        if bundle is not None:
+            return bundle
+        self._make_room()
+        bundle = self.factory(table_id, self.executor, self.training_worker)
+        bundle.last_used = next(self._clock)
+        self.bundles = dict(self.bundles, **{table_id: bundle})
+        self.loads += 1
+        return bundle
+
+    def _make_room(self):
+        while len(self.bundles) >= self.max_resident:
+            idle = [bundle for table_id, bundle in self.bundles.items() if table_id not in self.pinned]
+            if not idle:
+                return
+            self.evict(min(idle, key=lambda bundle: bundle.last_used).table_id)
+
+    def evict(self, table_id):
+        bundles = dict(self.bundles)
+        bundle = bundles.pop(table_id, None)
+        if bundle is None:
+            return None
+        self.bundles = bundles
+        self.evictions += 1
+        if self.on_evict is not None:
+            try:
+                self.on_evict(bundle)
+            except Exception as e:
+                print(f"Saving table {table_id} failed: {e}")
+        bundle.close()
+        return bundle
+
+    def reset(self):
+        """Drops every bundle without persisting it; they reload on next use."""
+        bundles, self.bundles = self.bundles, {}
+        for bundle in bundles.values():
+            bundle.close()
+
+    def shutdown(self):
+        """Stops retraining and frees the shared pools, e.g. before the process exits. Nothing is saved."""
+        bundles, self.bundles = self.bundles, {}
+        for bundle in bundles.values():
+            bundle.close()
+        # Queued retrains are cancelled; one still running needs the executor, so it finishes first
+        if self.training_worker is not None:
+            self.training_worker.shutdown(wait=True, cancel_futures=True)
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def resident(self):
+        return list(self.bundles.values())
+
+    def stats(self):
+        return {
+            "resident": len(self.bundles),
+            "max_resident": self.max_resident,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "tables": sorted(self.bundles),
+        }
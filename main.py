@@ -1,38 +1,154 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, PlainTextResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import collections
 import uvicorn
 import os
+import time
+from datetime import datetime
 
 from pattern_matrix import PatternErrorMatrix
-from dynamic_weighting import DynamicWeighting
+from dynamic_weighting import DynamicWeighting, DEFAULT_SENSORS
 from recovery_mode import MartingaleRecovery
-from heatmap import MarketHeatmap
-from database import GameDatabase
-from advanced_logic import AdvancedAIProcessor
+from heatmap import MarketHeatmap, OutcomeAggregates
+from database import GameDatabase, TIMESTAMP_FORMAT, DEFAULT_TABLE
+from advanced_logic import choose_prediction
 from ensemble_models import EnsembleManager
+from model_executor import ModelExecutor
+from training_worker import RetrainPolicy, make_training_worker
+from state_actor import UpdateActor
+from metrics import registry as metrics
+from retention import RetentionJanitor
+from push_hub import PushHub, CLOSE
+from shared_state import make_state_backend
+from journal import JournaledStore
+from learner_registry import LearnerBundle, LearnerRegistry, TABLE_ID_PATTERN, table_path
 
-app = FastAPI(title="Self-Learning AI Backend (Advanced)")
+# Startup progress, reported by /ready
+startup_state = {"status": "starting", "started_at": None, "ready_at": None, "warm_up_seconds": None, "error": None}
 
-# Initialize components
-pattern_matrix = PatternErrorMatrix()
-dynamic_weighting = DynamicWeighting(["CID Sensor", "Dragon Logic", "Trend Sensor"])
-recovery = MartingaleRecovery(confidence_threshold=85.0) # Threshold updated to match percentage
-heatmap = MarketHeatmap(window_size=100)
+def warm_up_ensemble():
+    """Imports the ML libraries and loads the default table's models and accuracies. Runs off the event loop."""
+    try:
+        ensemble_manager = table_bundle(DEFAULT_TABLE).ensemble_manager
+        ensemble_manager.warm_up()
+        startup_state.update(status="ready", ready_at=time.time(), warm_up_seconds=round(ensemble_manager.warm_up_seconds, 4))
+    except Exception as e:
+        print(f"Ensemble warm-up failed: {e}")
+        startup_state.update(status="failed", error=str(e))
+
+@asynccontextmanager
+async def lifespan(app):
+    startup_state["started_at"] = time.time()
+    if state_backend.shared:
+        # Load the default table from its shared checkpoint and the log tail, then follow the log
+        update_actor.call(bootstrap_shared_state).result()
+        state_backend.start()
+    else:
+        # Load the default table (heatmap windows and hour/day aggregates from the DB) before the first request
+        update_actor.call(lambda: tables.get(DEFAULT_TABLE)).result()
+    # Live push: one fan-out hub on this event loop for every SSE/WebSocket subscriber
+    push_hub.set_state(live_state(default_snapshot()))
+    push_hub.start(asyncio.get_running_loop())
+    # 7-day retention: hourly chunked deletes on a background thread
+    retention.start()
+    # The server accepts requests right away; anything that needs the ensemble waits for
+    # the warm-up, and /ready turns 200 once it is done
+    warm_up = asyncio.get_running_loop().run_in_executor(None, warm_up_ensemble)
+    yield
+    state_backend.stop(timeout=1)
+    push_hub.stop()
+    retention.stop(timeout=1)
+    await warm_up
+    # A retrain still running must finish before the shared model pools, and the interpreter, shut down
+    await asyncio.get_running_loop().run_in_executor(None, lambda: update_actor.call(tables.shutdown).result())
+
+app = FastAPI(title="Self-Learning AI Backend (Advanced)", lifespan=lifespan)
+
+# STATE_BACKEND=sqlite shares the learners between workers (uvicorn --workers N) through STATE_DB;
+# the default "local" keeps everything in this process
+state_backend = make_state_backend(os.environ.get("STATE_BACKEND", "local"), os.environ.get("STATE_DB", "shared_state.db"))
+
+# Initialize components (cheap: nothing here imports sklearn/xgboost or scans the DB)
 db = GameDatabase()
-ai_processor = AdvancedAIProcessor(pattern_matrix, dynamic_weighting)
-ensemble_manager = EnsembleManager()
+retention = RetentionJanitor(days=7, interval=3600, should_run=lambda: state_backend.is_leader)
+# Slow subscribers are dropped after 64 undelivered messages and resume from the last 256
+push_hub = PushHub(max_pending=64, history=256, heartbeat=15.0)
+
+def build_bundle(table_id, executor=None, training_worker=None):
+    """Every learner for one game table, configured the same way for each table."""
+    return LearnerBundle(
+        table_id,
+        PatternErrorMatrix(table_path(table_id, "pattern_data.json")),
+        DynamicWeighting(DEFAULT_SENSORS, table_path(table_id, "sensor_weights.json")),
+        MartingaleRecovery(confidence_threshold=85.0), # Threshold updated to match percentage
+        # /predict keeps the 100-round view; the other windows, decay and hour/day aggregates are in /stats
+        MarketHeatmap(window_size=100, windows=(20, 1000), half_life=50, aggregates=OutcomeAggregates(clock=db.clock)),
+        # Retrain after every round by default; bursts of updates coalesce into one retrain
+        EnsembleManager(model_dir=table_path(table_id, "models"), table_id=table_id,
+                        retrain_policy=RetrainPolicy(every_n_rounds=1, drift_threshold=0.1, max_interval=300),
+                        executor=executor or "thread", training_worker=training_worker),
+        # The default table is never evicted; the others keep their recovery state on disk while they are
+        recovery_store=None if table_id == DEFAULT_TABLE else JournaledStore(table_path(table_id, "recovery.json")),
+    )
 
-# Load existing data into heatmap from DB
-recent_outcomes = db.get_recent_results(100)
-for outcome in reversed(recent_outcomes):
-    heatmap.add_result(outcome)
+def load_bundle(table_id, executor=None, training_worker=None):
+    """Builds a table's bundle and brings it up to date. Runs on the writer thread, via tables.get()."""
+    bundle = build_bundle(table_id, executor, training_worker)
+    if not state_backend.shared:
+        # Heatmap windows and hour/day aggregates from the table's rows in the DB
+        bundle.heatmap.preload(db, table_id)
+    else:
+        # The shared log and checkpoints replace per-round journaling; the trainer refreshes
+        # the JSON snapshots at each checkpoint for the offline tools
+        bundle.pause_persistence()
+        # Only the elected trainer retrains; the others load its generations
+        bundle.ensemble_manager.training_enabled = state_backend.is_leader
+        bundle.ensemble_manager.registry.on_publish = lambda generation: state_backend.publish_generation(table_id, generation)
+        with UPDATE_STAGE_SECONDS.time("state_catch_up"):
+            for entry in state_backend.catch_up(bundle, seed=lambda bundle: bundle.heatmap.preload(db, table_id)):
+                apply_learners(bundle, UpdateRequest(**entry.payload), datetime.strptime(entry.timestamp, TIMESTAMP_FORMAT))
+        if bundle.heatmap.aggregates is not None:
+            # A checkpoint skips rounds the hour/day counts never saw; those are in the DB
+            bundle.heatmap.aggregates.load(db, table_id)
+    bundle.publish()
+    return bundle
+
+def evict_bundle(bundle):
+    """Persists an idle table before it leaves memory. Runs on the writer thread."""
+    if not state_backend.shared:
+        bundle.save()
+    elif state_backend.is_leader:
+        # Followers simply drop theirs: the trainer's checkpoints and the log rebuild it
+        state_backend.checkpoint(bundle)
+        bundle.save()
+    push_hub.drop_state(bundle.table_id)
+
+# Learner bundles per game table, loaded on first use. At most MAX_RESIDENT_TABLES stay in
+# memory; the least recently used one is saved to disk to make room for another. All of them
+# share one model executor and one training thread.
+tables = LearnerRegistry(load_bundle, max_resident=int(os.environ.get("MAX_RESIDENT_TABLES", "32")), on_evict=evict_bundle,
+                         executor=ModelExecutor("thread"), training_worker=make_training_worker())
+
+def table_bundle(table_id):
+    """A table's bundle for request handlers: the resident one, or loaded on the writer thread."""
+    bundle = tables.peek(table_id)
+    if bundle is None:
+        bundle = update_actor.call(lambda: tables.get(table_id)).result()
+    return bundle
+
+UPDATE_STAGE_SECONDS = metrics.histogram("update_stage_seconds", "Time per /update stage", ["stage"])
+PREDICT_STAGE_SECONDS = metrics.histogram("predict_stage_seconds", "Time per /predict stage", ["stage"])
+REQUEST_SECONDS = metrics.histogram("request_seconds", "End-to-end handler time", ["endpoint"])
 
 class PredictionRequest(BaseModel):
     period: str
     history: List[str]
     sensor_outputs: Dict[str, str]
+    table_id: str = Field(DEFAULT_TABLE, pattern=TABLE_ID_PATTERN)
 
 class UpdateRequest(BaseModel):
     period: str
@@ -42,6 +158,7 @@ class UpdateRequest(BaseModel):
     actual_outcome: str
     bet_amount: float
     confidence: float
+    table_id: str = Field(DEFAULT_TABLE, pattern=TABLE_ID_PATTERN)
 
 @app.get("/", response_class=HTMLResponse)
 def read_root():
@@ -56,36 +173,76 @@ def get_api_status():
         "optimization": "12-Model Ensemble Strategy"
     }
 
+class BatchPredictionRequest(BaseModel):
+    requests: List[PredictionRequest]
+
+@app.get("/ready")
+def get_ready():
+    # 503 until the default table's ensemble is loaded, so load balancers hold traffic during a cold start
+    bundle = tables.peek(DEFAULT_TABLE)
+    state = dict(startup_state, ensemble_ready=bundle is not None and bundle.ensemble_manager.ready)
+    return JSONResponse(state, status_code=200 if state["status"] == "ready" else 503)
+
 @app.post("/predict")
 def get_prediction(request: PredictionRequest):
-    # 1. Get Ensemble Prediction (Top 3 Models)
-    ensemble_result = ensemble_manager.predict_ensemble(request.history)
-    
+    with REQUEST_SECONDS.time("predict"):
+        bundle = table_bundle(request.table_id)
+        # 1. Get Ensemble Prediction (Top 3 Models)
+        with PREDICT_STAGE_SECONDS.time("ensemble"):
+            ensemble_result = bundle.ensemble_manager.predict_ensemble(request.history)
+        result = build_prediction(request, ensemble_result, bundle, bundle.snapshot)
+        with PREDICT_STAGE_SECONDS.time("push"):
+            push_hub.publish("prediction", {
+                key: result[key] for key in ("table_id", "period", "prediction", "confidence", "warning_color", "logic_used")
+            })
+        return result
+
+@app.post("/predict/batch")
+def get_batch_prediction(batch: BatchPredictionRequest):
+    """
+    Predicts many periods/tables in one call. Each table's ensemble scores all of
+    its histories with one predict per model; each item matches what /predict
+    would return, in request order.
+    """
+    with REQUEST_SECONDS.time("predict_batch"):
+        by_table = collections.defaultdict(list)
+        for i, request in enumerate(batch.requests):
+            by_table[request.table_id].append(i)
+        results = [None] * len(batch.requests)
+        for table_id, indexes in by_table.items():
+            bundle = table_bundle(table_id)
+            requests = [batch.requests[i] for i in indexes]
+            with PREDICT_STAGE_SECONDS.time("ensemble_batch"):
+                ensemble_results = bundle.ensemble_manager.predict_ensemble_batch([r.history for r in requests])
+            with PREDICT_STAGE_SECONDS.time("sensor_weighting_batch"):
+                weighted = bundle.dynamic_weighting.get_weighted_predictions([r.sensor_outputs for r in requests])
+            snapshot = bundle.snapshot
+            for i, request, ensemble_result, sensor_score in zip(indexes, requests, ensemble_results, weighted):
+                results[i] = build_prediction(request, ensemble_result, bundle, snapshot, sensor_score)
+        return {"results": results}
+
+def build_prediction(request: PredictionRequest, ensemble_result, bundle, snapshot, weighted=None):
     # 2. Get Advanced AI Processor prediction
-    ai_result = ai_processor.get_optimized_prediction(
-        request.history, request.sensor_outputs
-    )
+    with PREDICT_STAGE_SECONDS.time("ai_processor"):
+        ai_result = bundle.ai_processor.get_optimized_prediction(
+            request.history, request.sensor_outputs, weighted
+        )
     
     # Hybrid Logic: If ensemble has high confidence, use it. Otherwise fallback to AI processor.
-    if ensemble_result["confidence"] >= 66:
-        final_pred = ensemble_result["prediction"]
-        optimized_conf = ensemble_result["confidence"]
-        logic_used = f"Ensemble ({', '.join(ensemble_result['models_used'])})"
-    else:
-        final_pred = ai_result["prediction"]
-        optimized_conf = ai_result["confidence"]
-        logic_used = ai_result["logic_used"]
+    final_pred, optimized_conf, logic_used = choose_prediction(ensemble_result, ai_result)
     
     is_inverted = ai_result["is_inverted"]
     warning_color = ai_result["warning_color"]
     
+    # Recovery and heatmap come from the table's last published snapshot (no locks on the read path)
     # Check Recovery Mode (Using optimized confidence)
-    bet_amount, should_signal = recovery.get_bet_strategy(optimized_conf)
+    bet_amount, should_signal = snapshot.recovery.get_bet_strategy(optimized_conf)
     
     # Get Heatmap Data
-    heatmap_data = heatmap.get_heatmap_data()
+    heatmap_data = snapshot.heatmap
     
     return {
+        "table_id": request.table_id,
         "period": request.period,
         "prediction": final_pred,
         "confidence": round(optimized_conf, 2),
@@ -95,60 +252,313 @@ def get_prediction(request: PredictionRequest):
         "is_inverted": is_inverted,
         "warning_color": warning_color,
         "logic_used": logic_used,
-        "recovery_mode": recovery.total_loss > 0
+        "recovery_mode": snapshot.recovery.total_loss > 0
     }
 
-@app.post("/update")
-def update_system(request: UpdateRequest):
+def apply_learners(bundle, request: UpdateRequest, timestamp=None):
+    """Applies one round to a table's in-memory learners. The same on every worker for the same rounds."""
     # 1. Update Pattern Matrix
-    pattern_matrix.update(request.history, request.prediction, request.actual_outcome)
+    with UPDATE_STAGE_SECONDS.time("pattern_matrix"):
+        bundle.pattern_matrix.update(request.history, request.prediction, request.actual_outcome)
     
     # 2. Update Sensor Weights (Every 5 rounds)
-    dynamic_weighting.update_weights(request.sensor_outputs, request.actual_outcome)
+    with UPDATE_STAGE_SECONDS.time("weighting"):
+        bundle.dynamic_weighting.update_weights(request.sensor_outputs, request.actual_outcome)
     
     # 3. Update Recovery State
-    won = request.prediction == request.actual_outcome
-    recovery.update_result(won, request.bet_amount)
+    with UPDATE_STAGE_SECONDS.time("recovery"):
+        won = request.prediction == request.actual_outcome
+        bundle.recovery.update_result(won, request.bet_amount)
+        if bundle.recovery_store is not None:
+            state = bundle.recovery.export_state()
+            bundle.recovery_store.record(state, state)
     
     # 4. Update Heatmap
-    heatmap.add_result(request.actual_outcome)
-    
-    # 5. Update Ensemble Models & Performance
-    ensemble_manager.record_actual_outcome(request.period, request.history, request.actual_outcome)
+    with UPDATE_STAGE_SECONDS.time("heatmap"):
+        bundle.heatmap.add_result(request.actual_outcome, timestamp)
+
+def record_round(bundle, request: UpdateRequest):
+    """The round's side effects that happen once, on the worker that received it."""
+    # 5. Update Ensemble Models & Performance (the retrain itself runs in the background)
+    with UPDATE_STAGE_SECONDS.time("ensemble"):
+        bundle.ensemble_manager.record_actual_outcome(request.period, request.history, request.actual_outcome)
     
     # 6. Save to Database
-    db.save_result(
-        request.period, 
-        request.history, 
-        request.prediction, 
-        request.actual_outcome, 
-        request.confidence, 
-        request.bet_amount
-    )
+    with UPDATE_STAGE_SECONDS.time("db_save"):
+        db.save_result(
+            request.period, 
+            request.history, 
+            request.prediction, 
+            request.actual_outcome, 
+            request.confidence, 
+            request.bet_amount,
+            request.table_id
+        )
+
+def apply_update(request: UpdateRequest):
+    """Applies one round to its table's learners. Only ever runs on the update actor's writer thread."""
+    # Loaded before the round is logged, so a new table's starting checkpoint cannot already hold it
+    with UPDATE_STAGE_SECONDS.time("table_load"):
+        bundle = tables.get(request.table_id)
+    if not state_backend.shared:
+        apply_learners(bundle, request)
+        record_round(bundle, request)
+        bundle.publish()
+    else:
+        # Results are in the DB before the round is logged, so other workers replaying it see them
+        record_round(bundle, request)
+        with UPDATE_STAGE_SECONDS.time("state_log"):
+            state_backend.append(request.table_id, request.model_dump())
+        for other in sync_learners():
+            publish_round(other)
     
-    # 7. Daily Cleanup
-    ensemble_manager.cleanup_old_data(days=7)
+    # 7-day retention runs on the janitor's own schedule, not per round
     
     return {"status": "success", "message": f"System updated for period {request.period}"}
 
+def sync_learners():
+    """
+    Replays the shared log into the table bundles up to its head, loading the
+    tables it names. Runs on the writer thread. Returns the rounds that came
+    from other workers.
+    """
+    others = []
+    touched = {}
+    with UPDATE_STAGE_SECONDS.time("state_replay"):
+        # Fell behind the trimmed log: every bundle reloads from its checkpoint
+        for entry in state_backend.replay(on_gap=tables.reset):
+            request = UpdateRequest(**entry.payload)
+            bundle = tables.get(request.table_id)
+            # A bundle restored from a newer checkpoint already holds the round
+            if entry.seq > bundle.applied_seq:
+                apply_learners(bundle, request, datetime.strptime(entry.timestamp, TIMESTAMP_FORMAT))
+                bundle.applied_seq = entry.seq
+            touched[bundle.table_id] = bundle
+            if entry.worker != state_backend.worker_id:
+                others.append(request)
+    for bundle in touched.values():
+        bundle.publish()
+    # Their model results are in the DB; the trainer also counts them towards retraining
+    for table_id, rounds in collections.Counter(request.table_id for request in others).items():
+        bundle = tables.peek(table_id)
+        if bundle is None:
+            continue
+        bundle.ensemble_manager.refresh_performance()
+        for _ in range(rounds):
+            bundle.ensemble_manager.notify_round()
+    for bundle in state_backend.maybe_checkpoint(tables.resident()):
+        bundle.compact()
+    return others
+
+def bootstrap_shared_state():
+    state_backend.bootstrap()
+    tables.get(DEFAULT_TABLE)
+    sync_learners()
+
+def follow_shared_log():
+    """Called by the state backend when other workers logged rounds."""
+    for request in update_actor.call(sync_learners).result():
+        publish_round(request)
+
+def set_training(is_leader):
+    # On the writer thread, so a table being loaded right now cannot miss the change
+    for bundle in tables.resident():
+        bundle.ensemble_manager.training_enabled = is_leader
+
+def on_leadership(is_leader):
+    # Only the elected trainer retrains; the others pick up its generations
+    update_actor.call(lambda: set_training(is_leader))
+    print(f"Worker {state_backend.worker_id} {'is now' if is_leader else 'is no longer'} the trainer")
+
+def on_generation(table_id, generation):
+    # A table that is not resident loads its newest models when it is
+    bundle = tables.peek(table_id)
+    if bundle is not None and bundle.ensemble_manager.ready:
+        bundle.ensemble_manager.registry.load(bundle.ensemble_manager.model_names)
+
+if state_backend.shared:
+    state_backend.on_new_rounds = follow_shared_log
+    state_backend.on_leadership = on_leadership
+    state_backend.on_generation = on_generation
+
+def live_state(snapshot):
+    """The state pushed to live subscribers: what /stats shows that changes per round."""
+    return {
+        "heatmap": snapshot.heatmap,
+        "sensor_weights": snapshot.weights,
+        "recovery_status": {
+            "current_step": snapshot.recovery.current_step,
+            "total_loss": snapshot.recovery.total_loss,
+            "is_active": snapshot.recovery.total_loss > 0
+        },
+        "round_counter": snapshot.round_counter,
+        "patterns_learned": snapshot.patterns_learned,
+        "state_version": snapshot.version,
+    }
+
+def publish_round(request: UpdateRequest, result=None, snapshot=None):
+    """Pushes the new result plus the table's state keys it changed. Runs on the writer thread."""
+    bundle = tables.peek(request.table_id)
+    push_hub.publish("round", {
+        "table_id": request.table_id,
+        "period": request.period,
+        "prediction": request.prediction,
+        "actual_outcome": request.actual_outcome,
+        "is_win": request.prediction == request.actual_outcome,
+        "confidence": request.confidence,
+        "bet_amount": request.bet_amount,
+        "changes": push_hub.set_state(live_state(bundle.snapshot), request.table_id) if bundle is not None else {},
+    })
+
+def default_snapshot():
+    # /stats and the live state without a table_id read the default table
+    bundle = tables.bundles.get(DEFAULT_TABLE)
+    return bundle.snapshot if bundle is not None else None
+
+# All state mutations are serialized through one writer; readers use its published snapshots
+update_actor = UpdateActor(
+    apply_update,
+    lambda version: default_snapshot(),
+    on_applied=publish_round
+)
+
+@app.post("/update")
+async def update_system(request: UpdateRequest):
+    # Includes the time spent queued behind other updates
+    with REQUEST_SECONDS.time("update"):
+        return await update_actor.submit(request)
+
+def parse_event_id(value):
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+@app.get("/events")
+async def stream_events(request: Request):
+    """
+    Server-sent events: a 'state' event on connect, then 'round' (new result plus
+    changed state keys) and 'prediction' events as they happen. EventSource
+    reconnects with Last-Event-ID and receives what it missed.
+    """
+    subscriber, backlog = push_hub.subscribe(parse_event_id(request.headers.get("last-event-id")))
+
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            for message in backlog:
+                yield message.sse
+            while True:
+                message = await subscriber.next()
+                if message is CLOSE:
+                    return
+                yield message.sse
+        finally:
+            push_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/ws")
+async def websocket_events(websocket: WebSocket):
+    """Same events as /events as JSON text frames; ?last_event_id= resumes after a reconnect."""
+    await websocket.accept()
+    subscriber, backlog = push_hub.subscribe(parse_event_id(websocket.query_params.get("last_event_id")))
+    try:
+        for message in backlog:
+            await websocket.send_text(message.text)
+        while True:
+            message = await subscriber.next()
+            if message is CLOSE:
+                # 1013 "try again later": dropped for falling behind
+                await websocket.close(code=1013)
+                return
+            await websocket.send_text(message.text)
+    except (WebSocketDisconnect, OSError):
+        pass
+    finally:
+        push_hub.unsubscribe(subscriber)
+
+# Read from the components at scrape time; nothing is tracked on the hot path
+metrics.gauge("update_queue_depth", "Updates waiting for the state writer", lambda: update_actor.queue_depth)
+# Per-table series cover the resident tables
+def per_table(fn):
+    return lambda: {bundle.table_id: fn(bundle) for bundle in tables.resident()}
+
+def per_table_labels(fn):
+    return lambda: {(bundle.table_id, label): value for bundle in tables.resident() for label, value in fn(bundle).items()}
+
+metrics.gauge("training_queue_depth", "Queued plus running retrains", per_table(
+    lambda bundle: bundle.ensemble_manager.trainer.status()["queue_depth"]), ["table"])
+metrics.gauge("model_generation", "Current ensemble model generation", per_table(
+    lambda bundle: bundle.ensemble_manager.registry.generation), ["table"])
+metrics.counter("ensemble_trains_total", "Finished background retrains", per_table_labels(lambda bundle: {
+    "completed": bundle.ensemble_manager.trainer.trains_completed,
+    "failed": bundle.ensemble_manager.trainer.trains_failed,
+}), ["table", "outcome"])
+metrics.counter("prediction_cache_events_total", "Ensemble prediction cache lookups and evictions", per_table_labels(lambda bundle: {
+    event: bundle.ensemble_manager.prediction_cache.stats()[event] for event in ("hits", "misses", "evictions", "invalidations")
+}), ["table", "event"])
+metrics.gauge("prediction_cache_hit_ratio", "Share of ensemble lookups served from the cache", per_table(
+    lambda bundle: bundle.ensemble_manager.prediction_cache.stats()["hit_rate"]), ["table"])
+metrics.counter("pattern_lookups_total", "Pattern matrix lookups", per_table_labels(lambda bundle: {
+    "hit": bundle.pattern_matrix.hits, "miss": bundle.pattern_matrix.lookups - bundle.pattern_matrix.hits
+}), ["table", "result"])
+metrics.gauge("pattern_index_size", "Patterns held in the pattern matrix", per_table(
+    lambda bundle: len(bundle.pattern_matrix.matrix)), ["table"])
+metrics.gauge("learner_tables_resident", "Game tables whose learners are in memory", lambda: len(tables.bundles))
+metrics.counter("learner_table_loads_total", "Game table learner bundles loaded", lambda: tables.loads)
+metrics.counter("learner_table_evictions_total", "Idle game table learner bundles saved and evicted", lambda: tables.evictions)
+metrics.gauge("push_subscribers", "Connected SSE/WebSocket subscribers", lambda: len(push_hub.subscribers))
+metrics.counter("push_messages_total", "Events published to live subscribers", lambda: push_hub.published)
+metrics.counter("push_slow_disconnects_total", "Subscribers dropped for falling behind", lambda: push_hub.disconnected)
+metrics.gauge("state_log_lag", "Shared log rounds not yet applied by this worker",
+              lambda: state_backend.status().get("lag", 0))
+metrics.gauge("state_trainer", "1 on the worker that holds the trainer lease", lambda: int(state_backend.is_leader))
+metrics.counter("retention_deleted_total", "Rows expired by the retention janitor", lambda: retention.status()["deleted"], ["table"])
+metrics.gauge("model_accuracy", "Rolling accuracy per ensemble model", per_table_labels(lambda bundle: {
+    name: perf["accuracy"] for name, perf in bundle.ensemble_manager.performance.items()
+}), ["table", "model"])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/stats")
-def get_stats():
+def get_stats(table_id: str = Query(DEFAULT_TABLE, pattern=TABLE_ID_PATTERN)):
+    bundle = table_bundle(table_id)
+    snapshot = bundle.snapshot
+    ensemble_manager = bundle.ensemble_manager
     return {
-        "sensor_weights": dynamic_weighting.weights,
-        "heatmap": heatmap.get_heatmap_data(),
+        "table_id": table_id,
+        "sensor_weights": snapshot.weights,
+        "heatmap": snapshot.heatmap,
+        "heatmap_horizons": snapshot.heatmap_horizons,
         "recovery_status": {
-            "current_step": recovery.current_step,
-            "total_loss": recovery.total_loss,
-            "is_active": recovery.total_loss > 0
+            "current_step": snapshot.recovery.current_step,
+            "total_loss": snapshot.recovery.total_loss,
+            "is_active": snapshot.recovery.total_loss > 0
         },
         "learning_stats": {
-            "round_counter": dynamic_weighting.round_counter,
-            "patterns_learned": len(pattern_matrix.matrix)
+            "round_counter": snapshot.round_counter,
+            "patterns_learned": snapshot.patterns_learned,
+            "state_version": snapshot.version,
+            "pending_updates": update_actor.queue_depth,
+            "pattern_index": bundle.pattern_matrix.stats()
         },
         "ensemble_stats": {
             "top_3": ensemble_manager.get_top_3(),
-            "all_performances": {name: round(perf["accuracy"], 4) for name, perf in ensemble_manager.performance.items()}
-        }
+            "all_performances": {name: round(perf["accuracy"], 4) for name, perf in ensemble_manager.performance.items()},
+            "accuracy_window": ensemble_manager.rolling_accuracy.window,
+            "training": ensemble_manager.trainer.status(),
+            "last_train_report": ensemble_manager.last_train_report,
+            "prediction_cache": ensemble_manager.prediction_cache.stats()
+        },
+        "tables": tables.stats(),
+        "retention": retention.status(),
+        "push": push_hub.stats(),
+        "state_backend": state_backend.status()
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Seconds; spans sub-millisecond lookups up to multi-second retrains
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination, rendered in the Prometheus text format."""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels):
+        """Context manager that observes the duration of its block."""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count]) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            base = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(base + [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Gauge or counter read from the owning component at scrape time, so the hot
+    path pays nothing. fn returns a number, or a dict of label values -> number.
+    """
+
+    def __init__(self, name, help, fn, kind="gauge", labelnames=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            value = self.fn()
+        except Exception as e:
+            return [f"# {self.name} unavailable: {e}"]
+        if isinstance(value, dict):
+            for labels, sample in sorted(value.items()):
+                labels = labels if isinstance(labels, tuple) else (labels,)
+                lines.append(f"{self.name}{_format_labels(list(zip(self.labelnames, labels)))} {sample}")
+        elif value is not None:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders them for /metrics."""
+
+    enabled = True
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering a name (e.g. a second EnsembleManager) replaces the callback
+            # but keeps an existing histogram and its samples
+            existing = self._metrics.get(metric.name)
+            if isinstance(existing, Histogram) and isinstance(metric, Histogram):
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, fn, labelnames=()):
+        return self._register(CallbackMetric(name, help, fn, "gauge", labelnames))
+
+    def counter(self, name, help, fn, labelnames=()):
+        return self._register(CallbackMetric(name, help, fn, "counter", labelnames))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class _NullHistogram:
+    _context = nullcontext()
+
+    def observe(self, value, *labels):
+        pass
+
+    def time(self, *labels):
+        return self._context
+
+
+class NullMetricsRegistry:
+    """Same interface as MetricsRegistry with every call a no-op, for METRICS_ENABLED=0."""
+
+    enabled = False
+    _histogram = _NullHistogram()
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._histogram
+
+    def gauge(self, name, help, fn, labelnames=()):
+        return None
+
+    def counter(self, name, help, fn, labelnames=()):
+        return None
+
+    def render(self):
+        return "# metrics disabled\n"
+
+
+# Process-wide registry; set METRICS_ENABLED=0 to swap in the no-op one
+registry = MetricsRegistry() if os.environ.get("METRICS_ENABLED", "1") != "0" else NullMetricsRegistry()
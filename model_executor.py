@@ -0,0 +1,139 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Estimators whose fit/predict spend most of their time in native code that
+# releases the GIL (Cython trees, libsvm, LAPACK, XGBoost's C++ core).
+GIL_RELEASING_MODELS = {
+    "RandomForest", "XGBoost", "SVM", "KNN", "ExtraTrees",
+    "Ridge", "GaussianNB", "DecisionTree", "MLPPlaceholder"
+}
+
+
+def _fit_model(name, model, X, y):
+    # Module level so it can be pickled into a worker process
+    start = time.perf_counter()
+    try:
+        model.fit(X, y)
+        return name, model, time.perf_counter() - start, None
+    except Exception as e:
+        return name, None, time.perf_counter() - start, str(e)
+
+
+def _predict_model(name, model, features, scorer=None):
+    start = time.perf_counter()
+    try:
+        output = scorer(model, features) if scorer is not None else model.predict(features)
+        return name, output, time.perf_counter() - start, None
+    except Exception as e:
+        return name, None, time.perf_counter() - start, str(e)
+
+
+class ModelExecutor:
+    """
+    Fits and scores the ensemble's models concurrently.
+
+    mode:
+    - "serial": one model after another on the calling thread
+    - "thread": every model on a shared thread pool
+    - "process": every fit on a process pool
+    - "auto": threads for GIL_RELEASING_MODELS, processes for the rest
+
+    Scoring always uses threads (or runs serially): a single-row predict is far
+    cheaper than shipping the model to another process.
+    A model that fails is reported and skipped; it never aborts the batch.
+    """
+
+    MODES = ("serial", "thread", "process", "auto")
+
+    def __init__(self, mode="thread", max_workers=None, thread_models=GIL_RELEASING_MODELS):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.thread_models = set(thread_models)
+        self._fit_threads = None
+        self._predict_threads = None
+        self._processes = None
+        # Pools are created on first use, possibly by several callers at once
+        self._lock = threading.Lock()
+
+    def _thread_pool(self):
+        with self._lock:
+            if self._fit_threads is None:
+                self._fit_threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ensemble-fit")
+        return self._fit_threads
+
+    def _scoring_pool(self):
+        # Separate from the fit pool so predictions never queue behind a retrain
+        with self._lock:
+            if self._predict_threads is None:
+                self._predict_threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ensemble-predict")
+        return self._predict_threads
+
+    def _process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                # spawn: forking a process that already runs training/OpenMP threads can deadlock
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+        return self._processes
+
+    def _pool_for(self, name):
+        if self.mode == "thread":
+            return self._thread_pool()
+        if self.mode == "process":
+            return self._process_pool()
+        return self._thread_pool() if name in self.thread_models else self._process_pool()
+
+    def fit_all(self, models, X, y):
+        """
+        Fits every model in `models` (name -> unfitted estimator).
+        Returns (fitted, report) where report maps name -> {"seconds", "error"}.
+        """
+        if self.mode == "serial":
+            results = [_fit_model(name, model, X, y) for name, model in models.items()]
+        else:
+            futures = [self._pool_for(name).submit(_fit_model, name, model, X, y) for name, model in models.items()]
+            results = [self._result(future, name) for future, name in zip(futures, models)]
+        return self._collect(results)
+
+    def predict_all(self, models, features, scorer=None):
+        """
+        Scores `features` with every model in `models` (name -> fitted estimator),
+        using model.predict or `scorer(model, features)` when given.
+        Returns (predictions, report) where predictions only holds models that succeeded.
+        """
+        if self.mode == "serial" or len(models) <= 1:
+            results = [_predict_model(name, model, features, scorer) for name, model in models.items()]
+        else:
+            pool = self._scoring_pool()
+            futures = [pool.submit(_predict_model, name, model, features, scorer) for name, model in models.items()]
+            results = [self._result(future, name) for future, name in zip(futures, models)]
+        return self._collect(results)
+
+    def _result(self, future, name):
+        try:
+            return future.result()
+        except Exception as e:
+            # e.g. a crashed worker process or an unpicklable model
+            return name, None, 0.0, str(e)
+
+    def _collect(self, results):
+        outputs = {}
+        report = {}
+        for name, output, seconds, error in results:
+            report[name] = {"seconds": round(seconds, 6), "error": error}
+            if error is None:
+                outputs[name] = output
+        return outputs, report
+
+    def shutdown(self, wait=True):
+        for pool in (self._fit_threads, self._predict_threads):
+            if pool is not None:
+                pool.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
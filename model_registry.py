@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+
+
+class ModelGeneration:
+    """An immutable set of fitted models published together."""
+
+    def __init__(self, generation, models, mtimes):
+        self.generation = generation
+        self.models = models
+        self.mtimes = mtimes
+
+
+class ModelRegistry:
+    """
+    Keeps fitted estimators resident in memory so predictions never hit joblib.
+    Readers take the current generation without locking; writers build a new
+    generation and swap the reference in one assignment.
+    joblib (and through unpickling, sklearn/xgboost) is only imported once a
+    model is actually loaded or published.
+    """
+
+    MANIFEST = "GENERATION"
+
+    def __init__(self, model_dir="models", refresh_interval=5.0):
+        self.model_dir = model_dir
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._current = ModelGeneration(0, {}, {})
+        self._manifest_mtime = None
+        self._last_check = 0.0
+        # on_publish(generation) runs after this process published a generation
+        self.on_publish = None
+
+        if not os.path.exists(self.model_dir):
+            os.makedirs(self.model_dir)
+
+    @property
+    def generation(self):
+        return self._current.generation
+
+    def model_path(self, name):
+        return os.path.join(self.model_dir, f"{name}.joblib")
+
+    def get(self, name):
+        """Returns the resident model for `name`, or None if it was never trained."""
+        return self._current.models.get(name)
+
+    def snapshot(self):
+        return self._current
+
+    def load(self, names):
+        """Loads models from disk whose files are new or changed since the last load."""
+        import joblib
+        with self._lock:
+            current = self._current
+            models = dict(current.models)
+            mtimes = dict(current.mtimes)
+            changed = False
+
+            for name in names:
+                path = self.model_path(name)
+                if not os.path.exists(path):
+                    continue
+                mtime = os.path.getmtime(path)
+                if mtimes.get(name) == mtime:
+                    continue
+                try:
+                    models[name] = joblib.load(path)
+                    mtimes[name] = mtime
+                    changed = True
+                except Exception as e:
+                    print(f"Error loading {name}: {e}")
+
+            self._manifest_mtime = self._read_manifest_mtime()
+            if changed:
+                generation = max(current.generation + 1, self._read_manifest_generation())
+                self._current = ModelGeneration(generation, models, mtimes)
+            return self._current.generation
+
+    def refresh_if_changed(self, names):
+        """
+        Cheap staleness check for models written by another process.
+        Only stats the manifest, and at most once per refresh_interval.
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.refresh_interval:
+            return False
+        self._last_check = now
+        if self._read_manifest_mtime() == self._manifest_mtime:
+            return False
+        self.load(names)
+        return True
+
+    def publish(self, fitted):
+        """Persists freshly fitted models and swaps them in as a new generation."""
+        import joblib
+        with self._lock:
+            current = self._current
+            models = dict(current.models)
+            mtimes = dict(current.mtimes)
+
+            for name, model in fitted.items():
+                path = self.model_path(name)
+                tmp_path = path + ".tmp"
+                try:
+                    joblib.dump(model, tmp_path)
+                    os.replace(tmp_path, path)
+                except Exception as e:
+                    print(f"Error saving {name}: {e}")
+                    continue
+                models[name] = model
+                mtimes[name] = os.path.getmtime(path)
+
+            generation = max(current.generation, self._read_manifest_generation()) + 1
+            self._write_manifest(generation)
+            self._current = ModelGeneration(generation, models, mtimes)
+        if self.on_publish is not None:
+            try:
+                self.on_publish(generation)
+            except Exception as e:
+                print(f"Generation listener failed: {e}")
+        return generation
+
+    def _manifest_path(self):
+        return os.path.join(self.model_dir, self.MANIFEST)
+
+    def _read_manifest_mtime(self):
+        path = self._manifest_path()
+        return os.path.getmtime(path) if os.path.exists(path) else None
+
+    def _read_manifest_generation(self):
+        try:
+            with open(self._manifest_path(), "r") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_manifest(self, generation):
+        path = self._manifest_path()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(generation))
+        os.replace(tmp_path, path)
+        self._manifest_mtime = os.path.getmtime(path)
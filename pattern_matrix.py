@@ -1,53 +1,162 @@
-import json
-import os
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from journal import JournaledStore
+
+# Two bits per outcome. Codes are never 0, so windows of different lengths
+# can never pack to the same integer.
+OUTCOME_CODES = {"Big": 1, "Small": 2}
+OTHER_CODE = 3
+
+# Returned for unseen patterns; shared, so callers must treat entries as read-only
+EMPTY_ENTRY = {}
 
 class PatternErrorMatrix:
-    def __init__(self, storage_path="pattern_data.json"):
+    def __init__(self, storage_path="pattern_data.json", compact_every=1000,
+                 window_sizes=(8, 5, 3), max_patterns=50000):
         self.storage_path = storage_path
+        # Patterns are the last k outcomes for each k in window_sizes (a history
+        # shorter than k is used whole). Lookups back off from the longest known k.
+        self.window_sizes = tuple(sorted(set(window_sizes), reverse=True))
+        self._window_set = frozenset(self.window_sizes)
+        self.max_patterns = max_patterns
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        # Snapshot in storage_path, per-update deltas in storage_path + ".journal"
+        self.store = JournaledStore(storage_path, compact_every=compact_every)
         self.matrix = self._load_data()
 
     def _load_data(self):
-        if os.path.exists(self.storage_path):
-            try:
-                with open(self.storage_path, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        # Least recently updated first, so eviction pops from the front
+        matrix = OrderedDict()
+        migrated = False
+        for key, entry in (self.store.load() or {}).items():
+            if key.isdigit():
+                matrix[int(key)] = entry
+                continue
+            # Legacy full-history key ("Big,Small,Big"): keep it if it is a valid window
+            history = key.split(",")
+            if len(history) in self._window_set:
+                matrix[self.get_pattern_key(history)] = entry
+            migrated = True
+        if migrated:
+            self.store.compact(matrix, wait=True)
+        return matrix
 
     def _save_data(self):
-        with open(self.storage_path, 'w') as f:
-            json.dump(self.matrix, f, indent=4)
+        """Writes a full snapshot (the per-round path only appends to the journal)."""
+        self.store.compact(self.matrix, wait=True)
+
+    @contextmanager
+    def deferred_persistence(self):
+        """Skips per-update journaling inside the block and writes one snapshot at the end."""
+        self.store.paused = True
+        try:
+            yield self
+        finally:
+            self.store.paused = False
+            self._save_data()
+
+    def export_state(self):
+        """[key, entry] pairs, least recently updated first, for the shared state checkpoints."""
+        return [[key, entry] for key, entry in self.matrix.items()]
+
+    def restore_state(self, state):
+        self.matrix = OrderedDict((int(key), entry) for key, entry in state)
+
+    def _is_window(self, length, history_length):
+        return length in self._window_set or (length == history_length and length < self.window_sizes[0])
+
+    def pattern_keys(self, history):
+        """Packed integer keys for every window of `history`, shortest first."""
+        keys = []
+        n = len(history)
+        packed = 0
+        for i in range(min(n, self.window_sizes[0])):
+            packed |= OUTCOME_CODES.get(history[n - 1 - i], OTHER_CODE) << (2 * i)
+            if self._is_window(i + 1, n):
+                keys.append(packed)
+        return keys
 
     def get_pattern_key(self, history):
-        """Converts last N results into a string key."""
-        return ",".join(map(str, history))
+        """Packed integer key of the longest window of `history`."""
+        keys = self.pattern_keys(history)
+        return keys[-1] if keys else None
 
-    def predict(self, history, base_prediction):
+    def lookup(self, history):
+        """
+        Entry of the longest window of `history` that has been seen, or EMPTY_ENTRY.
+        Walks the history once from the newest outcome without building any keys.
+        """
+        self.lookups += 1
+        n = len(history)
+        packed = 0
+        found = None
+        for i in range(min(n, self.window_sizes[0])):
+            packed |= OUTCOME_CODES.get(history[n - 1 - i], OTHER_CODE) << (2 * i)
+            if self._is_window(i + 1, n):
+                entry = self.matrix.get(packed)
+                if entry is not None:
+                    found = entry
+        if found is None:
+            return EMPTY_ENTRY
+        self.hits += 1
+        return found
+
+    def predict(self, history, base_prediction, entry=None):
         """
         Adjusts base prediction based on historical errors for this pattern.
         If the pattern has 3 or more consecutive errors, it flips the prediction.
+        `entry` is lookup(history) when the caller already has it.
         """
-        key = self.get_pattern_key(history)
-        if key in self.matrix:
-            consecutive_errors = self.matrix[key].get("consecutive_errors", 0)
-            
-            if consecutive_errors >= 3:
-                return "Small" if base_prediction == "Big" else "Big"
-        
+        if entry is None:
+            entry = self.lookup(history)
+        consecutive_errors = entry.get("consecutive_errors", 0)
+        if consecutive_errors >= 3:
+            return "Small" if base_prediction == "Big" else "Big"
+
         return base_prediction
 
     def update(self, history, prediction, actual_outcome):
-        """Updates the matrix based on the result."""
-        key = self.get_pattern_key(history)
-        if key not in self.matrix:
-            self.matrix[key] = {"errors": 0, "success": 0, "consecutive_errors": 0}
-        
-        if prediction == actual_outcome:
-            self.matrix[key]["success"] += 1
-            self.matrix[key]["consecutive_errors"] = 0  # Reset on success
-        else:
-            self.matrix[key]["errors"] += 1
-            self.matrix[key]["consecutive_errors"] = self.matrix[key].get("consecutive_errors", 0) + 1
-        
-        self._save_data()
+        """Updates every window of the history based on the result."""
+        changes = {}
+        for key in self.pattern_keys(history):
+            # Copy-on-write: readers see either the old or the new entry, never a half-updated one
+            entry = dict(self.matrix.get(key, {"errors": 0, "success": 0, "consecutive_errors": 0}))
+
+            if prediction == actual_outcome:
+                entry["success"] += 1
+                entry["consecutive_errors"] = 0  # Reset on success
+            else:
+                entry["errors"] += 1
+                entry["consecutive_errors"] = entry.get("consecutive_errors", 0) + 1
+
+            self.matrix[key] = entry
+            self.matrix.move_to_end(key)
+            changes[key] = entry
+
+        if changes:
+            self.store.record(changes, self.matrix)
+        self._evict()
+
+    def _evict(self):
+        """Drops the least recently updated patterns once the index exceeds max_patterns."""
+        evicted = []
+        while len(self.matrix) > self.max_patterns:
+            key, _ = self.matrix.popitem(last=False)
+            evicted.append(key)
+        if evicted:
+            self.evictions += len(evicted)
+            self.store.remove(evicted, self.matrix)
+
+    def stats(self):
+        return {
+            "index_size": len(self.matrix),
+            "max_patterns": self.max_patterns,
+            "window_sizes": list(self.window_sizes),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "evictions": self.evictions
+        }
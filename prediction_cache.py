@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded LRU of per-model predictions keyed by the encoded feature window.
+
+    A model's prediction only depends on the window and the fitted model, so the
+    cache belongs to one model generation and is cleared as soon as a lookup
+    arrives with a newer one. Entries hold one label per model, so when the
+    top 3 rotate only the models that were not cached yet have to predict.
+    max_size=0 disables caching.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.generation = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+            self.generation = generation
+
+    def get_many(self, generation, keys, names):
+        """
+        Returns one entry (model name -> label) per key, or None where nothing is
+        cached. A key counts as a hit only if every model in `names` is cached.
+        Entries are shared, so treat them as read-only.
+        """
+        entries = []
+        with self._lock:
+            self._check_generation(generation)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                if entry is not None and all(name in entry for name in names):
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                entries.append(entry)
+        return entries
+
+    def put_many(self, generation, keys, predictions):
+        """Merges `predictions` (one name -> label dict per key) into the cache."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return  # computed against models that have since been replaced
+            for key, labels in zip(keys, predictions):
+                # Copy-on-write so entries handed out by get_many never change
+                entry = dict(self._entries.get(key, ()))
+                entry.update(labels)
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "generation": self.generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
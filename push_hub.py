@@ -0,0 +1,213 @@
+import asyncio
+import collections
+import json
+import threading
+
+from database import DEFAULT_TABLE
+
+# Queued in place of a message when a subscriber is dropped for falling behind
+CLOSE = object()
+
+
+class Message:
+    """One event, serialized once and shared by every subscriber."""
+
+    __slots__ = ("id", "event", "text", "sse")
+
+    def __init__(self, id, event, data):
+        self.id = id
+        self.event = event
+        payload = json.dumps(data, separators=(",", ":"))
+        # WebSocket clients get one JSON object, SSE clients a text/event-stream frame
+        self.text = f'{{"id":{id},"event":"{event}","data":{payload}}}'
+        # id 0 (the full state) carries no id line, so it never moves the client's Last-Event-ID
+        id_line = f"id: {id}\n" if id else ""
+        self.sse = f"{id_line}event: {event}\ndata: {payload}\n\n".encode()
+
+
+class Heartbeat:
+    __slots__ = ()
+    event = "heartbeat"
+    text = '{"event":"heartbeat"}'
+    # An SSE comment line: keeps proxies from timing out, ignored by EventSource
+    sse = b": keepalive\n\n"
+
+
+HEARTBEAT = Heartbeat()
+
+
+class Subscriber:
+    """
+    A bounded mailbox for one connection. offer() never blocks the publisher:
+    when the mailbox is full the subscriber is closed instead, and the client
+    reconnects and catches up from the hub's history.
+    """
+
+    __slots__ = ("pending", "max_pending", "ready", "closed", "last_id")
+
+    def __init__(self, max_pending, last_id=0):
+        self.pending = collections.deque()
+        self.max_pending = max_pending
+        self.ready = asyncio.Event()
+        self.closed = False
+        # Highest message id already handed over (e.g. in the reconnect backlog)
+        self.last_id = last_id
+
+    def offer(self, message):
+        if self.closed:
+            return False
+        if message is not HEARTBEAT:
+            if message.id <= self.last_id:
+                return True
+            self.last_id = message.id
+        if len(self.pending) >= self.max_pending:
+            self.close()
+            return False
+        self.pending.append(message)
+        self.ready.set()
+        return True
+
+    def close(self):
+        self.closed = True
+        self.pending.clear()
+        self.pending.append(CLOSE)
+        self.ready.set()
+
+    async def next(self):
+        """The next message, or CLOSE once the subscriber was dropped or the hub stopped."""
+        while not self.pending:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.pending.popleft()
+
+
+class PushHub:
+    """
+    Fans out live events (new rounds, predictions, state changes) to SSE and
+    WebSocket subscribers.
+
+    publish() may be called from any thread (the update actor's writer, the
+    sync endpoints' threadpool). It serializes the event once, keeps it in a
+    short history for reconnecting clients (SSE Last-Event-ID), and hands it
+    to the event loop, which appends it to every subscriber's mailbox. A
+    subscriber whose mailbox holds `max_pending` undelivered messages is
+    disconnected rather than buffered without limit.
+
+    Idle subscribers cost one mailbox and one suspended task each; a single
+    heartbeat task keeps all connections alive every `heartbeat` seconds.
+    """
+
+    def __init__(self, max_pending=64, history=256, heartbeat=15.0):
+        self.max_pending = max_pending
+        self.heartbeat = heartbeat
+        self.subscribers = set()
+        self.history = collections.deque(maxlen=history)
+        self.published = 0
+        self.disconnected = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._loop = None
+        self._heartbeat_task = None
+        # Latest live state per game table
+        self._states = {}
+        self._state_message = None
+
+    def start(self, loop=None):
+        self._loop = loop or asyncio.get_running_loop()
+        if self.heartbeat:
+            self._heartbeat_task = self._loop.create_task(self._heartbeats())
+        return self
+
+    def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        for subscriber in list(self.subscribers):
+            subscriber.close()
+        self.subscribers.clear()
+
+    async def _heartbeats(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            self._fanout(HEARTBEAT)
+
+    def publish(self, event, data):
+        """Queues `data` (JSON-serializable) for every subscriber. Thread-safe."""
+        with self._lock:
+            message = Message(self._next_id, event, data)
+            self._next_id += 1
+            self.history.append(message)
+            self.published += 1
+            # Scheduled under the lock, so fan-outs run in id order whichever thread published
+            if self._loop is not None:
+                try:
+                    self._loop.call_soon_threadsafe(self._fanout, message)
+                except RuntimeError:
+                    pass  # loop already closed during shutdown
+        return message
+
+    def _fanout(self, message):
+        for subscriber in list(self.subscribers):
+            if not subscriber.offer(message):
+                # Fell max_pending messages behind: drop it, the client reconnects and catches up
+                self.subscribers.discard(subscriber)
+                self.disconnected += 1
+
+    def set_state(self, state, table_id=DEFAULT_TABLE):
+        """
+        Records a table's latest full state (dict of top-level keys) and returns
+        only the keys whose value changed, for the per-round delta.
+        """
+        with self._lock:
+            previous = self._states.get(table_id, {})
+            changes = {key: value for key, value in state.items() if previous.get(key) != value}
+            self._states[table_id] = dict(state)
+            self._state_message = None
+        return changes
+
+    def drop_state(self, table_id):
+        """Forgets a table's state, e.g. once its learners were evicted."""
+        with self._lock:
+            if self._states.pop(table_id, None) is not None:
+                self._state_message = None
+
+    def state_message(self):
+        """
+        The full state as a 'state' event, serialized once per change: the default
+        table's keys at the top level, every table's state under "tables".
+        """
+        with self._lock:
+            if self._state_message is None:
+                data = dict(self._states.get(DEFAULT_TABLE, {}), tables=self._states)
+                self._state_message = Message(0, "state", data)
+            return self._state_message
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registers a subscriber on the event loop. Returns (subscriber, backlog):
+        the missed messages after `last_event_id` when the history still has
+        them, otherwise [state_message()] so the client starts from a full state.
+        """
+        with self._lock:
+            history = list(self.history)
+        if last_event_id is not None and history and history[0].id <= last_event_id + 1:
+            backlog = [message for message in history if message.id > last_event_id]
+            # A message in the backlog whose fan-out is still queued must not arrive twice
+            subscriber = Subscriber(self.max_pending, backlog[-1].id if backlog else last_event_id)
+        else:
+            backlog = [self.state_message()]
+            subscriber = Subscriber(self.max_pending)
+        self.subscribers.add(subscriber)
+        return subscriber, backlog
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "disconnected_slow": self.disconnected,
+            "history": len(self.history),
+            "max_pending": self.max_pending,
+        }
@@ -10,13 +10,13 @@ class MartingaleRecovery:
         """
         Returns the recommended bet amount and whether to signal.
         UPDATED: Now always returns should_signal=True to remove 'Wait' mode.
+        Read-only, so it is safe to call on a published state snapshot.
         """
         if self.total_loss == 0:
             return self.base_bet, True # Normal bet
         
         if self.current_step >= self.max_steps:
-            # Reset if max steps reached to prevent total bankruptcy
-            self.reset()
+            # Steps exhausted; update_result resets the state, so never escalate past here
             return self.base_bet, True
 
         # Calculate recovery bet: (Total Loss + Base Bet)
@@ -33,7 +33,17 @@ class MartingaleRecovery:
         else:
             self.total_loss += bet_amount
             self.current_step += 1
+            if self.current_step >= self.max_steps:
+                # Reset if max steps reached to prevent total bankruptcy
+                self.reset()
 
     def reset(self):
         self.total_loss = 0
         self.current_step = 0
+
+    def export_state(self):
+        return {"current_step": self.current_step, "total_loss": self.total_loss}
+
+    def restore_state(self, state):
+        self.current_step = state["current_step"]
+        self.total_loss = state["total_loss"]
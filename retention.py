@@ -0,0 +1,204 @@
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database import DB_QUERY_SECONDS, OutcomeStream, TIMESTAMP_FORMAT
+from storage import get_pool
+
+# Tables with a `timestamp` column that the janitor expires, and the index it uses
+RETENTION_INDEXES = {
+    "game_results": "idx_game_results_timestamp",
+    "model_performance": "idx_model_performance_timestamp",
+}
+
+
+class RetentionJanitor:
+    """
+    Deletes rows older than `days` from the RETENTION_INDEXES tables.
+
+    Deletes run in chunks of `chunk_size` rows, each in its own short
+    transaction, with `pause` seconds between chunks. Each chunk is a range
+    scan on a timestamp index, so the single SQLite writer is only ever held
+    briefly and /update can always get in between two chunks.
+
+    With `archive_dir`, expired rows are first appended to gzip'd JSON-lines
+    files, one per table and day (archive_dir/<table>/<YYYY-MM-DD>.jsonl.gz).
+    Rows are archived before they are deleted, so a crash in between can
+    archive a chunk twice but never lose it. Archived game_results carry their
+    history as a list, since their positions in the outcome stream do not
+    outlive it.
+
+    Once game_results is expired, each game table's outcome stream is trimmed
+    up to the first outcome its oldest remaining round still needs, in chunks
+    like the deletes (counted under "outcomes").
+
+    start() runs it every `interval` seconds on a background thread. run_once()
+    is the synchronous form used by cleanup.py and the backtester.
+    """
+
+    def __init__(self, db_path="game_data.db", days=7, chunk_size=500, pause=0.01,
+                 archive_dir=None, interval=3600, clock=None, should_run=None):
+        self.db_path = db_path
+        self.days = days
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.archive_dir = archive_dir
+        self.interval = interval
+        # clock() -> datetime, same contract as GameDatabase's
+        self.clock = clock
+        # should_run() -> bool, checked before each scheduled run (e.g. only on the elected trainer)
+        self.should_run = should_run
+        self.pool = get_pool(db_path)
+        self.runs = 0
+        self.deleted = dict.fromkeys([*RETENTION_INDEXES, "outcomes"], 0)
+        self.outcomes = OutcomeStream()
+        self.archived = 0
+        self.last_run_at = None
+        self.last_run_seconds = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+
+    def _existing_tables(self, conn):
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (%s)"
+            % ",".join("?" * len(RETENTION_INDEXES)), tuple(RETENTION_INDEXES)
+        ).fetchall()
+        return [table for table in RETENTION_INDEXES if (table,) in rows]
+
+    def ensure_indexes(self):
+        with self.pool.transaction() as conn:
+            tables = self._existing_tables(conn)
+            for table in tables:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {RETENTION_INDEXES[table]} ON {table} (timestamp)")
+        return tables
+
+    def cutoff(self):
+        now = self.clock() if self.clock else datetime.now()
+        return (now - timedelta(days=self.days)).strftime(TIMESTAMP_FORMAT)
+
+    def run_once(self, tables=None):
+        """Expires every table once, chunk by chunk. Returns rows deleted per table."""
+        with self._run_lock:
+            start = time.perf_counter()
+            existing = self.ensure_indexes()
+            cutoff = self.cutoff()
+            deleted = {}
+            for table in tables or existing:
+                if table in existing:
+                    deleted[table] = self._purge_table(table, cutoff)
+            if "game_results" in deleted:
+                deleted["outcomes"] = self._trim_outcomes()
+            self.runs += 1
+            self.last_run_at = time.time()
+            self.last_run_seconds = time.perf_counter() - start
+            return deleted
+
+    def _purge_table(self, table, cutoff):
+        total = 0
+        while not self._stop.is_set():
+            with DB_QUERY_SECONDS.time("retention_chunk"), self.pool.transaction() as conn:
+                if self.archive_dir:
+                    count = self._archive_and_delete_chunk(conn, table, cutoff)
+                else:
+                    count = conn.execute(f'''
+                        DELETE FROM {table} WHERE rowid IN (
+                            SELECT rowid FROM {table} WHERE timestamp < ? ORDER BY timestamp LIMIT ?
+                        )
+                    ''', (cutoff, self.chunk_size)).rowcount
+            total += count
+            self.deleted[table] += count
+            if count < self.chunk_size:
+                break
+            # Let waiting writers (e.g. /update) take the lock before the next chunk
+            time.sleep(self.pause)
+        return total
+
+    def _trim_outcomes(self):
+        """Deletes stream outcomes no stored round refers to any more, per game table."""
+        with self.pool.connection() as conn:
+            spans = conn.execute("SELECT table_id, MIN(pos) FROM outcomes GROUP BY table_id").fetchall()
+        total = 0
+        for table_id, low in spans:
+            while not self._stop.is_set():
+                with DB_QUERY_SECONDS.time("retention_chunk"), self.pool.transaction() as conn:
+                    # Recomputed per chunk: a round saved in between only ever needs later positions
+                    bound = min(self.outcomes.trim_bound(conn, table_id), low + self.chunk_size)
+                    count = conn.execute(
+                        "DELETE FROM outcomes WHERE table_id = ? AND pos >= ? AND pos < ?", (table_id, low, bound)
+                    ).rowcount
+                total += count
+                self.deleted["outcomes"] += count
+                if bound < low + self.chunk_size:
+                    break
+                low = bound
+                time.sleep(self.pause)
+        return total
+
+    def _archive_and_delete_chunk(self, conn, table, cutoff):
+        cursor = conn.execute(
+            f"SELECT rowid, * FROM {table} WHERE timestamp < ? ORDER BY timestamp LIMIT ?",
+            (cutoff, self.chunk_size)
+        )
+        columns = [column[0] for column in cursor.description][1:]
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+
+        records = [dict(zip(columns, row[1:])) for row in rows]
+        if table == "game_results":
+            refs = [(record["table_id"], record.pop("history_end"), record.pop("history_len")) for record in records]
+            for record, history in zip(records, self.outcomes.histories(conn, refs)):
+                record["history"] = history
+        by_day = {}
+        for record in records:
+            by_day.setdefault(str(record.get("timestamp") or "unknown")[:10], []).append(record)
+        table_dir = os.path.join(self.archive_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        for day, records in by_day.items():
+            # Appending makes a multi-member gzip file, which gzip readers handle transparently
+            with gzip.open(os.path.join(table_dir, f"{day}.jsonl.gz"), "at") as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.archived += len(rows)
+
+        conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(row[0],) for row in rows])
+        return len(rows)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.should_run is None or self.should_run():
+                    self.run_once()
+            except Exception as e:
+                print(f"Retention cleanup failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Runs the janitor now and then every `interval` seconds on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="retention-janitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def status(self):
+        return {
+            "days": self.days,
+            "interval": self.interval,
+            "chunk_size": self.chunk_size,
+            "archive_dir": self.archive_dir,
+            "runs": self.runs,
+            "deleted": dict(self.deleted),
+            "archived": self.archived,
+            "last_run_at": self.last_run_at,
+            "last_run_seconds": round(self.last_run_seconds, 4) if self.last_run_seconds is not None else None,
+        }
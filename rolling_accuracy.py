@@ -0,0 +1,102 @@
+import collections
+
+from database import DEFAULT_TABLE
+
+
+class RollingAccuracy:
+    """
+    Accuracy of each model over its last `window` results, kept as a ring buffer
+    of correctness flags plus a running hit count, so recording a result and
+    reading an accuracy are both O(1) per model.
+
+    The buffers are mirrored into the `model_accuracy` summary table, so a restart
+    restores them with one small read instead of scanning `model_performance`.
+    Both tables are keyed by game table; this instance covers `table_id`.
+    """
+
+    def __init__(self, model_names, window=20, table_id=DEFAULT_TABLE):
+        self.window = window
+        self.table_id = table_id
+        self.buffers = {name: collections.deque(maxlen=window) for name in model_names}
+        self.hits = {name: 0 for name in model_names}
+
+    def record(self, name, is_correct):
+        buffer = self.buffers[name]
+        if len(buffer) == buffer.maxlen:
+            self.hits[name] -= buffer[0]
+        buffer.append(is_correct)
+        self.hits[name] += is_correct
+
+    def accuracy(self, name):
+        """Returns None until the model has at least one recorded result."""
+        buffer = self.buffers[name]
+        return self.hits[name] / len(buffer) if buffer else None
+
+    def reset(self, name, flags):
+        """Replaces a model's buffer with `flags`, oldest first."""
+        buffer = collections.deque(flags[-self.window:], maxlen=self.window)
+        self.buffers[name] = buffer
+        self.hits[name] = sum(buffer)
+
+    def create_table(self, conn):
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(model_accuracy)")]
+        if columns and "table_id" not in columns:
+            # Only a cache of model_performance: load() rebuilds whatever is missing
+            conn.execute("DROP TABLE model_accuracy")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS model_accuracy (
+                table_id TEXT NOT NULL DEFAULT 'default',
+                model_name TEXT,
+                window_size INTEGER,
+                hits INTEGER,
+                total INTEGER,
+                accuracy REAL,
+                recent TEXT,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (table_id, model_name)
+            )
+        ''')
+
+    def summary_rows(self, names):
+        rows = []
+        for name in names:
+            buffer = self.buffers[name]
+            recent = "".join("1" if flag else "0" for flag in buffer)
+            rows.append((self.table_id, name, self.window, self.hits[name], len(buffer), self.accuracy(name), recent))
+        return rows
+
+    def save(self, conn, names):
+        conn.executemany('''
+            INSERT INTO model_accuracy (table_id, model_name, window_size, hits, total, accuracy, recent, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(table_id, model_name) DO UPDATE SET
+                window_size = excluded.window_size, hits = excluded.hits, total = excluded.total,
+                accuracy = excluded.accuracy, recent = excluded.recent, updated_at = excluded.updated_at
+        ''', self.summary_rows(names))
+
+    def load(self, conn):
+        """
+        Restores buffers from the summary table. Models missing from it, or stored
+        with a different window length, are rebuilt from model_performance through
+        the (table_id, model_name, timestamp) index. Returns the names that were rebuilt.
+        """
+        stored = {}
+        for name, window, recent in conn.execute(
+            "SELECT model_name, window_size, recent FROM model_accuracy WHERE table_id = ?", (self.table_id,)
+        ):
+            stored[name] = (window, recent)
+
+        rebuilt = []
+        for name in self.buffers:
+            window, recent = stored.get(name, (None, None))
+            if window == self.window and recent is not None:
+                self.reset(name, [1 if c == "1" else 0 for c in recent])
+                continue
+            flags = [row[0] for row in conn.execute('''
+                SELECT is_correct FROM model_performance
+                WHERE table_id = ? AND model_name = ?
+                ORDER BY timestamp DESC, rowid DESC LIMIT ?
+            ''', (self.table_id, name, self.window))]
+            self.reset(name, list(reversed(flags)))
+            rebuilt.append(name)
+        return rebuilt
@@ -0,0 +1,409 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from database import DB_QUERY_SECONDS, TIMESTAMP_FORMAT
+from storage import get_pool
+
+
+class LogEntry:
+    """One /update as stored in the shared log."""
+
+    __slots__ = ("seq", "worker", "payload", "timestamp")
+
+    def __init__(self, seq, worker, payload, timestamp):
+        self.seq = seq
+        self.worker = worker
+        self.payload = payload
+        self.timestamp = timestamp
+
+
+def new_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LocalStateBackend:
+    """
+    The default: this process owns all learner state, rounds are applied as
+    they arrive and nothing is shared. It is always the trainer.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self.worker_id = new_worker_id()
+        self.is_leader = True
+
+    def start(self):
+        return self
+
+    def stop(self, timeout=None):
+        pass
+
+    def status(self):
+        return {"backend": "local", "worker_id": self.worker_id, "is_leader": True}
+
+
+class SQLiteStateBackend:
+    """
+    Shares the learner state of every game table (pattern matrix, sensor
+    weights, recovery and heatmap) and the model generations between API
+    workers, e.g. `uvicorn --workers N`, through one SQLite file:
+
+    - state_log: every /update in one global order. Each worker replays the
+      whole log into its own learner bundles, so they all hold the same state.
+      Bundles track the last position they applied, so a bundle restored from
+      a newer checkpoint skips the rounds that checkpoint already holds.
+    - state_checkpoints: a table's learner state as of a log position. The
+      first worker to load a table seeds its checkpoint from its local files
+      and the DB; after that the trainer checkpoints resident tables every
+      `checkpoint_every` rounds and each table it evicts. Loading a table
+      restores its checkpoint and replays the table's rounds after it.
+    - leases: the trainer election. The lease holder is the only worker that
+      retrains ensembles, writes periodic checkpoints and JSON snapshots, and
+      runs the retention janitor; it renews every lease_seconds / 3, and
+      another worker takes over once the lease expires.
+    - state_meta: the latest model generation per table, so workers load new
+      models as soon as the trainer publishes them.
+
+    Log rows are trimmed once every table's checkpoint covers them, keeping
+    one checkpoint interval for workers that lag behind. A worker that falls
+    further behind drops its bundles and reloads them from the checkpoints.
+
+    A background thread polls the log head every `poll_interval` seconds and
+    calls on_new_rounds() when other workers appended rounds. Lease expiry
+    compares wall clocks, so hosts sharing the file need synchronized clocks.
+    """
+
+    shared = True
+    LEASE = "trainer"
+    GENERATION_KEY = "model_generation:"
+
+    def __init__(self, db_path="shared_state.db", lease_seconds=10.0, poll_interval=0.05,
+                 checkpoint_every=500, batch_size=500, worker_id=None):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.checkpoint_every = checkpoint_every
+        self.batch_size = batch_size
+        self.worker_id = worker_id or new_worker_id()
+        self.pool = get_pool(db_path)
+        self.is_leader = False
+        # Highest log position this worker has replayed
+        self.applied_seq = 0
+        self.head_seq = 0
+        # Position of the last periodic checkpoint
+        self.checkpoint_seq = 0
+        self.checkpoints_written = 0
+        self.restores = 0
+        self.resyncs = 0
+        self.model_generations = {}
+        # Callbacks, all run on the backend's thread:
+        # on_new_rounds() when the log has rows past applied_seq,
+        # on_leadership(is_leader) when the lease is won or lost,
+        # on_generation(table_id, generation) when another worker published models
+        self.on_new_rounds = None
+        self.on_leadership = None
+        self.on_generation = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._init_tables()
+
+    def _init_tables(self):
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS state_log (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    worker TEXT,
+                    payload TEXT,
+                    timestamp TEXT,
+                    table_id TEXT NOT NULL DEFAULT 'default'
+                )
+            ''')
+            if "table_id" not in [row[1] for row in conn.execute("PRAGMA table_info(state_log)")]:
+                conn.execute("ALTER TABLE state_log ADD COLUMN table_id TEXT NOT NULL DEFAULT 'default'")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_state_log_table_seq ON state_log (table_id, seq)")
+
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(state_checkpoints)")]
+            if columns and "table_id" not in columns:
+                # Checkpoints from before game tables held the default table alone
+                conn.execute("ALTER TABLE state_checkpoints RENAME TO state_checkpoints_old")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS state_checkpoints (
+                    table_id TEXT,
+                    seq INTEGER,
+                    state TEXT,
+                    timestamp TEXT,
+                    PRIMARY KEY (table_id, seq)
+                )
+            ''')
+            if columns and "table_id" not in columns:
+                conn.execute('''
+                    INSERT INTO state_checkpoints (table_id, seq, state, timestamp)
+                    SELECT 'default', seq, state, timestamp FROM state_checkpoints_old
+                ''')
+                conn.execute("DROP TABLE state_checkpoints_old")
+
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT,
+                    expires_at REAL
+                )
+            ''')
+            conn.execute("CREATE TABLE IF NOT EXISTS state_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _now(self):
+        # Same layout and zone as SQLite's CURRENT_TIMESTAMP
+        return datetime.now(timezone.utc).replace(tzinfo=None).strftime(TIMESTAMP_FORMAT)
+
+    # Log
+
+    def append(self, table_id, payload):
+        """Adds one round to the shared log and returns its position."""
+        with DB_QUERY_SECONDS.time("state_log_append"), self.pool.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO state_log (worker, payload, timestamp, table_id) VALUES (?, ?, ?, ?)",
+                (self.worker_id, json.dumps(payload, separators=(",", ":")), self._now(), table_id)
+            )
+            return cursor.lastrowid
+
+    def read_log(self, after_seq, limit, table_id=None, upto=None):
+        """Log entries after `after_seq`, oldest first; only one table's, and none past `upto`, if given."""
+        query = "SELECT seq, worker, payload, timestamp FROM state_log WHERE seq > ?"
+        params = [after_seq]
+        if table_id is not None:
+            query += " AND table_id = ?"
+            params.append(table_id)
+        if upto is not None:
+            query += " AND seq <= ?"
+            params.append(upto)
+        query += " ORDER BY seq LIMIT ?"
+        params.append(limit)
+        with DB_QUERY_SECONDS.time("state_log_read"), self.pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [LogEntry(seq, worker, json.loads(payload), timestamp) for seq, worker, payload, timestamp in rows]
+
+    def replay(self, on_gap=None):
+        """
+        Yields the log entries this worker has not replayed yet, oldest first;
+        applied_seq advances as each one is handed back. When the rows right
+        after applied_seq were already trimmed, on_gap() is called first: the
+        caller drops its bundles so they reload from the checkpoints.
+        """
+        while True:
+            entries = self.read_log(self.applied_seq, self.batch_size)
+            if not entries:
+                return
+            if entries[0].seq > self.applied_seq + 1:
+                self.resyncs += 1
+                if on_gap is not None:
+                    on_gap()
+                self.applied_seq = entries[0].seq - 1
+            for entry in entries:
+                yield entry
+                self.applied_seq = entry.seq
+            self.head_seq = max(self.head_seq, self.applied_seq)
+
+    def bootstrap(self):
+        """
+        Starts following the log at its head. Bundles loaded afterwards replay
+        their own table's rounds up to here from their checkpoints in catch_up().
+        """
+        with self.pool.connection() as conn:
+            # The AUTOINCREMENT counter, so a log trimmed down to nothing does not look like a gap
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'state_log'").fetchone()
+        self.applied_seq = self.head_seq = row[0] if row else 0
+        return self.applied_seq
+
+    # Checkpoints
+
+    def _write_checkpoint(self, conn, bundle):
+        state = {name: learner.export_state() for name, learner in bundle.learners.items()}
+        conn.execute(
+            "INSERT OR REPLACE INTO state_checkpoints (table_id, seq, state, timestamp) VALUES (?, ?, ?, ?)",
+            (bundle.table_id, bundle.applied_seq, json.dumps(state, separators=(",", ":")), self._now())
+        )
+        # A table only ever needs its newest checkpoint
+        conn.execute("DELETE FROM state_checkpoints WHERE table_id = ? AND seq < ?", (bundle.table_id, bundle.applied_seq))
+        bundle.checkpoint_seq = bundle.applied_seq
+        self.checkpoints_written += 1
+
+    def catch_up(self, bundle, seed=None):
+        """
+        Brings a freshly built bundle to this worker's log position. Restores the
+        table's checkpoint; a table nobody loaded before has none, so seed(bundle)
+        fills it (e.g. from the DB) and its state is checkpointed as the table's
+        starting point. Then yields the table's log entries after the checkpoint,
+        which the caller applies.
+        """
+        with DB_QUERY_SECONDS.time("state_checkpoint_load"), self.pool.connection() as conn:
+            # IMMEDIATE: two workers loading a new table together cannot both seed it
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT seq, state FROM state_checkpoints WHERE table_id = ? ORDER BY seq DESC LIMIT 1",
+                    (bundle.table_id,)
+                ).fetchone()
+                if row is None:
+                    if seed is not None:
+                        seed(bundle)
+                    # No worker appended rounds for a table before loading it, so none are in the log yet
+                    bundle.applied_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM state_log").fetchone()[0]
+                    self._write_checkpoint(conn, bundle)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is not None:
+            state = json.loads(row[1])
+            for name, learner in bundle.learners.items():
+                if name in state:
+                    learner.restore_state(state[name])
+            bundle.applied_seq = bundle.checkpoint_seq = row[0]
+            self.restores += 1
+
+        while bundle.applied_seq < self.applied_seq:
+            entries = self.read_log(bundle.applied_seq, self.batch_size, bundle.table_id, self.applied_seq)
+            if not entries:
+                break
+            for entry in entries:
+                yield entry
+                bundle.applied_seq = entry.seq
+        # Nothing else for this table up to here; later entries are compared against applied_seq
+        bundle.applied_seq = max(bundle.applied_seq, self.applied_seq)
+
+    def checkpoint(self, bundle):
+        """Checkpoints one bundle, e.g. when the trainer evicts it."""
+        with DB_QUERY_SECONDS.time("state_checkpoint_write"), self.pool.transaction() as conn:
+            self._write_checkpoint(conn, bundle)
+
+    def maybe_checkpoint(self, bundles):
+        """
+        On the trainer, every `checkpoint_every` replayed rounds: checkpoints the
+        bundles that changed since their last checkpoint, then trims the log up
+        to the previous periodic checkpoint, or up to the first row a table's
+        checkpoint does not cover yet. Returns the bundles checkpointed.
+        """
+        if not self.is_leader or self.applied_seq - self.checkpoint_seq < self.checkpoint_every:
+            return []
+        previous = self.checkpoint_seq
+        changed = [bundle for bundle in bundles if bundle.applied_seq > (bundle.checkpoint_seq or 0)]
+        with DB_QUERY_SECONDS.time("state_checkpoint_write"), self.pool.transaction() as conn:
+            for bundle in changed:
+                self._write_checkpoint(conn, bundle)
+            uncovered = conn.execute('''
+                SELECT MIN(l.seq) FROM state_log l
+                LEFT JOIN (SELECT table_id, MAX(seq) AS seq FROM state_checkpoints GROUP BY table_id) c
+                    ON c.table_id = l.table_id
+                WHERE l.seq <= ? AND l.seq > COALESCE(c.seq, 0)
+            ''', (previous,)).fetchone()[0]
+            conn.execute("DELETE FROM state_log WHERE seq <= ?", (previous if uncovered is None else uncovered - 1,))
+        self.checkpoint_seq = self.applied_seq
+        return changed
+
+    # Trainer lease and model generations
+
+    def _renew_lease(self):
+        now = time.time()
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO leases (name, holder, expires_at) VALUES (?, NULL, 0)", (self.LEASE,))
+            held = conn.execute(
+                "UPDATE leases SET holder = ?, expires_at = ? WHERE name = ? AND (holder = ? OR expires_at < ?)",
+                (self.worker_id, now + self.lease_seconds, self.LEASE, self.worker_id, now)
+            ).rowcount == 1
+        if held != self.is_leader:
+            self.is_leader = held
+            if self.on_leadership is not None:
+                self.on_leadership(held)
+
+    def _release_lease(self):
+        with self.pool.transaction() as conn:
+            conn.execute("UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?", (self.LEASE, self.worker_id))
+        self.is_leader = False
+
+    def publish_generation(self, table_id, generation):
+        """Called by the trainer after it published a table's model generation."""
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO state_meta (key, value) VALUES (?, ?)",
+                (self.GENERATION_KEY + table_id, str(generation))
+            )
+        self.model_generations[table_id] = generation
+
+    def _read_head(self):
+        with self.pool.connection() as conn:
+            head = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM state_log").fetchone()[0]
+            rows = conn.execute(
+                "SELECT key, value FROM state_meta WHERE key >= ? AND key < ?",
+                (self.GENERATION_KEY, self.GENERATION_KEY[:-1] + ";")
+            ).fetchall()
+        return head, {key[len(self.GENERATION_KEY):]: int(value) for key, value in rows}
+
+    def _poll(self):
+        head, generations = self._read_head()
+        self.head_seq = head
+        if head > self.applied_seq and self.on_new_rounds is not None:
+            self.on_new_rounds()
+        for table_id, generation in generations.items():
+            if self.model_generations.get(table_id) != generation:
+                self.model_generations[table_id] = generation
+                if self.on_generation is not None:
+                    self.on_generation(table_id, generation)
+
+    def _loop(self):
+        next_renewal = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= next_renewal:
+                    self._renew_lease()
+                    next_renewal = time.monotonic() + self.lease_seconds / 3
+                self._poll()
+            except Exception as e:
+                print(f"Shared state sync failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Takes part in the trainer election and follows the log on a daemon thread."""
+        if self._thread is None:
+            self._renew_lease()
+            self._thread = threading.Thread(target=self._loop, name="shared-state", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.is_leader:
+            # Hands the trainer role over now instead of after the lease runs out
+            self._release_lease()
+
+    def status(self):
+        return {
+            "backend": "sqlite",
+            "path": self.db_path,
+            "worker_id": self.worker_id,
+            "is_leader": self.is_leader,
+            "applied_seq": self.applied_seq,
+            "head_seq": self.head_seq,
+            "lag": max(self.head_seq - self.applied_seq, 0),
+            "checkpoint_seq": self.checkpoint_seq,
+            "checkpoints_written": self.checkpoints_written,
+            "restores": self.restores,
+            "resyncs": self.resyncs,
+            "model_generations": dict(self.model_generations),
+        }
+
+
+def make_state_backend(kind="local", db_path="shared_state.db", **options):
+    if kind == "local":
+        return LocalStateBackend()
+    if kind == "sqlite":
+        return SQLiteStateBackend(db_path, **options)
+    raise ValueError(f"Unknown state backend: {kind}")
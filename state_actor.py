@@ -0,0 +1,114 @@
+import asyncio
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StateSnapshot:
+    """
+    Read-only view of the learner state published after every applied update.
+    /predict and /stats read the current snapshot without taking any lock.
+    """
+
+    __slots__ = ("version", "weights", "recovery", "heatmap", "heatmap_horizons", "round_counter", "patterns_learned")
+
+    def __init__(self, version, weights, recovery, heatmap, heatmap_horizons, round_counter, patterns_learned):
+        self.version = version
+        self.weights = weights
+        self.recovery = recovery
+        self.heatmap = heatmap
+        self.heatmap_horizons = heatmap_horizons
+        self.round_counter = round_counter
+        self.patterns_learned = patterns_learned
+
+
+def build_snapshot(version, dynamic_weighting, recovery, heatmap, pattern_matrix):
+    return StateSnapshot(
+        version,
+        dict(dynamic_weighting.weights),
+        copy.copy(recovery),
+        heatmap.get_heatmap_data(),
+        heatmap.get_horizons_data(),
+        dynamic_weighting.round_counter,
+        len(pattern_matrix.matrix),
+    )
+
+
+class UpdateActor:
+    """
+    Single writer for all learner state. Updates queue up in the actor's mailbox
+    and are applied one at a time on a dedicated thread, so concurrent /update
+    calls can never interleave. After each update a fresh StateSnapshot is
+    published with one reference assignment.
+
+    The mailbox is a one-thread executor rather than an asyncio.Queue so it is
+    not tied to a particular event loop and sync callers (scripts) can use it too.
+    """
+
+    def __init__(self, apply_fn, snapshot_fn, on_applied=None):
+        self.apply_fn = apply_fn
+        self.snapshot_fn = snapshot_fn
+        # on_applied(request, result, snapshot) runs on the writer after each successful update
+        self.on_applied = on_applied
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-writer")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.applied = 0
+        self._snapshot = snapshot_fn(0)
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def queue_depth(self):
+        return self._pending
+
+    def _apply(self, request):
+        try:
+            result = self.apply_fn(request)
+        finally:
+            self.applied += 1
+            self._snapshot = self.snapshot_fn(self.applied)
+            with self._lock:
+                self._pending -= 1
+        if self.on_applied is not None:
+            try:
+                self.on_applied(request, result, self._snapshot)
+            except Exception as e:
+                print(f"Update listener failed: {e}")
+        return result
+
+    def _publish(self):
+        self._snapshot = self.snapshot_fn(self.applied)
+
+    def _call(self, fn):
+        try:
+            return fn()
+        finally:
+            # Counts as a state change, so the new snapshot gets a new version
+            self.applied += 1
+            self._publish()
+
+    def call(self, fn):
+        """
+        Runs fn() on the writer thread between updates, e.g. to apply rounds other
+        workers logged, then publishes a new snapshot. Returns a Future.
+        """
+        return self._writer.submit(self._call, fn)
+
+    def refresh(self):
+        """Republishes the snapshot on the writer thread, e.g. after state was loaded at startup."""
+        self._writer.submit(self._publish).result()
+
+    def _enqueue(self, request):
+        with self._lock:
+            self._pending += 1
+        return self._writer.submit(self._apply, request)
+
+    async def submit(self, request):
+        """Queues an update and waits for it to be applied without blocking the event loop."""
+        return await asyncio.wrap_future(self._enqueue(request))
+
+    def shutdown(self, wait=True):
+        self._writer.shutdown(wait=wait)
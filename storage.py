@@ -0,0 +1,98 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Applied to every pooled connection. WAL lets readers run alongside the single
+# writer, and synchronous=NORMAL only fsyncs at checkpoints instead of every commit.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of long-lived SQLite connections to one database file.
+    Connections are reused, so sqlite3's per-connection statement cache keeps
+    the repo's fixed SQL strings compiled across requests.
+    """
+
+    def __init__(self, db_path, size=4, timeout=30.0):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path, timeout=self.timeout, check_same_thread=False, cached_statements=256
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get(timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection for reads; returns it to the pool afterwards."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrows a connection and commits everything in the block as one transaction."""
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    def close_all(self):
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, size=4):
+    """Returns the process-wide pool for `db_path` so every component shares it."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path, size=size)
+            _pools[key] = pool
+        return pool
@@ -0,0 +1,71 @@
+import hashlib
+import random
+import sqlite3
+
+from backtest import load_rounds
+from database import GameDatabase
+
+COLORS = ["Red", "Green", "Violet"]
+
+# game_results as the original GameDatabase wrote it: history strings, no game tables
+BASELINE_SCHEMA = """
+    CREATE TABLE game_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        period TEXT UNIQUE,
+        history TEXT,
+        prediction TEXT,
+        actual_outcome TEXT,
+        confidence REAL,
+        bet_amount REAL,
+        is_win INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def make_rounds(n):
+    rng = random.Random(0)
+    history = [rng.choice(COLORS) for _ in range(10)]
+    rounds = []
+    for i in range(n):
+        actual = rng.choice(COLORS)
+        rounds.append((str(i), list(history), history[-1], actual, 50.0, 10.0, f"2026-01-01 00:{i:02d}:00"))
+        history = history[1:] + [actual]
+    # An empty history, as the first rounds of a game have
+    rounds.append((str(n), [], "Red", "Green", 50.0, 10.0, "2026-01-01 01:00:00"))
+    return rounds
+
+
+def digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_load_rounds_reads_a_baseline_database_without_migrating_it(tmp_path):
+    rounds = make_rounds(30)
+    legacy_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(legacy_path)
+    conn.execute(BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO game_results (period, history, prediction, actual_outcome, confidence, bet_amount, is_win, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(period, ",".join(history), prediction, actual, confidence, bet, int(prediction == actual), timestamp)
+         for period, history, prediction, actual, confidence, bet, timestamp in rounds]
+    )
+    conn.commit()
+    conn.close()
+    before = digest(legacy_path)
+
+    current_path = str(tmp_path / "current.db")
+    db = GameDatabase(current_path)
+    db.save_results([r[:6] for r in rounds])
+    with db.pool.transaction() as conn:
+        conn.executemany("UPDATE game_results SET timestamp = ? WHERE period = ?", [(r[6], r[0]) for r in rounds])
+    db.pool.close_all()
+
+    legacy = load_rounds(legacy_path)
+    assert legacy == load_rounds(current_path)
+    assert [(r["period"], r["history"], r["actual_outcome"]) for r in legacy] == [(r[0], r[1], r[3]) for r in rounds]
+    assert load_rounds(legacy_path, table_id="default", limit=5) == legacy[:5]
+    assert load_rounds(legacy_path, table_id="other") == []
+    assert digest(legacy_path) == before
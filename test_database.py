@@ -0,0 +1,188 @@
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import GameDatabase, OutcomeStream
+from retention import RetentionJanitor
+
+COLORS = ["Red", "Green", "Violet"]
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    dbs = []
+
+    def make(name="game.db", clock=None):
+        db = GameDatabase(str(tmp_path / name), clock=clock)
+        dbs.append(db)
+        return db
+
+    yield make
+    for db in dbs:
+        db.pool.close_all()
+
+
+def sliding(rng, n, length, table_id="default", prefix="s"):
+    """Rounds whose history is the previous round's slid by one outcome, as /update sends them."""
+    history = [rng.choice(COLORS) for _ in range(length)]
+    rounds = []
+    for i in range(n):
+        actual = rng.choice(COLORS)
+        rounds.append((f"{prefix}{i}", list(history), history[-1], actual, 50.0, 10.0, table_id))
+        history = history[1:] + [actual]
+    return rounds
+
+
+def unrelated(rng, n, table_id="default", prefix="u"):
+    """Rounds with independent histories of varying length, including empty ones."""
+    return [(f"{prefix}{i}", [rng.choice(COLORS) for _ in range(rng.randint(0, 15))], "Red", rng.choice(COLORS),
+             50.0, 10.0, table_id) for i in range(n)]
+
+
+def stored(db, table_id=None):
+    """(period, history) of every stored round in id order, histories rebuilt from the stream."""
+    with db.pool.connection() as conn:
+        query = "SELECT period, table_id, history_end, history_len FROM game_results"
+        params = ()
+        if table_id is not None:
+            query += " WHERE table_id = ?"
+            params = (table_id,)
+        rows = conn.execute(query + " ORDER BY id", params).fetchall()
+    histories = db.get_histories([row[1:] for row in rows])
+    return [(row[0], history) for row, history in zip(rows, histories)]
+
+
+def stream_length(db, table_id):
+    with db.pool.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM outcomes WHERE table_id = ?", (table_id,)).fetchone()[0]
+
+
+def test_sliding_histories_round_trip_and_share_the_stream(make_db):
+    db = make_db()
+    rounds = sliding(random.Random(0), 50, 12)
+    db.save_results(rounds[:20])
+    for r in rounds[20:]:
+        db.save_result(*r)
+    assert stored(db) == [(r[0], r[1]) for r in rounds]
+    # Each round after the first adds only its newest outcome
+    assert stream_length(db, "default") == 12 + 49
+
+
+def test_unrelated_and_mixed_histories_round_trip_per_table(make_db):
+    db = make_db()
+    rng = random.Random(1)
+    rounds = unrelated(rng, 30, "a") + sliding(rng, 20, 8, "b") + unrelated(rng, 10, "b", prefix="v")
+    # Repeats, a shorter history after a longer one and a self-overlapping history
+    rounds += [("r0", ["Red"] * 6, "Red", "Red", 50.0, 10.0, "a"),
+               ("r1", ["Red"] * 6, "Red", "Red", 50.0, 10.0, "a"),
+               ("r2", ["Red"] * 3, "Red", "Red", 50.0, 10.0, "a"),
+               ("r3", ["Red", "Green", "Red", "Green", "Red"], "Red", "Red", 50.0, 10.0, "a")]
+    rng.shuffle(rounds)
+    db.save_results(rounds)
+    for table_id in ("a", "b"):
+        assert stored(db, table_id) == [(r[0], r[1]) for r in rounds if r[6] == table_id]
+
+
+def test_duplicate_period_is_skipped(make_db):
+    db = make_db()
+    db.save_result("p1", ["Red", "Green"], "Red", "Red", 50.0, 10.0)
+    db.save_result("p1", ["Violet"], "Red", "Red", 50.0, 10.0)
+    db.save_result("p1", ["Violet"], "Red", "Red", 50.0, 10.0, "other")
+    assert stored(db, "default") == [("p1", ["Red", "Green"])]
+    assert stored(db, "other") == [("p1", ["Violet"])]
+
+
+@pytest.mark.parametrize("with_tables", [False, True])
+def test_migrates_history_strings_to_the_stream(tmp_path, make_db, with_tables):
+    path = tmp_path / "legacy.db"
+    rng = random.Random(2)
+    rounds = sliding(rng, 15, 10, "default") + unrelated(rng, 10, "t1" if with_tables else "default")
+    conn = sqlite3.connect(path)
+    conn.execute(f"""
+        CREATE TABLE game_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            period TEXT{'' if with_tables else ' UNIQUE'},
+            history TEXT,
+            prediction TEXT,
+            actual_outcome TEXT,
+            confidence REAL,
+            bet_amount REAL,
+            is_win INTEGER,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            {", table_id TEXT NOT NULL DEFAULT 'default', UNIQUE (table_id, period)" if with_tables else ""}
+        )
+    """)
+    columns = "period, history, prediction, actual_outcome, confidence, bet_amount, is_win, timestamp"
+    conn.executemany(
+        f"INSERT INTO game_results ({columns}{', table_id' if with_tables else ''}) "
+        f"VALUES (?, ?, ?, ?, ?, ?, ?, ?{', ?' if with_tables else ''})",
+        [(period, ",".join(history), prediction, actual, confidence, bet, int(prediction == actual),
+          f"2026-01-01 00:{i:02d}:00") + ((table_id,) if with_tables else ())
+         for i, (period, history, prediction, actual, confidence, bet, table_id) in enumerate(rounds)]
+    )
+    conn.commit()
+    conn.close()
+
+    db = make_db("legacy.db")
+    with db.pool.connection() as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(game_results)")]
+        timestamps = [row[0] for row in conn.execute("SELECT timestamp FROM game_results ORDER BY id")]
+    assert "history" not in columns and "table_id" in columns
+    assert timestamps == [f"2026-01-01 00:{i:02d}:00" for i in range(len(rounds))]
+    for table_id in {r[6] for r in rounds}:
+        assert stored(db, table_id) == [(r[0], r[1]) for r in rounds if r[6] == table_id]
+    # The sliding rounds share one window plus an outcome per round
+    assert stream_length(db, "default") <= 10 + 14 + sum(len(r[1]) for r in rounds[15:] if r[6] == "default")
+
+    # The migrated stream keeps growing like one written by save_result, and reopening does not migrate again
+    more = sliding(random.Random(3), 5, 10, prefix="n")
+    db.save_results(more)
+    db = make_db("legacy.db")
+    assert stored(db, "default")[-5:] == [(r[0], r[1]) for r in more]
+
+
+def test_retention_trims_the_stream_to_the_oldest_remaining_round(make_db):
+    clock = Clock(datetime(2026, 1, 1))
+    db = make_db(clock=clock)
+    rng = random.Random(4)
+    old = sliding(rng, 20, 10, "a") + unrelated(rng, 10, "b") + sliding(rng, 5, 6, "gone")
+    db.save_results(old)
+    clock.now += timedelta(days=10)
+    new = sliding(rng, 10, 10, "a", prefix="n") + unrelated(rng, 5, "b", prefix="m")
+    db.save_results(new)
+
+    janitor = RetentionJanitor(db.db_path, days=7, chunk_size=7, pause=0, clock=clock)
+    deleted = janitor.run_once(["game_results"])
+    assert deleted["game_results"] == len(old)
+    assert deleted["outcomes"] > 0
+
+    stream = OutcomeStream()
+    with db.pool.connection() as conn:
+        for table_id in ("a", "b"):
+            bound = stream.trim_bound(conn, table_id)
+            start = conn.execute(
+                "SELECT history_end - history_len FROM game_results WHERE table_id = ? ORDER BY id LIMIT 1", (table_id,)
+            ).fetchone()[0]
+            low = conn.execute("SELECT MIN(pos) FROM outcomes WHERE table_id = ?", (table_id,)).fetchone()[0]
+            assert bound == start == low
+        # A table whose rounds all expired needs none of its stream
+        assert conn.execute("SELECT COUNT(*) FROM outcomes WHERE table_id = 'gone'").fetchone()[0] == 0
+    for table_id in ("a", "b"):
+        assert stored(db, table_id) == [(r[0], r[1]) for r in new if r[6] == table_id]
+
+    # Rounds saved after the trim still round-trip, including on the emptied table
+    later = sliding(rng, 3, 10, "a", prefix="l") + sliding(rng, 3, 4, "gone", prefix="l")
+    db.save_results(later)
+    assert stored(db, "a")[-3:] == [(r[0], r[1]) for r in later[:3]]
+    assert stored(db, "gone") == [(r[0], r[1]) for r in later[3:]]
+    assert janitor.run_once(["game_results"]) == {"game_results": 0, "outcomes": 0}
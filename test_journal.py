@@ -0,0 +1,94 @@
+import os
+import shutil
+
+import pytest
+
+from journal import JournaledStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "state.json")
+
+
+def write(store, state, changes):
+    state.update(changes)
+    store.record(changes, state)
+
+
+@pytest.mark.parametrize("torn", ['{"set":{"x"', '{"set":{"x":9}}'])
+def test_torn_last_line_is_skipped_and_cut_off(path, torn):
+    store = JournaledStore(path)
+    state = {}
+    for i in range(3):
+        write(store, state, {str(i): i})
+    store.close()
+    with open(path + ".journal", "a") as f:
+        f.write(torn)
+
+    store = JournaledStore(path)
+    state = store.load()
+    assert state == {"0": 0, "1": 1, "2": 2}
+    # Written after the crash, so it must not end up glued to the torn line
+    write(store, state, {"3": 3})
+    store.close()
+    assert JournaledStore(path).load() == {"0": 0, "1": 1, "2": 2, "3": 3}
+
+
+def test_garbled_line_in_the_middle_is_skipped(path):
+    with open(path + ".journal", "w") as f:
+        f.write('{"set":{"a":1}}\n{"set":\n{"set":{"b":2}}\n')
+    assert JournaledStore(path).load() == {"a": 1, "b": 2}
+
+
+def test_removed_keys_stay_removed(path):
+    store = JournaledStore(path)
+    state = {}
+    write(store, state, {"1": "a", "2": "b"})
+    del state["1"]
+    store.remove([1], state)
+    store.close()
+    assert JournaledStore(path).load() == {"2": "b"}
+
+
+def test_compaction_interrupted_before_the_snapshot(path, monkeypatch):
+    store = JournaledStore(path, compact_every=4)
+    state = {}
+    write(store, state, {"a": 0})
+    store.compact(state, wait=True)
+    assert os.path.exists(path) and not os.path.exists(path + ".journal.compacting")
+
+    # The process dies after rotating the journal, before the new snapshot is in place
+    monkeypatch.setattr(JournaledStore, "_write_snapshot", lambda self, snapshot: None)
+    for i in range(4):
+        write(store, state, {"a": i + 1, f"k{i}": i})
+    assert os.path.exists(path + ".journal.compacting")
+    # Later rounds land in a fresh journal, overwriting and deleting keys from the rotated one
+    write(store, state, {"a": 10})
+    del state["k0"]
+    store.remove(["k0"], state)
+    store.close()
+    monkeypatch.undo()
+
+    store = JournaledStore(path, compact_every=4)
+    loaded = store.load()
+    assert loaded == state == {"a": 10, "k1": 1, "k2": 2, "k3": 3}
+
+    # The next compaction folds both journals into the snapshot
+    write(store, loaded, {"b": 1})
+    store.close(loaded)
+    assert not os.path.exists(path + ".journal.compacting")
+    assert JournaledStore(path).load() == dict(state, b=1)
+
+
+def test_compaction_interrupted_after_the_snapshot(path):
+    store = JournaledStore(path)
+    state = {}
+    write(store, state, {"a": 1, "b": 1})
+    shutil.copy(path + ".journal", path + ".rotated")
+    store.compact(state, wait=True)
+    write(store, state, {"a": 2})
+    store.close()
+    # The snapshot replaced the old one but the rotated journal it covers was not removed yet
+    os.replace(path + ".rotated", path + ".journal.compacting")
+    assert JournaledStore(path).load() == {"a": 2, "b": 1}
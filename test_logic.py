@@ -38,7 +38,11 @@ def test_flow():
         update_response = requests.post(f"{BASE_URL}/update", json=update_payload)
         print(f"Update Response: {update_response.json()}")
         
-        # 3. Test Stats
+        # 3. Test Batch Prediction
+        batch_response = requests.post(f"{BASE_URL}/predict/batch", json={"requests": [payload, payload]})
+        print(f"Batch Prediction Response: {batch_response.json()}")
+        
+        # 4. Test Stats
         stats_response = requests.get(f"{BASE_URL}/stats")
         print(f"Stats Response: {stats_response.json()}")
         
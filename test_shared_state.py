@@ -0,0 +1,183 @@
+import time
+
+import pytest
+
+from shared_state import SQLiteStateBackend
+
+
+class Rounds:
+    """A learner whose state is every value applied to it, in order."""
+
+    def __init__(self):
+        self.values = []
+
+    def export_state(self):
+        return list(self.values)
+
+    def restore_state(self, state):
+        self.values = list(state)
+
+
+class Bundle:
+    def __init__(self, table_id):
+        self.table_id = table_id
+        self.learners = {"rounds": Rounds()}
+        self.applied_seq = 0
+        self.checkpoint_seq = None
+
+    @property
+    def values(self):
+        return self.learners["rounds"].values
+
+
+class Worker:
+    """What main does with a backend: load tables through catch_up, log rounds, replay the log."""
+
+    def __init__(self, path, worker_id, **options):
+        self.backend = SQLiteStateBackend(path, worker_id=worker_id, **options)
+        self.bundles = {}
+
+    def bundle(self, table_id):
+        if table_id not in self.bundles:
+            bundle = Bundle(table_id)
+            for entry in self.backend.catch_up(bundle):
+                bundle.values.append(entry.payload["value"])
+            self.bundles[table_id] = bundle
+        return self.bundles[table_id]
+
+    def update(self, table_id, value):
+        self.bundle(table_id)
+        self.backend.append(table_id, {"table_id": table_id, "value": value})
+        self.sync()
+
+    def sync(self):
+        for entry in self.backend.replay(on_gap=self.bundles.clear):
+            bundle = self.bundle(entry.payload["table_id"])
+            if entry.seq > bundle.applied_seq:
+                bundle.values.append(entry.payload["value"])
+                bundle.applied_seq = entry.seq
+        return self.backend.maybe_checkpoint(list(self.bundles.values()))
+
+    def state(self):
+        return {table_id: bundle.values for table_id, bundle in self.bundles.items()}
+
+
+@pytest.fixture
+def workers(tmp_path):
+    started = []
+
+    def make(worker_id, **options):
+        worker = Worker(str(tmp_path / "shared_state.db"), worker_id, **options)
+        started.append(worker)
+        return worker
+
+    yield make
+    for worker in started:
+        worker.backend.stop()
+    if started:
+        started[0].backend.pool.close_all()
+
+
+def log_bounds(backend):
+    with backend.pool.connection() as conn:
+        return conn.execute("SELECT MIN(seq), MAX(seq) FROM state_log").fetchone()
+
+
+def test_follower_replays_the_log_in_order(workers):
+    leader, follower = workers("leader"), workers("follower")
+    leader.backend._renew_lease()
+    assert leader.backend.is_leader and not follower.backend.is_leader
+    leader.backend.bootstrap()
+    follower.backend.bootstrap()
+
+    for i in range(6):
+        leader.update("a" if i % 3 else "b", i)
+    follower.sync()
+    assert follower.state() == leader.state() == {"a": [1, 2, 4, 5], "b": [0, 3]}
+
+    # Rounds the follower logs itself go through the same log
+    follower.update("a", 6)
+    leader.update("b", 7)
+    follower.sync()
+    leader.sync()
+    assert follower.state() == leader.state() == {"a": [1, 2, 4, 5, 6], "b": [0, 3, 7]}
+    assert follower.backend.applied_seq == leader.backend.applied_seq == log_bounds(leader.backend)[1] == 8
+
+    # A worker that starts late loads each table from its checkpoint plus the table's rounds after it
+    late = workers("late")
+    late.backend.bootstrap()
+    assert late.bundle("a").values == [1, 2, 4, 5, 6]
+    assert late.bundle("b").values == [0, 3, 7]
+
+
+def test_follower_behind_the_trimmed_log_reloads_from_checkpoints(workers):
+    leader, follower = workers("leader", checkpoint_every=5), workers("follower", checkpoint_every=5)
+    leader.backend._renew_lease()
+    leader.backend.bootstrap()
+    follower.backend.bootstrap()
+    leader.update("a", 0)
+    follower.sync()
+    assert follower.state() == {"a": [0]}
+
+    # The follower stops replaying while the trainer checkpoints and trims
+    for i in range(1, 30):
+        leader.update("a" if i % 4 else "b", i)
+    first, head = log_bounds(leader.backend)
+    assert first > follower.backend.applied_seq + 1
+    assert leader.backend.checkpoints_written > 2
+
+    follower.sync()
+    assert follower.backend.resyncs == 1
+    assert follower.backend.applied_seq == head
+    assert follower.state() == leader.state()
+    assert follower.bundle("a").values == [0] + [i for i in range(1, 30) if i % 4]
+
+    # Following on from there needs no further resync
+    leader.update("b", 30)
+    follower.sync()
+    assert follower.backend.resyncs == 1
+    assert follower.state() == leader.state()
+
+
+def test_followers_never_checkpoint_or_trim(workers):
+    leader, follower = workers("leader", checkpoint_every=2), workers("follower", checkpoint_every=2)
+    leader.backend._renew_lease()
+    follower.backend.bootstrap()
+    for i in range(10):
+        follower.update("a", i)
+    assert follower.backend.checkpoints_written == 1  # the table's starting checkpoint
+    assert log_bounds(follower.backend) == (1, 10)
+
+
+def test_lease_moves_when_the_holder_stops_renewing(workers):
+    options = dict(lease_seconds=0.3, poll_interval=0.01)
+    first, second = workers("first", **options), workers("second", **options)
+    changes = []
+    second.backend.on_leadership = changes.append
+    first.backend.start()
+    second.backend.start()
+    time.sleep(0.2)
+    assert first.backend.is_leader and not second.backend.is_leader
+
+    # The holder hangs: its thread stops without releasing the lease
+    first.backend._stop.set()
+    first.backend._thread.join()
+    deadline = time.monotonic() + 2.0
+    while not second.backend.is_leader and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert second.backend.is_leader
+    assert changes == [True]
+
+    # The old holder learns it lost the lease on its next renewal
+    first.backend._renew_lease()
+    assert not first.backend.is_leader
+
+
+def test_stop_hands_the_lease_over_at_once(workers):
+    first, second = workers("first", lease_seconds=60), workers("second", lease_seconds=60)
+    first.backend._renew_lease()
+    second.backend._renew_lease()
+    assert first.backend.is_leader and not second.backend.is_leader
+    first.backend.stop()
+    second.backend._renew_lease()
+    assert second.backend.is_leader
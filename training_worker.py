@@ -0,0 +1,169 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import registry as metrics
+
+TRAIN_SECONDS = metrics.histogram("ensemble_train_seconds", "Background retrain duration", ["outcome"])
+
+
+class RetrainPolicy:
+    """
+    Decides when new rounds justify a retrain. Any enabled trigger fires it:
+    - every_n_rounds: retrain after this many new rounds
+    - drift_threshold: retrain when top-3 accuracy drops this much since the last train
+    - max_interval: retrain when this many seconds passed since the last train
+    """
+
+    def __init__(self, every_n_rounds=1, drift_threshold=None, max_interval=None):
+        self.every_n_rounds = every_n_rounds
+        self.drift_threshold = drift_threshold
+        self.max_interval = max_interval
+
+    def should_retrain(self, rounds_since_train, accuracy_drop, seconds_since_train):
+        if rounds_since_train <= 0:
+            return False
+        if self.every_n_rounds and rounds_since_train >= self.every_n_rounds:
+            return True
+        if self.drift_threshold is not None and accuracy_drop >= self.drift_threshold:
+            return True
+        if self.max_interval is not None and seconds_since_train >= self.max_interval:
+            return True
+        return False
+
+    def to_dict(self):
+        return {
+            "every_n_rounds": self.every_n_rounds,
+            "drift_threshold": self.drift_threshold,
+            "max_interval": self.max_interval,
+        }
+
+
+def make_training_worker():
+    """The single background thread retrains run on. Several schedulers can share one."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="ensemble-train")
+
+
+class TrainingScheduler:
+    """
+    Runs retrains on a single background worker so /update never waits for them.
+    Rounds that arrive while a retrain is queued are coalesced into that retrain.
+    Once closed it queues nothing more; a retrain already queued still runs.
+
+    `worker` (see make_training_worker) is shared with other schedulers, e.g.
+    one per game table, so they all retrain on one thread; by default the
+    scheduler has its own, which shutdown() stops.
+    """
+
+    def __init__(self, train_fn, policy=None, generation_fn=None, worker=None):
+        self.train_fn = train_fn
+        self.policy = policy or RetrainPolicy()
+        self.generation_fn = generation_fn
+        self._owns_worker = worker is None
+        self._executor = make_training_worker() if worker is None else worker
+        self._lock = threading.Lock()
+
+        self.rounds_since_train = 0
+        self.closed = False
+        self.pending = False
+        self.running = False
+        self.trains_completed = 0
+        self.trains_failed = 0
+        self.coalesced_rounds = 0
+        self.last_train_duration = None
+        self.last_train_at = None
+        self._last_train_monotonic = time.monotonic()
+        self._accuracy_at_train = None
+        self._pending_accuracy = None
+
+    def notify_round(self, accuracy=None):
+        """Called once per published result; queues a retrain if the policy says so."""
+        with self._lock:
+            if self.closed:
+                return False
+            self.rounds_since_train += 1
+            if self._accuracy_at_train is None:
+                self._accuracy_at_train = accuracy
+            drop = 0.0
+            if accuracy is not None and self._accuracy_at_train is not None:
+                drop = self._accuracy_at_train - accuracy
+            elapsed = time.monotonic() - self._last_train_monotonic
+
+            if not self.policy.should_retrain(self.rounds_since_train, drop, elapsed):
+                return False
+            if self.pending:
+                # A retrain is already queued and will see this round's data
+                self.coalesced_rounds += 1
+                return False
+            self.pending = True
+            self._pending_accuracy = accuracy
+
+        self._executor.submit(self._run)
+        return True
+
+    def _run(self):
+        with self._lock:
+            self.pending = False
+            self.running = True
+            self.rounds_since_train = 0
+            self._accuracy_at_train = self._pending_accuracy
+
+        start = time.monotonic()
+        try:
+            self.train_fn()
+            failed = False
+        except Exception as e:
+            print(f"Background training failed: {e}")
+            failed = True
+        duration = time.monotonic() - start
+        TRAIN_SECONDS.observe(duration, "failed" if failed else "completed")
+
+        with self._lock:
+            self.running = False
+            self.last_train_duration = duration
+            self.last_train_at = time.time()
+            self._last_train_monotonic = time.monotonic()
+            if failed:
+                self.trains_failed += 1
+            else:
+                self.trains_completed += 1
+
+    def wait_idle(self, timeout=None):
+        """Blocks until queued retrains finished. Mostly useful for scripts and benchmarks."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending or self.running:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def status(self):
+        with self._lock:
+            return {
+                "queue_depth": int(self.pending) + int(self.running),
+                "rounds_since_train": self.rounds_since_train,
+                "is_training": self.running,
+                "trains_completed": self.trains_completed,
+                "trains_failed": self.trains_failed,
+                "coalesced_rounds": self.coalesced_rounds,
+                "last_train_duration": round(self.last_train_duration, 4) if self.last_train_duration is not None else None,
+                "last_train_at": self.last_train_at,
+                "model_generation": self.generation_fn() if self.generation_fn else None,
+                "policy": self.policy.to_dict(),
+            }
+
+    def close(self):
+        """Stops queueing retrains. One already queued or running still completes."""
+        with self._lock:
+            self.closed = True
+
+    def shutdown(self, wait=True):
+        """
+        Closes the scheduler and, with `wait`, blocks until its queued retrain
+        finished. A worker of its own is stopped too; a shared one is left to its owner.
+        """
+        self.close()
+        if self._owns_worker:
+            self._executor.shutdown(wait=wait)
+        elif wait:
+            self.wait_idle()
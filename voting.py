@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def class_distribution(model, X, n_classes):
+    """
+    (n, n_classes) class distribution from one fitted model: predict_proba when it
+    has one, a softmax over decision_function otherwise (RidgeClassifier, SGD with
+    squared loss), and a one-hot of predict as the last resort. Columns follow the
+    model's classes_, so a class the model never saw gets 0.
+    """
+    n = X.shape[0]
+    out = np.zeros((n, n_classes))
+    classes = np.asarray(getattr(model, "classes_", np.arange(n_classes))).astype(int)
+
+    if hasattr(model, "predict_proba"):
+        out[:, classes] = model.predict_proba(X)
+        return out
+    if hasattr(model, "decision_function"):
+        scores = np.asarray(model.decision_function(X), dtype=float)
+        if scores.ndim == 1:
+            # Binary: the score is for classes[1]; softmax over (0, score) is the sigmoid
+            scores = np.column_stack([np.zeros(n), scores])
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        out[:, classes] = scores / scores.sum(axis=1, keepdims=True)
+        return out
+    out[np.arange(n), np.asarray(model.predict(X)).astype(int)] = 1.0
+    return out
+
+
+def soft_vote(distributions, weights):
+    """
+    Weighted average of per-model class distributions in one pass.
+    distributions: (n_models, n_rows, n_classes); weights: (n_models,).
+    Returns the (n_rows, n_classes) ensemble distribution.
+    """
+    weights = np.asarray(weights, dtype=float)
+    total = weights.sum()
+    if total <= 0:
+        weights = np.ones_like(weights)
+        total = weights.sum()
+    return np.tensordot(weights / total, distributions, axes=1)